@@ -1,15 +1,35 @@
 # pylint: disable=no-self-use,unused-argument
-import json
-from typing import TYPE_CHECKING, Optional
+import logging
+import os
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from oteapi.datacache import DataCache
 from oteapi.models import AttrDict, DataCacheConfig, ResourceConfig, SessionUpdate
-from oteapi.plugins import create_strategy
+from oteapi.utils.paths import uri_to_path
 from pydantic import Field
 from pydantic.dataclasses import dataclass
 
+from oteapi_ontokb_plugin.utils.metrics import timed
+from oteapi_ontokb_plugin.utils.rdf import (
+    graph_to_bytes,
+    guess_format,
+    iter_ntriples,
+    parse_graph,
+)
+from oteapi_ontokb_plugin.utils.reference import DataReference, reference_cached
+from oteapi_ontokb_plugin.utils.spill import SpilledFile, spill
+from oteapi_ontokb_plugin.utils.streaming import open_cached
+
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import Any, Dict
+    from typing import Any, BinaryIO, Iterator
+
+    from oteapi.datacache import DataCache
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds to wait for the headers of an HTTP document, to check whether it changed
+HEAD_TIMEOUT = 10.0
 
 
 class RDFConfig(AttrDict):
@@ -22,6 +42,56 @@ class RDFConfig(AttrDict):
             "content."
         ),
     )
+    graph: bool = Field(
+        False,
+        description=(
+            "Parse the document into a graph, cached in a compact binary form keyed "
+            "by the content hash, instead of returning the raw content. Unchanged "
+            "local files, and HTTP documents with an unchanged `ETag` or "
+            "`Last-Modified` header, are neither downloaded nor parsed again."
+        ),
+    )
+    rdf_format: Optional[str] = Field(
+        None,
+        description=(
+            "rdflib parser name of the document format, e.g. `xml`, `turtle` or "
+            "`nt`. Guessed from the `downloadUrl` extension if not given."
+        ),
+    )
+    by_reference: bool = Field(
+        False,
+        description=(
+            "Only put a reference to the document stored in the data cache (key, "
+            "size, content type and checksum) in the session, not its content."
+        ),
+    )
+    spill: bool = Field(
+        False,
+        description=(
+            "Copy the document to a content-addressed file on local disk, without "
+            "loading it in memory, and only put a reference to the file in the "
+            "session. See `oteapi_ontokb_plugin.utils.spill` to map it in memory "
+            "or decode it lazily."
+        ),
+    )
+    spill_dir: Optional[str] = Field(
+        None,
+        description=(
+            "Directory of the spilled files, `oteapi-ontokb-spill` in the temporary "
+            "directory by default."
+        ),
+    )
+    stream: bool = Field(
+        False,
+        description=(
+            "Parse N-Triples, N-Quads or Turtle documents incrementally, storing the "
+            "triples as N-Triples chunks in the data cache. Only a manifest is put in "
+            "the session."
+        ),
+    )
+    stream_chunk_size: int = Field(
+        100_000, description="Number of triples per chunk in streaming mode.", gt=0
+    )
 
 
 class RDFParseConfig(ResourceConfig):
@@ -37,10 +107,48 @@ class RDFParseConfig(ResourceConfig):
     )
 
 
+class RDFGraphReference(AttrDict):
+    """Reference to a parsed graph stored in the data cache.
+
+    Use [`graph_from_bytes()`][oteapi_ontokb_plugin.utils.rdf.graph_from_bytes] on
+    the cached value to load it.
+    """
+
+    key: str = Field(..., description="Data cache key of the serialized graph.")
+    content_hash: str = Field(..., description="Hash of the parsed document.")
+    triples: int = Field(..., description="Number of triples in the graph.")
+
+
+class RDFStreamManifest(AttrDict):
+    """Manifest of a document parsed in streaming mode."""
+
+    chunks: List[str] = Field(
+        ..., description="Data cache keys of the N-Triples (or N-Quads) chunks."
+    )
+    counts: List[int] = Field(..., description="Number of triples in each chunk.")
+    triples: int = Field(..., description="Total number of triples.")
+    prefixes: Dict[str, str] = Field(
+        {}, description="Prefixes declared in the document."
+    )
+    rdf_format: str = Field(..., description="Format of the chunks, `nt` or `nquads`.")
+
+
 class SessionUpdateRDFParse(SessionUpdate):
     """Class for returning values from RDF Parse."""
 
-    content: str = Field(..., description="Content of the RDF document.")
+    content: Optional[str] = Field(None, description="Content of the RDF document.")
+    reference: Optional[DataReference] = Field(
+        None, description="Reference to the RDF document in the data cache."
+    )
+    file: Optional[SpilledFile] = Field(
+        None, description="Reference to the RDF document spilled to local disk."
+    )
+    graph: Optional[RDFGraphReference] = Field(
+        None, description="Reference to the parsed graph."
+    )
+    stream: Optional[RDFStreamManifest] = Field(
+        None, description="Manifest of the document parsed in streaming mode."
+    )
 
 
 @dataclass
@@ -59,12 +167,188 @@ class RDFDataParseStrategy:
     def get(self, session: "Optional[Dict[str, Any]]" = None) -> SessionUpdateRDFParse:
         """Parse json."""
 
-        downloader = create_strategy("download", self.parse_config)
-        output = downloader.get()
-        cache = DataCache(self.parse_config.configuration.datacache_config)
-        content = cache.get(output["key"])
-        print(type(content))
+        if self.parse_config.configuration.stream:
+            return SessionUpdateRDFParse(stream=self._parse_stream())
+        if self.parse_config.configuration.spill:
+            return SessionUpdateRDFParse(file=self._spill())
+        if self.parse_config.configuration.graph:
+            return SessionUpdateRDFParse(graph=self._parse_graph())
+
+        key = self._download()
+        cache = self._cache()
+        if self.parse_config.configuration.by_reference:
+            # The downloaded document is already in the data cache
+            reference = reference_cached(cache, key, self.parse_config.mediaType)
+            with timed("session_update"):
+                return SessionUpdateRDFParse(reference=reference)
+
+        with timed("cache_read"):
+            content = cache.get(key)
+
+        with timed("session_update"):
+            return SessionUpdateRDFParse(content=content)
+
+    def _parse_graph(self) -> RDFGraphReference:
+        """Parse the document into a graph stored in the data cache.
+
+        Unchanged sources (see `_source_key()`) skip both the download and the
+        parsing.
+        """
+        # pylint: disable=import-outside-toplevel
+        from oteapi.datacache.datacache import gethash
+
+        cache = self._cache()
+        url = self.parse_config.downloadUrl
+
+        source_key = self._source_key()
+        if source_key is not None:
+            reference = cache.diskcache.get(source_key, default=None)
+            if reference is not None and reference["key"] in cache:
+                LOGGER.debug("Unchanged source, using the cached graph")
+                return RDFGraphReference(**reference)
+
+        download_key = self._download()
+        with timed("cache_read"):
+            content = cache.get(download_key)
+
+        content_hash = gethash(content)
+        key = "rdf-graph-" + content_hash
+        triples = cache.diskcache.get(key + "-triples", default=None)
+        if key not in cache or triples is None:
+            LOGGER.debug("Parsing the document")
+            rdf_format = self.parse_config.configuration.rdf_format or guess_format(
+                url.path if url is not None else None
+            )
+            graph = parse_graph(content, rdf_format)
+            triples = len(graph)
+            cache.add(graph_to_bytes(graph), key=key, tag=cache.config.tag)
+            cache.add(triples, key=key + "-triples", tag=cache.config.tag)
+
+        reference = RDFGraphReference(
+            key=key, content_hash=content_hash, triples=triples
+        )
+        if source_key is not None:
+            cache.add(reference.dict(), key=source_key)
+        return reference
 
-        # print("[RDF PARSER PLUGIN]: Content is " + content)
+    def _source_key(self) -> "Optional[str]":
+        """Return a key identifying the current version of the document, if it can
+        be known without downloading it.
 
-        return SessionUpdateRDFParse(content=content)
\ No newline at end of file
+        Local files are identified by their path, size and modification time. HTTP
+        documents by their `ETag` or `Last-Modified` header, from a `HEAD` request.
+        """
+        # pylint: disable=import-outside-toplevel
+        from oteapi.datacache.datacache import gethash
+
+        url = self.parse_config.downloadUrl
+        if url is None:
+            return None
+        if url.scheme == "file":
+            stat = os.stat(uri_to_path(url))
+            return "rdf-source-" + gethash([str(url), stat.st_size, stat.st_mtime_ns])
+        if url.scheme not in ("http", "https"):
+            return None
+
+        import requests
+
+        try:
+            response = requests.head(
+                str(url), allow_redirects=True, timeout=HEAD_TIMEOUT
+            )
+        except requests.RequestException as exc:
+            LOGGER.debug("Cannot check whether %s changed: %s", url, exc)
+            return None
+        validators = [
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        ]
+        if not response.ok or not any(validators):
+            return None
+        return "rdf-source-" + gethash(
+            [str(url), *validators, response.headers.get("Content-Length")]
+        )
+
+    def _parse_stream(self) -> RDFStreamManifest:
+        """Parse the document incrementally into N-Triples chunks.
+
+        Only the current chunk of triples is held in memory. Local files are read
+        directly, other documents from the data cache once downloaded.
+        """
+        config = self.parse_config.configuration
+        cache = self._cache()
+        url = self.parse_config.downloadUrl
+        rdf_format = config.rdf_format or guess_format(
+            url.path if url is not None else None
+        )
+        if rdf_format not in ("nt", "nquads", "turtle"):
+            raise ValueError(
+                "Streaming is only supported for N-Triples, N-Quads and Turtle "
+                f"documents, not {rdf_format!r}."
+            )
+
+        prefixes: "Dict[str, str]" = {}
+        chunks: "List[str]" = []
+        counts: "List[int]" = []
+        lines: "List[str]" = []
+
+        def _flush() -> None:
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            chunks.append(cache.add(data, tag=cache.config.tag))
+            counts.append(len(lines))
+            lines.clear()
+
+        with self._open_source(cache) as handle:
+            for line in iter_ntriples(handle, rdf_format, prefixes=prefixes):
+                lines.append(line)
+                if len(lines) >= config.stream_chunk_size:
+                    _flush()
+        if lines:
+            _flush()
+
+        return RDFStreamManifest(
+            chunks=chunks,
+            counts=counts,
+            triples=sum(counts),
+            prefixes=prefixes,
+            rdf_format="nquads" if rdf_format == "nquads" else "nt",
+        )
+
+    def _spill(self) -> SpilledFile:
+        """Copy the document to a content-addressed file, chunk by chunk."""
+        url = self.parse_config.downloadUrl
+        suffix = ""
+        if url is not None and url.path and "." in url.path.rsplit("/", 1)[-1]:
+            suffix = "." + url.path.rsplit(".", 1)[-1].lower()
+        with self._open_source(self._cache()) as handle:
+            return spill(handle, self.parse_config.configuration.spill_dir, suffix)
+
+    @contextmanager
+    def _open_source(self, cache: "DataCache") -> "Iterator[BinaryIO]":
+        """Open the document in binary mode."""
+        url = self.parse_config.downloadUrl
+        if url is not None and url.scheme == "file":
+            with open(uri_to_path(url), "rb") as handle:
+                yield handle
+            return
+
+        with open_cached(cache, self._download()) as handle:
+            yield handle
+
+    def _cache(self) -> "DataCache":
+        """Return the data cache, importing it on first use."""
+        from oteapi.datacache import (  # pylint: disable=import-outside-toplevel
+            DataCache,
+        )
+
+        return DataCache(self.parse_config.configuration.datacache_config)
+
+    def _download(self) -> str:
+        """Download the document, returning its data cache key."""
+        from oteapi.plugins import (  # pylint: disable=import-outside-toplevel
+            create_strategy,
+        )
+
+        downloader = create_strategy("download", self.parse_config)
+        with timed("download"):
+            return downloader.get()["key"]
@@ -1,14 +1,110 @@
 """ONTOKB resource strategy class."""
 # pylint: disable=no-self-use,unused-argument
-from typing import TYPE_CHECKING
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional
 
-import requests
-from oteapi.models import AttrDict, ResourceConfig, SessionUpdate
+from oteapi.models import AttrDict, DataCacheConfig, ResourceConfig, SessionUpdate
 from pydantic import Field
 from pydantic.dataclasses import dataclass
 
+from oteapi_ontokb_plugin.utils.columnar import ColumnarResult
+from oteapi_ontokb_plugin.utils.compression import (
+    CompressionConfig,
+    accept_encoding,
+    iter_body,
+    pack,
+    read_body,
+)
+from oteapi_ontokb_plugin.utils.federation import FederationConfig, ResultMerger
+from oteapi_ontokb_plugin.utils.jsonbackend import dumps, loads
+from oteapi_ontokb_plugin.utils.localquery import (
+    SPARQL_JSON,
+    prepare_query,
+    query_graph,
+    session_graph,
+)
+from oteapi_ontokb_plugin.utils.metrics import ROWS, enabled, increment, timed
+from oteapi_ontokb_plugin.utils.pool import PoolConfig, get_session
+from oteapi_ontokb_plugin.utils.querycache import (
+    QueryCacheConfig,
+    QueryResultCache,
+    normalize_query,
+)
+from oteapi_ontokb_plugin.utils.reference import DataReference, store_reference
+from oteapi_ontokb_plugin.utils.resilience import (
+    ResilienceConfig,
+    get_tracker,
+    resilient_call,
+)
+from oteapi_ontokb_plugin.utils.resultstream import SelectResultStream
+from oteapi_ontokb_plugin.utils.singleflight import SingleFlight
+from oteapi_ontokb_plugin.utils.sparql import split_values_result
+
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import Any, Dict, Optional
+    from concurrent.futures import Future
+    from typing import Any, Callable, Iterable, Iterator, Tuple
+
+    from oteapi.datacache import DataCache
+    from requests import Response
+
+    from oteapi_ontokb_plugin.utils.pool import PooledSession
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Content type of the query results served from the query cache
+DEFAULT_CONTENT_TYPE = "application/json"
+
+# Query reading the whole database for paged exports
+EXPORT_QUERY = "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"
+
+# Queries in flight, shared by identical queries of concurrent sessions
+_QUERIES = SingleFlight()
+
+# Requests started by initialize(), by target, with their start time
+_PREFETCHED: "Dict[Tuple[Any, ...], Tuple[float, Future]]" = {}
+_PREFETCH_LOCK = threading.Lock()
+_PREFETCH_EXECUTOR: "Optional[ThreadPoolExecutor]" = None
+
+
+def _prefetch(
+    key: "Tuple[Any, ...]", ttl: float, fetch: "Callable[[], Tuple[bytes, str]]"
+) -> None:
+    """Start `fetch` in the background, unless `key` is already prefetched."""
+    global _PREFETCH_EXECUTOR  # pylint: disable=global-statement
+    with _PREFETCH_LOCK:
+        _expire(ttl)
+        if key in _PREFETCHED:
+            return
+        if _PREFETCH_EXECUTOR is None:
+            _PREFETCH_EXECUTOR = ThreadPoolExecutor(
+                max_workers=8, thread_name_prefix="ontokb-prefetch"
+            )
+        _PREFETCHED[key] = (time.monotonic(), _PREFETCH_EXECUTOR.submit(fetch))
+
+
+def _prefetched(key: "Tuple[Any, ...]", ttl: float) -> "Optional[Future]":
+    """Return (and forget) the background request of `key`, if any."""
+    with _PREFETCH_LOCK:
+        _expire(ttl)
+        entry = _PREFETCHED.pop(key, None)
+    return None if entry is None else entry[1]
+
+
+def _expire(ttl: float) -> None:
+    """Forget the background requests older than `ttl` seconds.
+
+    Must be called with `_PREFETCH_LOCK` held.
+    """
+    now = time.monotonic()
+    for key, (start, future) in list(_PREFETCHED.items()):
+        if now - start > ttl:
+            future.cancel()
+            del _PREFETCHED[key]
 
 
 class OntoKBConfig(AttrDict):
@@ -18,6 +114,144 @@ class OntoKBConfig(AttrDict):
         ...,
         description=("The database to connect to"),
     )
+    databases: Optional[List[str]] = Field(
+        None,
+        description=(
+            "Databases `sparql_query` is federated over, instead of `database`. "
+            "The query is sent to all of them in parallel and the results merged."
+        ),
+    )
+    access_urls: Optional[List[str]] = Field(
+        None,
+        description=(
+            "Additional OntoREC instances `sparql_query` is federated over, "
+            "besides `accessUrl`. Every database is queried on every instance."
+        ),
+    )
+    federation: FederationConfig = Field(
+        FederationConfig(),
+        description="Merging of the results of federated queries.",
+    )
+    pool_config: PoolConfig = Field(
+        PoolConfig(),
+        description="Configuration of the pooled HTTP connections towards OntoREC.",
+    )
+    resilience: ResilienceConfig = Field(
+        ResilienceConfig(),
+        description=(
+            "Deadlines, retries and hedging of the queries and exports sent to "
+            "OntoREC."
+        ),
+    )
+    query_cache: QueryCacheConfig = Field(
+        QueryCacheConfig(),
+        description="Configuration of the SPARQL query result cache.",
+    )
+    local: bool = Field(
+        False,
+        description=(
+            "Evaluate `sparql_query` in-process over the RDF document already in the "
+            "pipeline (`graph`, `reference` or `content` in the session, left by the "
+            "`application/rdf` parse strategy), instead of sending it to OntoREC. "
+            "OntoREC is used when there is no such document, with reasoning, and for "
+            "queries other than SELECT and ASK. Requires rdflib."
+        ),
+    )
+    prefetch: bool = Field(
+        False,
+        description=(
+            "Check in `initialize()` that the database exists, and start the query "
+            "(`sparql_query` in the session) or the read of the whole database in "
+            "the background. `get()` then waits for its result."
+        ),
+    )
+    prefetch_ttl: float = Field(
+        300.0,
+        description=(
+            "Time (seconds) after which the result of a request started by "
+            "`initialize()` and not used by `get()` is discarded."
+        ),
+        gt=0,
+    )
+    coalesce: bool = Field(
+        True,
+        description=(
+            "Share the result of a query with the identical queries (same OntoREC "
+            "instance, database, query and reasoning) sent while it is in flight, "
+            "instead of sending them too."
+        ),
+    )
+    result_format: Literal["json", "columnar", "raw", "reference", "stream"] = Field(
+        "json",
+        description=(
+            "Format of the result of `sparql_query` (or of the whole database): the "
+            "SPARQL-JSON result in the session, a compact columnar result stored in "
+            "the data cache, the raw response body stored in the data cache, "
+            "without decoding it, the SPARQL-JSON result stored in the data "
+            "cache, with only a reference to it in the session, or the rows of a "
+            "SELECT result decoded as they are received and stored in the data "
+            "cache in batches (`sparql_query` only)."
+        ),
+    )
+    stream_batch_size: int = Field(
+        10000,
+        description="Rows per batch stored in the data cache, for streamed results.",
+        gt=0,
+    )
+    max_rows: Optional[int] = Field(
+        None,
+        description=(
+            "Maximum number of rows of a streamed result. The transfer is stopped "
+            "once reached, and the result flagged as truncated."
+        ),
+        gt=0,
+    )
+    max_bytes: Optional[int] = Field(
+        None,
+        description=(
+            "Maximum number of bytes of a streamed result (decoded response body). "
+            "The transfer is stopped once exceeded, and the result flagged as "
+            "truncated."
+        ),
+        gt=0,
+    )
+    fast_json: bool = Field(
+        False,
+        description=(
+            "Decode the JSON responses with orjson if it is installed, with the "
+            "standard library otherwise."
+        ),
+    )
+    max_concurrency: int = Field(
+        8,
+        description=(
+            "Maximum number of named queries (`sparql_queries` in the session), or "
+            "of sources of a federated query, executed concurrently. Should not "
+            "exceed `pool_config.pool_maxsize`."
+        ),
+    )
+    export_page_size: Optional[int] = Field(
+        None,
+        gt=0,
+        description=(
+            "When no query is given, export the database in pages of this many "
+            "triples, stored in the data cache, instead of a single response."
+        ),
+    )
+    compression: CompressionConfig = Field(
+        CompressionConfig(),
+        description=(
+            "Compression of the responses of OntoREC and of the payloads stored in "
+            "the data cache."
+        ),
+    )
+    datacache_config: Optional[DataCacheConfig] = Field(
+        None,
+        description=(
+            "Configurations for the data cache for storing the exported pages and "
+            "columnar results."
+        ),
+    )
 
 
 class OntoKBResourceConfig(ResourceConfig):
@@ -29,10 +263,104 @@ class OntoKBResourceConfig(ResourceConfig):
     )
 
 
+class OntoKBExportManifest(AttrDict):
+    """Manifest of a paged database export."""
+
+    pages: List[str] = Field(
+        ..., description="Data cache keys of the pages, in export order."
+    )
+    page_size: int = Field(..., description="Maximum number of triples per page.")
+    triples: int = Field(..., description="Total number of exported triples.")
+
+
+class OntoKBColumnarResult(AttrDict):
+    """Reference to a query result stored in columnar form in the data cache.
+
+    Use [`load_columnar()`][oteapi_ontokb_plugin.utils.columnar.load_columnar] to
+    load it.
+    """
+
+    key: str = Field(..., description="Data cache key of the columnar result.")
+    variables: List[str] = Field(..., description="The projected variables.")
+    rows: int = Field(..., description="Number of rows.")
+
+
+class OntoKBRawResult(AttrDict):
+    """Reference to a raw response body stored in the data cache.
+
+    Use [`load_cached()`][oteapi_ontokb_plugin.utils.compression.load_cached] to
+    load it.
+    """
+
+    key: str = Field(..., description="Data cache key of the response body.")
+    content_type: str = Field(..., description="Content type of the response body.")
+    size: int = Field(..., description="Size of the response body in bytes.")
+
+
+class OntoKBStreamManifest(AttrDict):
+    """Manifest of a SELECT result streamed to the data cache in batches.
+
+    Every batch is a JSON array of rows (SPARQL-JSON bindings). Use
+    [`iter_stored_batches()`][oteapi_ontokb_plugin.utils.resultstream.iter_stored_batches]
+    to load them.
+    """
+
+    batches: List[str] = Field(
+        ..., description="Data cache keys of the batches, in result order."
+    )
+    counts: List[int] = Field(..., description="Number of rows of every batch.")
+    variables: List[str] = Field(..., description="The projected variables.")
+    rows: int = Field(..., description="Total number of rows.")
+    size: int = Field(..., description="Number of bytes of the result read.")
+    truncated: bool = Field(
+        False, description="Whether the result was cut by `max_rows` or `max_bytes`."
+    )
+
+
+class OntoKBSourceReport(AttrDict):
+    """Outcome of a federated query on one of its sources."""
+
+    access_url: str = Field(..., description="The OntoREC instance.")
+    database: str = Field(..., description="The database.")
+    rows: int = Field(0, description="Number of rows returned by the source.")
+    seconds: float = Field(..., description="Duration of the query, in seconds.")
+    error: Optional[str] = Field(None, description="The error, if the query failed.")
+
+
 class SessionUpdateOntoKBResource(SessionUpdate):
     """Return model for `OntoKB resource strategy`."""
 
     ontokb_data: dict = Field({}, description="data retrieved from database")
+    ontokb_columnar: Optional[OntoKBColumnarResult] = Field(
+        None, description="Reference to the query result in columnar form."
+    )
+    ontokb_raw: Optional[OntoKBRawResult] = Field(
+        None, description="Reference to the raw response body."
+    )
+    ontokb_data_ref: Optional[DataReference] = Field(
+        None, description="Reference to the SPARQL-JSON result in the data cache."
+    )
+    ontokb_results: Optional[Dict[str, dict]] = Field(
+        None, description="Results of the named queries, keyed by query name."
+    )
+    ontokb_binding_results: Optional[List[dict]] = Field(
+        None,
+        description="Results of a templated query, in the order of its bindings.",
+    )
+    ontokb_export: Optional[OntoKBExportManifest] = Field(
+        None, description="Manifest of the pages of a paged database export."
+    )
+    ontokb_stream: Optional[OntoKBStreamManifest] = Field(
+        None, description="Manifest of the batches of a streamed query result."
+    )
+    ontokb_sources: Optional[List[OntoKBSourceReport]] = Field(
+        None, description="Outcome of a federated query on each of its sources."
+    )
+
+
+def _transient(response: "Response", resilience: ResilienceConfig) -> bool:
+    """Whether the status of `response` is worth retrying."""
+    return response.status_code in resilience.retry_statuses
 
 
 @dataclass
@@ -42,13 +370,75 @@ class OntoKBResourceStrategy:
     resource_config: OntoKBResourceConfig
 
     def initialize(self, session: "Optional[Dict[str, Any]]" = None) -> SessionUpdate:
-        """Initialize strategy."""
+        """Initialize strategy.
+
+        With `prefetch`, check that the database exists and start the request of
+        `get()` in the background, if it is already known.
+        """
+        configuration = self.resource_config.configuration
+        if configuration.prefetch:
+            key = self._prefetch_key(session)
+            if key is not None:
+                LOGGER.debug("Prefetching %s", key)
+                query = session.get("sparql_query") if session else None
+                fetch: "Callable[[], Tuple[bytes, str]]" = self._fetch_database
+                if query:
+                    fetch = partial(self._fetch, query, key[3])
+                _prefetch(key, configuration.prefetch_ttl, fetch)
 
-        # Validation part
-        # Check if database actually exists
+            # Validation part
+            # Check if database actually exists, while the request is in flight
+            try:
+                self._fetch("ASK {}", False, check=True)
+            except Exception:
+                if key is not None:
+                    _prefetched(key, configuration.prefetch_ttl)
+                raise
 
         return SessionUpdate()
 
+    def _prefetch_key(
+        self, session: "Optional[Dict[str, Any]]"
+    ) -> "Optional[Tuple[Any, ...]]":
+        """Return the key of the request of `get()` that can be prefetched.
+
+        Single queries and reads of the whole database can be prefetched, not named,
+        federated, in-process (`local`) queries or paged exports.
+        """
+        configuration = self.resource_config.configuration
+        if session and session.get("sparql_queries"):
+            return None
+        if configuration.databases or configuration.access_urls:
+            return None
+        target = (
+            str(self.resource_config.accessUrl).rstrip("/"),
+            configuration.database,
+        )
+        if session and session.get("sparql_query"):
+            if configuration.result_format == "stream":
+                return None
+            reasoning = session["reasoning"] if "reasoning" in session else False
+            if configuration.local and not reasoning:
+                return None
+            return (*target, normalize_query(session["sparql_query"]), reasoning)
+        if configuration.export_page_size:
+            return None
+        return (*target, None, False)
+
+    def _take_prefetched(
+        self, session: "Optional[Dict[str, Any]]"
+    ) -> "Optional[Tuple[bytes, str]]":
+        """Return the result of the request prefetched by `initialize()`, if any."""
+        configuration = self.resource_config.configuration
+        if not configuration.prefetch:
+            return None
+        key = self._prefetch_key(session)
+        future = None if key is None else _prefetched(key, configuration.prefetch_ttl)
+        if future is None or future.cancelled():
+            return None
+        LOGGER.debug("Using the prefetched result")
+        return future.result()
+
     def get(
         self, session: "Optional[Dict[str, Any]]" = None
     ) -> SessionUpdateOntoKBResource:
@@ -65,32 +455,545 @@ class OntoKBResourceStrategy:
             dictionary context.
 
         """
-        print("[ONTOKB PLUGIN]: Session " + str(session))
+        configuration = self.resource_config.configuration
+        result_format = configuration.result_format
+        result: "Dict[str, Any]" = {}
+        if session and session.get("sparql_queries"):
+            # Named SPARQL queries defined, run them concurrently
+            LOGGER.debug("Getting data of named queries")
+            federated = configuration.databases or configuration.access_urls
+            if result_format != "json" or federated:
+                raise ValueError(
+                    "Named queries are sent to `database` only, and their results "
+                    "returned in the session with the json result format."
+                )
+            reasoning = session["reasoning"] if "reasoning" in session else False
+            results = self._query_all(session["sparql_queries"], reasoning)
+
+            binding_results = None
+            if session.get("sparql_bindings"):
+                # Split the results of the batched template queries per binding
+                bindings = session["sparql_bindings"]
+                binding_results = []
+                for name, batch in bindings["batches"].items():
+                    binding_results.extend(
+                        split_values_result(
+                            results.pop(name),
+                            bindings["variables"],
+                            batch,
+                            bindings["added"],
+                        )
+                    )
+
+            return self._session_update(
+                ontokb_results=results if results else None,
+                ontokb_binding_results=binding_results,
+            )
 
-        result = {}
-        if session and "sparql_query" in session and session["sparql_query"] != "":
+        if session and session.get("sparql_query"):
             # SPARQL query defined
-            print("[ONTOKB PLUGIN]: Getting query data")
+            LOGGER.debug("Getting query data")
             reasoning = session["reasoning"] if "reasoning" in session else False
-            url = (
-                self.resource_config.accessUrl
-                + "/databases/"
-                + self.resource_config.configuration.database
-                + "/query"
+            if configuration.databases or configuration.access_urls:
+                if result_format in ("raw", "stream"):
+                    raise ValueError(
+                        f"The {result_format} result format is not supported for "
+                        "federated queries, their results are merged."
+                    )
+                result, sources = self._federate(session["sparql_query"], reasoning)
+                if result_format == "columnar":
+                    return self._session_update(
+                        ontokb_columnar=self._store_columnar(result),
+                        ontokb_sources=sources,
+                    )
+                if result_format == "reference":
+                    return self._session_update(
+                        ontokb_data_ref=self._store_reference(
+                            dumps(result, configuration.fast_json),
+                            DEFAULT_CONTENT_TYPE,
+                        ),
+                        ontokb_sources=sources,
+                    )
+                return self._session_update(ontokb_data=result, ontokb_sources=sources)
+
+            if result_format == "stream":
+                return self._session_update(
+                    ontokb_stream=self._stream(session, reasoning)
+                )
+
+            fetched = (
+                self._query_local(session, reasoning)
+                or self._take_prefetched(session)
+                or self._fetch(session["sparql_query"], reasoning)
+            )
+            if result_format == "raw":
+                return self._session_update(ontokb_raw=self._store_raw(*fetched))
+            if result_format == "reference":
+                return self._session_update(
+                    ontokb_data_ref=self._store_reference(*fetched)
+                )
+
+            result = self._decode(fetched[0])
+            if result_format == "columnar":
+                return self._session_update(
+                    ontokb_columnar=self._store_columnar(result)
+                )
+
+        elif configuration.export_page_size:
+            # SPARQL query doesn't exists, export the database page by page
+            LOGGER.debug("Exporting all the data")
+            return self._session_update(
+                ontokb_export=self._export(configuration.export_page_size)
             )
-            response = requests.post(url, json={'query': session["sparql_query"], 'reasoning': reasoning})
-            
+
         else:
             # SPARQL query doesn't exists
-            print("[ONTOKB PLUGIN]: Getting all the data")
-            url = (
-                self.resource_config.accessUrl
-                + "/databases/"
-                + self.resource_config.configuration.database
+            LOGGER.debug("Getting all the data")
+            fetched = self._take_prefetched(session) or self._fetch_database()
+            if result_format == "raw":
+                return self._session_update(ontokb_raw=self._store_raw(*fetched))
+            if result_format == "reference":
+                return self._session_update(
+                    ontokb_data_ref=self._store_reference(*fetched)
+                )
+            result = self._decode(fetched[0])
+
+        # Save result in session
+        return self._session_update(ontokb_data=result)
+
+    def _session_update(self, **fields: "Any") -> SessionUpdateOntoKBResource:
+        """Create the session update, timed as the `session_update` phase."""
+        with timed("session_update"):
+            return SessionUpdateOntoKBResource(**fields)
+
+    def _decode(self, content: bytes) -> dict:
+        """Decode a SPARQL-JSON result, counting its rows."""
+        with timed("json_decode"):
+            result = loads(content, self.resource_config.configuration.fast_json)
+        if enabled() and isinstance(result, dict):
+            increment(ROWS, len(result.get("results", {}).get("bindings", ())))
+        return result
+
+    def _cache(self) -> "DataCache":
+        """Return the data cache storing the exported pages and results."""
+        from oteapi.datacache import (  # pylint: disable=import-outside-toplevel
+            DataCache,
+        )
+
+        return DataCache(self.resource_config.configuration.datacache_config)
+
+    def _store(self, cache: "DataCache", content: bytes) -> str:
+        """Store `content` in the data cache, keyed by its hash."""
+        from oteapi.datacache.datacache import (  # pylint: disable=import-outside-toplevel
+            gethash,
+        )
+
+        return cache.add(
+            pack(content, self.resource_config.configuration.compression),
+            key=gethash(content, hashtype=cache.config.hashType),
+            tag=cache.config.tag,
+        )
+
+    def _store_columnar(self, result: dict) -> "OntoKBColumnarResult":
+        """Store a SELECT result in the data cache in columnar form."""
+        columnar = ColumnarResult.from_sparql_json(result)
+        key = self._store(self._cache(), columnar.to_bytes())
+        return OntoKBColumnarResult(
+            key=key, variables=columnar.variables, rows=columnar.rows
+        )
+
+    def _store_raw(self, content: bytes, content_type: str) -> OntoKBRawResult:
+        """Store a response body in the data cache as is."""
+        key = self._store(self._cache(), content)
+        return OntoKBRawResult(key=key, content_type=content_type, size=len(content))
+
+    def _store_reference(self, content: bytes, content_type: str) -> DataReference:
+        """Store a SPARQL-JSON result in the data cache, returning its reference."""
+        return store_reference(
+            self._cache(),
+            content,
+            content_type,
+            self.resource_config.configuration.compression,
+        )
+
+    def _client(
+        self, access_url: "Optional[str]" = None, resilient: bool = False
+    ) -> "PooledSession":
+        """Return the pooled session towards OntoREC, `accessUrl` by default.
+
+        The requests retried by `resilient_call()` go through a session without
+        retries of its own, so that both levels of retries do not multiply.
+        """
+        pool_config = self.resource_config.configuration.pool_config
+        if resilient:
+            pool_config = pool_config.copy(update={"retries": 0})
+        return get_session(access_url or self.resource_config.accessUrl, pool_config)
+
+    def _headers(self) -> "Dict[str, str]":
+        """Return the headers of the requests towards OntoREC."""
+        return {
+            "Accept-Encoding": accept_encoding(
+                self.resource_config.configuration.compression.accept_encoding
             )
-            response = requests.get(url)
+        }
 
-        result = response.json()
+    def _read(
+        self,
+        method: str,
+        url: str,
+        access_url: "Optional[str]" = None,
+        database: "Optional[str]" = None,
+        **kwargs: "Any",
+    ) -> "Tuple[Response, bytes]":
+        """Send a read request, with the configured deadline, retries and hedging.
 
-        # Save result in session
-        return SessionUpdateOntoKBResource(ontokb_data=result)
+        Parameters:
+            method: The HTTP method.
+            url: The URL of the request.
+            access_url: The OntoREC instance, `accessUrl` by default.
+            database: The database, `database` by default.
+            **kwargs: Additional arguments of the request.
+
+        Returns:
+            The response and its decompressed body.
+
+        """
+        configuration = self.resource_config.configuration
+        resilience = configuration.resilience
+        client = self._client(access_url, resilient=True)
+
+        def _attempt(timeout: "Optional[float]") -> "Tuple[Response, bytes]":
+            options = dict(kwargs, timeout=timeout) if timeout is not None else kwargs
+            with client.request(
+                method, url, headers=self._headers(), stream=True, **options
+            ) as response:
+                content = read_body(response)
+            return response, content
+
+        def _should_retry(result: "Tuple[Response, bytes]") -> bool:
+            return _transient(result[0], resilience)
+
+        return resilient_call(
+            _attempt,
+            resilience,
+            get_tracker(
+                access_url or self.resource_config.accessUrl,
+                database or configuration.database,
+                resilience.window,
+            ),
+            should_retry=_should_retry,
+        )
+
+    def _query_all(
+        self, queries: "Dict[str, str]", reasoning: bool
+    ) -> "Dict[str, dict]":
+        """Execute named SPARQL queries concurrently.
+
+        At most `max_concurrency` queries are in flight at the same time.
+
+        Returns:
+            The query results, keyed by query name.
+
+        """
+        max_workers = max(
+            min(self.resource_config.configuration.max_concurrency, len(queries)), 1
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                name: executor.submit(self._query, query, reasoning)
+                for name, query in queries.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+
+    def _query(self, query: str, reasoning: bool) -> dict:
+        """Execute a SPARQL query and decode its result."""
+        return self._decode(self._fetch(query, reasoning)[0])
+
+    def _fetch(
+        self,
+        query: str,
+        reasoning: bool,
+        access_url: "Optional[str]" = None,
+        database: "Optional[str]" = None,
+        check: bool = False,
+    ) -> "Tuple[bytes, str]":
+        """Execute a SPARQL query, going through the result cache if enabled.
+
+        Parameters:
+            query: The SPARQL query.
+            reasoning: Whether reasoning is enabled.
+            access_url: The OntoREC instance, `accessUrl` by default.
+            database: The database, `database` by default.
+            check: Raise an error for unsuccessful responses.
+
+        Returns:
+            The undecoded result and its content type.
+
+        """
+        configuration = self.resource_config.configuration
+        access_url = access_url or self.resource_config.accessUrl
+        database = database or configuration.database
+        url = access_url + "/databases/" + database + "/query"
+
+        cache = (
+            QueryResultCache(configuration.query_cache, configuration.compression)
+            if configuration.query_cache.enabled
+            else None
+        )
+        if cache is not None:
+            key = cache.key(access_url, database, query, reasoning)
+            with timed("cache_read"):
+                content = cache.get(key)
+            if content is not None:
+                LOGGER.debug("Cached query result")
+                return content, DEFAULT_CONTENT_TYPE
+
+        def _request() -> "Tuple[Response, bytes]":
+            response, content = self._read(
+                "POST",
+                url,
+                access_url,
+                database,
+                json={"query": query, "reasoning": reasoning},
+            )
+            if cache is not None and response.ok:
+                cache.add(key, content)
+            return response, content
+
+        if configuration.coalesce:
+            (response, content), shared = _QUERIES.run(
+                (
+                    str(access_url).rstrip("/"),
+                    database,
+                    normalize_query(query),
+                    reasoning,
+                ),
+                _request,
+            )
+            if shared:
+                LOGGER.debug("Query result shared with an identical query")
+        else:
+            response, content = _request()
+        if check:
+            response.raise_for_status()
+
+        return content, response.headers.get("Content-Type", DEFAULT_CONTENT_TYPE)
+
+    def _query_local(
+        self, session: "Dict[str, Any]", reasoning: bool
+    ) -> "Optional[Tuple[bytes, str]]":
+        """Evaluate `sparql_query` over the RDF document of the session, if enabled
+        and possible.
+
+        Returns:
+            The SPARQL-JSON result and its content type, or `None` if the query must
+            be sent to OntoREC.
+
+        """
+        configuration = self.resource_config.configuration
+        if not configuration.local or reasoning:
+            return None
+        try:
+            query = prepare_query(session["sparql_query"])
+            if query is None:
+                return None
+            graph = session_graph(session, configuration.datacache_config)
+            if graph is None:
+                return None
+            content = query_graph(graph, query)
+        except ImportError:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.warning("In-process evaluation failed, querying OntoREC: %s", exc)
+            return None
+        LOGGER.debug("Query evaluated in-process")
+        return content, SPARQL_JSON
+
+    def _stream(
+        self, session: "Dict[str, Any]", reasoning: bool
+    ) -> OntoKBStreamManifest:
+        """Execute `sparql_query`, storing the rows of its result in batches as they
+        are received.
+
+        The request is not cached, coalesced, retried nor hedged: the rows are
+        consumed as they arrive.
+        """
+        local = self._query_local(session, reasoning)
+        if local is not None:
+            return self._store_stream([local[0]])
+
+        with self._send_query(session["sparql_query"], reasoning) as response:
+            response.raise_for_status()
+            # Closing the response before the end of the body aborts the transfer
+            return self._store_stream(iter_body(response))
+
+    def _send_query(self, query: str, reasoning: bool) -> "Response":
+        """Send a SPARQL query once, returning the response before its body is
+        read."""
+        configuration = self.resource_config.configuration
+        options = {}
+        if configuration.resilience.timeout is not None:
+            options["timeout"] = configuration.resilience.timeout
+        return self._client().request(
+            "POST",
+            f"{self.resource_config.accessUrl}/databases/{configuration.database}"
+            "/query",
+            headers=self._headers(),
+            stream=True,
+            json={"query": query, "reasoning": reasoning},
+            **options,
+        )
+
+    def _store_stream(self, chunks: "Iterable[bytes]") -> OntoKBStreamManifest:
+        """Decode the rows of a SELECT result incrementally, storing them in the
+        data cache in batches."""
+        configuration = self.resource_config.configuration
+        cache = self._cache()
+        stream = SelectResultStream(
+            chunks, configuration.max_rows, configuration.max_bytes
+        )
+
+        keys, counts = [], []
+        with timed("result_stream"):
+            for batch in stream.batches(configuration.stream_batch_size):
+                keys.append(self._store(cache, dumps(batch, configuration.fast_json)))
+                counts.append(len(batch))
+        if stream.truncated:
+            LOGGER.warning(
+                "Streamed result truncated after %d rows (%d bytes)",
+                stream.rows,
+                stream.size,
+            )
+        if enabled():
+            increment(ROWS, stream.rows)
+
+        return OntoKBStreamManifest(
+            batches=keys,
+            counts=counts,
+            variables=stream.variables,
+            rows=stream.rows,
+            size=stream.size,
+            truncated=stream.truncated,
+        )
+
+    def _fetch_database(self) -> "Tuple[bytes, str]":
+        """Read the whole database.
+
+        Returns:
+            The undecoded content and its content type.
+
+        """
+        url = (
+            self.resource_config.accessUrl
+            + "/databases/"
+            + self.resource_config.configuration.database
+        )
+        response, content = self._read("GET", url)
+        return content, response.headers.get("Content-Type", DEFAULT_CONTENT_TYPE)
+
+    def _sources(self) -> "List[Tuple[str, str]]":
+        """Return the `(access_url, database)` sources of a federated query."""
+        configuration = self.resource_config.configuration
+        access_urls = [str(self.resource_config.accessUrl).rstrip("/")]
+        for access_url in configuration.access_urls or []:
+            if access_url.rstrip("/") not in access_urls:
+                access_urls.append(access_url.rstrip("/"))
+        databases = list(dict.fromkeys(configuration.databases or [])) or [
+            configuration.database
+        ]
+        return [(url, database) for url in access_urls for database in databases]
+
+    def _federate(
+        self, query: str, reasoning: bool
+    ) -> "Tuple[dict, List[OntoKBSourceReport]]":
+        """Execute a SPARQL query on all the sources in parallel.
+
+        The results are merged as they arrive.
+
+        Returns:
+            The merged result, and the outcome of the query on every source.
+
+        Raises:
+            Exception: The error of the first failed source, if all sources failed
+                or partial results are not allowed.
+
+        """
+        configuration = self.resource_config.configuration
+        sources = self._sources()
+        federation = configuration.federation
+        merger = ResultMerger(
+            federation.distinct, federation.order_by, federation.limit
+        )
+
+        def _run(access_url: str, database: str) -> "Tuple[Any, float]":
+            start = time.monotonic()
+            try:
+                content, _ = self._fetch(
+                    query, reasoning, access_url, database, check=True
+                )
+                return self._decode(content), time.monotonic() - start
+            except Exception as exc:  # pylint: disable=broad-except
+                return exc, time.monotonic() - start
+
+        reports: "Dict[Tuple[str, str], OntoKBSourceReport]" = {}
+        errors: "List[Exception]" = []
+        max_workers = max(min(configuration.max_concurrency, len(sources)), 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_run, *source): source for source in sources}
+            for future in as_completed(futures):
+                access_url, database = source = futures[future]
+                result, seconds = future.result()
+                if isinstance(result, Exception):
+                    LOGGER.warning(
+                        "Federated query failed on %s/%s: %s",
+                        access_url,
+                        database,
+                        result,
+                    )
+                    errors.append(result)
+                    reports[source] = OntoKBSourceReport(
+                        access_url=access_url,
+                        database=database,
+                        seconds=seconds,
+                        error=f"{type(result).__name__}: {result}",
+                    )
+                    continue
+                merger.add(result)
+                reports[source] = OntoKBSourceReport(
+                    access_url=access_url,
+                    database=database,
+                    rows=len(result.get("results", {}).get("bindings", [])),
+                    seconds=seconds,
+                )
+
+        if errors and (len(errors) == len(sources) or not federation.allow_partial):
+            raise errors[0]
+        return merger.result(), [reports[source] for source in sources]
+
+    def _export(self, page_size: int) -> OntoKBExportManifest:
+        """Export the whole database, storing each page in the data cache."""
+        cache = self._cache()
+
+        keys = []
+        triples = 0
+        for content, rows in self._export_pages(page_size):
+            keys.append(self._store(cache, content))
+            triples += rows
+
+        return OntoKBExportManifest(pages=keys, page_size=page_size, triples=triples)
+
+    def _export_pages(self, page_size: int) -> "Iterator[Tuple[bytes, int]]":
+        """Yield the database content in pages of at most `page_size` triples.
+
+        The database is read through a single `SELECT ?s ?p ?o` query, whose rows
+        are decoded as they are received. Pages are SPARQL-JSON results, yielded as
+        bytes together with their number of rows. As for streamed results, the
+        request is not retried nor hedged.
+        """
+        fast_json = self.resource_config.configuration.fast_json
+        with self._send_query(EXPORT_QUERY, False) as response:
+            response.raise_for_status()
+            stream = SelectResultStream(iter_body(response))
+            for batch in stream.batches(page_size):
+                page = {"head": stream.head, "results": {"bindings": batch}}
+                yield dumps(page, fast_json), len(batch)
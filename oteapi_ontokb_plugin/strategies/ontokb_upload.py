@@ -1,17 +1,60 @@
 """ONTOKB resource strategy class for uploading."""
 # pylint: disable=no-self-use,unused-argument
+import io
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial
 from typing import TYPE_CHECKING, Optional
+from uuid import uuid4
 
-import requests
-from oteapi.datacache import DataCache
 from oteapi.models import AttrDict, DataCacheConfig, ResourceConfig, SessionUpdate
-from oteapi.plugins import create_strategy
-from oteapi.strategies.download.file import FileResourceConfig
+from oteapi.utils.paths import uri_to_path
 from pydantic import Field
 from pydantic.dataclasses import dataclass
 
+from oteapi_ontokb_plugin.utils.compression import (
+    CompressionConfig,
+    compress,
+    iter_compress,
+)
+from oteapi_ontokb_plugin.utils.delta import (
+    TripleFingerprint,
+    diff_hashes,
+    iter_triples,
+    iter_updates,
+    select_lines,
+)
+from oteapi_ontokb_plugin.utils.metrics import timed
+from oteapi_ontokb_plugin.utils.pool import PoolConfig, get_session
+from oteapi_ontokb_plugin.utils.querycache import bump_database_generation
+from oteapi_ontokb_plugin.utils.rdf import guess_format
+from oteapi_ontokb_plugin.utils.sharding import (
+    ShardingConfig,
+    iter_shards,
+    pad_shards,
+    shard_extension,
+)
+from oteapi_ontokb_plugin.utils.streaming import (
+    DEFAULT_CHUNK_SIZE,
+    hash_content,
+    iter_chunks,
+    iter_multipart,
+    open_cached,
+)
+
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import Any, Dict
+    from concurrent.futures import Future
+    from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Set, Tuple, Union
+
+    from oteapi.datacache import DataCache
+    from oteapi.strategies.download.file import FileResourceConfig
+    from requests import Session
+
+
+LOGGER = logging.getLogger(__name__)
 
 
 class OntoKBUploadConfig(AttrDict):
@@ -25,9 +68,12 @@ class OntoKBUploadConfig(AttrDict):
         None,
         description=("Name (with .rdf or .ttl extension) of the file to save"),
     )
-    fileConfig: Optional[FileResourceConfig] = Field(
+    fileConfig: Optional[ResourceConfig] = Field(
         None,
-        description=("Configuration for the file strategy"),
+        description=(
+            "Configuration for the file strategy, validated as such when the file "
+            "is read"
+        ),
     )
     datacache_config: Optional[DataCacheConfig] = Field(
         None,
@@ -36,6 +82,67 @@ class OntoKBUploadConfig(AttrDict):
             "content."
         ),
     )
+    pool_config: PoolConfig = Field(
+        PoolConfig(),
+        description="Configuration of the pooled HTTP connections towards OntoREC.",
+    )
+    streaming: bool = Field(
+        False,
+        description=(
+            "Stream the content to OntoREC in chunks (chunked transfer encoding) "
+            "instead of building the whole request body in memory."
+        ),
+    )
+    chunk_size: int = Field(
+        DEFAULT_CHUNK_SIZE, description="Size (in bytes) of the streamed chunks."
+    )
+    deduplicate: bool = Field(
+        False,
+        description=(
+            "Skip the upload if the content is the same as the last one uploaded to "
+            "the database by this plugin, according to the upload manifest kept in "
+            "the data cache. Changes made to the database by other clients are not "
+            "seen."
+        ),
+    )
+    delta: bool = Field(
+        False,
+        description=(
+            "Only send the triples added and removed since the previous upload of "
+            "the same filename to the database, as SPARQL updates."
+        ),
+    )
+    delta_threshold: float = Field(
+        0.2,
+        description=(
+            "Maximum fraction of changed triples for a delta upload, above which the "
+            "whole file is uploaded."
+        ),
+        ge=0,
+    )
+    update_path: str = Field(
+        "/databases/{database}/update",
+        description=(
+            "Path of the SPARQL update endpoint of OntoREC, relative to `accessUrl`."
+        ),
+    )
+    update_batch_size: int = Field(
+        1000, description="Maximum number of triples per SPARQL update.", gt=0
+    )
+    compression: CompressionConfig = Field(
+        CompressionConfig(),
+        description=(
+            "Compression of the request bodies and of the triple snapshots stored "
+            "for delta uploads."
+        ),
+    )
+    sharding: ShardingConfig = Field(
+        ShardingConfig(),
+        description=(
+            "Sharded upload of large ontologies, in parallel over pooled "
+            "connections. Not used for delta uploads."
+        ),
+    )
 
 
 class OntoKBResourceUploadConfig(ResourceConfig):
@@ -47,6 +154,62 @@ class OntoKBResourceUploadConfig(ResourceConfig):
     )
 
 
+class OntoKBShardReport(AttrDict):
+    """Report of a sharded upload."""
+
+    shards: int = Field(..., description="Number of shards uploaded.")
+    triples: int = Field(..., description="Number of triples uploaded.")
+    retries: int = Field(0, description="Number of shard uploads retried.")
+    cleared: int = Field(
+        0, description="Number of stale shards of a previous upload emptied."
+    )
+    seconds: float = Field(..., description="Duration (seconds) of the upload.")
+    throughput: float = Field(
+        ..., description="Overall throughput, in bytes uploaded per second."
+    )
+
+
+class SessionUpdateOntoKBUpload(SessionUpdate):
+    """Class for returning values from OntoKB Upload."""
+
+    skipped: bool = Field(
+        False, description="Whether the content was already present in the database."
+    )
+    content_hash: Optional[str] = Field(
+        None, description="SHA-256 hex digest of the content."
+    )
+    bytes_transferred: int = Field(0, description="Size of the uploaded content.")
+    time_saved: float = Field(
+        0.0,
+        description=(
+            "Duration (in seconds) of the original upload of the content, if skipped."
+        ),
+    )
+    delta: bool = Field(
+        False, description="Whether only the changed triples were uploaded."
+    )
+    triples_added: int = Field(0, description="Number of triples inserted.")
+    triples_removed: int = Field(0, description="Number of triples deleted.")
+    shards: Optional[OntoKBShardReport] = Field(
+        None, description="Report of the sharded upload, if sharded."
+    )
+
+
+def _upload_key(access_url: "Any", database: str) -> str:
+    """Return the cache key of the upload manifest entry of a database."""
+    return f"ontokb-upload:{str(access_url).rstrip('/')}:{database}"
+
+
+def _shards_key(access_url: "Any", database: str, filename: str) -> str:
+    """Return the cache key of the number of shards uploaded for a file."""
+    return f"ontokb-shards:{str(access_url).rstrip('/')}:{database}:{filename}"
+
+
+def _delta_key(access_url: "Any", database: str, filename: str) -> str:
+    """Return the cache key of the triple fingerprint of an uploaded file."""
+    return f"ontokb-delta:{str(access_url).rstrip('/')}:{database}:{filename}"
+
+
 @dataclass
 class OntoKBUploadStrategy:
     """Upload Strategy."""
@@ -55,13 +218,11 @@ class OntoKBUploadStrategy:
 
     def initialize(self, session: "Optional[Dict[str, Any]]" = None) -> SessionUpdate:
         """Initialize strategy."""
-
-        # Validation part
-        # Check if database actually exists
-
         return SessionUpdate()
 
-    def get(self, session: "Optional[Dict[str, Any]]" = None) -> SessionUpdate:
+    def get(
+        self, session: "Optional[Dict[str, Any]]" = None
+    ) -> SessionUpdateOntoKBUpload:
         """Execute the strategy.
 
         This method will be called through the strategy-specific endpoint of the
@@ -76,38 +237,383 @@ class OntoKBUploadStrategy:
 
         """
 
-        cache = DataCache(self.resource_config.configuration.datacache_config)
+        configuration = self.resource_config.configuration
+        cache = self._cache()
 
-        if cache.config.accessKey and cache.config.accessKey in cache:
-            print("[ONTOKB UPLOAD PLUGIN]: Cached data")
-            key = cache.config.accessKey
-        elif "key" in session:
-            print("[ONTOKB UPLOAD PLUGIN]: Found file strategy in pipeline")
-            key = session["key"]
+        client = get_session(self.resource_config.accessUrl, configuration.pool_config)
+
+        manifest_key = _upload_key(
+            self.resource_config.accessUrl, configuration.database
+        )
+        with self._open_source(cache, session) as source:
+            content_hash = None
+            if configuration.deduplicate:
+                content_hash, _ = hash_content(source, configuration.chunk_size)
+                uploaded = cache.diskcache.get(manifest_key, default=None)
+                if uploaded is not None and uploaded["content_hash"] == content_hash:
+                    LOGGER.info(
+                        "Content already uploaded as %s, skipping", uploaded["filename"]
+                    )
+                    return SessionUpdateOntoKBUpload(
+                        skipped=True,
+                        content_hash=content_hash,
+                        time_saved=uploaded["duration"],
+                    )
+
+            fingerprint = delta = None
+            delta_key = _delta_key(
+                self.resource_config.accessUrl,
+                configuration.database,
+                configuration.filename,
+            )
+            rdf_format = guess_format(configuration.filename)
+            # Named graphs are not tracked, N-Quads are always fully uploaded
+            if configuration.delta and rdf_format != "nquads":
+                try:
+                    fingerprint = TripleFingerprint.from_lines(
+                        iter_triples(source, rdf_format)
+                    )
+                except ValueError as exc:
+                    LOGGER.warning(
+                        "Cannot compute a delta, uploading the file: %s", exc
+                    )
+                    # The previous fingerprint does not describe the new content
+                    cache.diskcache.delete(delta_key)
+                else:
+                    delta = self._diff(
+                        TripleFingerprint.load(cache, delta_key), fingerprint
+                    )
+                source.seek(0)
+
+            report = None
+            try:
+                start = time.monotonic()
+                if delta is not None:
+                    size = self._update(client, cache, *delta)
+                elif configuration.sharding.enabled:
+                    report, size = self._upload_sharded(client, cache, source)
+                else:
+                    size = self._upload(client, source)
+                duration = time.monotonic() - start
+
+                if fingerprint is not None:
+                    fingerprint.store(cache, delta_key, configuration.compression)
+            finally:
+                if fingerprint is not None:
+                    fingerprint.snapshot.close()
+
+        if content_hash is not None and delta is None and report is None:
+            # Kept without expiry, unlike the downloaded content
+            cache.diskcache.set(
+                manifest_key,
+                {
+                    "content_hash": content_hash,
+                    "filename": configuration.filename,
+                    "size": size,
+                    "duration": duration,
+                    "uploaded": time.time(),
+                },
+            )
         else:
-            print(
-                "[ONTOKB UPLOAD PLUGIN]: Downloaded data by means of a filter strategy"
+            # The database does not hold a single known content anymore
+            cache.diskcache.delete(manifest_key)
+
+        # Invalidate the cached query results of the database
+        bump_database_generation(
+            cache, self.resource_config.accessUrl, configuration.database
+        )
+
+        # Save result in session
+        return SessionUpdateOntoKBUpload(
+            content_hash=content_hash,
+            bytes_transferred=size,
+            delta=delta is not None,
+            triples_added=len(delta[2]) if delta else 0,
+            triples_removed=len(delta[3]) if delta else 0,
+            shards=report,
+        )
+
+    def _upload(
+        self, client: "Session", source: "BinaryIO", filename: "Optional[str]" = None
+    ) -> int:
+        """Upload the whole content to the database, as `filename` if given.
+
+        Returns:
+            The size of the content, in bytes.
+
+        """
+        configuration = self.resource_config.configuration
+        filename = filename or configuration.filename
+        url = self.resource_config.accessUrl + "/databases/" + configuration.database
+
+        size = 0
+
+        def _count(chunks: "Iterable[bytes]") -> "Iterator[bytes]":
+            nonlocal size
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+
+        encoding = configuration.compression.request_encoding
+        if configuration.streaming or encoding:
+            boundary = uuid4().hex
+            headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+            chunks = iter_multipart(
+                "ontology",
+                filename,
+                _count(iter_chunks(source, configuration.chunk_size)),
+                boundary,
             )
-            downloader = create_strategy(
-                "download", self.resource_config.configuration.fileConfig
+            if encoding:
+                headers["Content-Encoding"] = encoding
+                chunks = iter_compress(
+                    chunks, encoding, configuration.compression.level
+                )
+            # A chunked body when streaming, the content is never fully in memory
+            body: "Union[bytes, Iterator[bytes]]" = (
+                chunks if configuration.streaming else b"".join(chunks)
             )
-            output = downloader.get()
-            key = output["key"]
+            response = client.post(url, data=body, headers=headers)
+        else:
+            content = source.read()
+            size = len(content)
+            response = client.post(url, files={"ontology": (filename, content)})
+
+        if response.status_code // 100 != 2:
+            raise Exception("Error during ontorec upload")
+        return size
+
+    def _upload_sharded(
+        self, client: "Session", cache: "DataCache", source: "BinaryIO"
+    ) -> "Tuple[OntoKBShardReport, int]":
+        """Upload the content as shards, concurrently.
+
+        At most twice as many shards as workers are held in memory. A failed shard
+        is retried on its own, the upload fails once a shard runs out of retries.
+
+        The number of shards is recorded in the cache, without expiry. The shards
+        of a previous upload beyond the new number of shards are overwritten with
+        empty files, so their triples do not linger in the database.
+
+        Returns:
+            The report of the upload and the number of bytes uploaded.
+
+        """
+        configuration = self.resource_config.configuration
+        sharding = configuration.sharding
+        rdf_format = guess_format(configuration.filename)
+        stem = configuration.filename.rsplit(".", 1)[0]
+        extension = shard_extension(rdf_format)
+        shards_key = _shards_key(
+            self.resource_config.accessUrl,
+            configuration.database,
+            configuration.filename,
+        )
+
+        lock = threading.Lock()
+        totals = {"shards": 0, "cleared": 0, "triples": 0, "bytes": 0, "retries": 0}
+        start = time.monotonic()
 
-        content = cache.get(key)  # BinaryData
+        def _send(index: int, content: bytes, triples: int) -> None:
+            filename = f"{stem}.part{index:05d}.{extension}"
+            retry = 0
+            while True:
+                try:
+                    self._upload(client, io.BytesIO(content), filename)
+                    break
+                except Exception as exc:  # pylint: disable=broad-except
+                    if retry >= sharding.retries:
+                        raise
+                    retry += 1
+                    LOGGER.warning(
+                        "Retrying shard %s (%d/%d) after %s",
+                        filename,
+                        retry,
+                        sharding.retries,
+                        exc,
+                    )
+                    time.sleep(sharding.backoff_factor * 2 ** (retry - 1))
+            with lock:
+                totals["shards" if content else "cleared"] += 1
+                totals["triples"] += triples
+                totals["bytes"] += len(content)
+                totals["retries"] += retry
+                LOGGER.info(
+                    "Uploaded %d shards, %d triples, %d bytes in %.1fs",
+                    totals["shards"],
+                    totals["triples"],
+                    totals["bytes"],
+                    time.monotonic() - start,
+                )
 
-        url = (
-            self.resource_config.accessUrl
-            + "/databases/"
-            + self.resource_config.configuration.database
+        pending: "Set[Future]" = set()
+        errors: "List[BaseException]" = []
+        with ThreadPoolExecutor(max_workers=sharding.max_workers) as executor:
+            for index, (content, triples) in enumerate(
+                pad_shards(
+                    iter_shards(source, rdf_format, sharding.shard_size),
+                    cache.diskcache.get(shards_key, default=0),
+                    partial(cache.diskcache.set, shards_key),
+                )
+            ):
+                pending.add(executor.submit(_send, index, content, triples))
+                if len(pending) >= 2 * sharding.max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    errors.extend(_.exception() for _ in done if _.exception())
+                    if errors:
+                        break
+            if errors:
+                for future in pending:
+                    future.cancel()
+            done, _ = wait(pending)
+            errors.extend(_.exception() for _ in done if _.exception())
+        if errors:
+            raise errors[0]
+        cache.diskcache.set(shards_key, totals["shards"])
+
+        seconds = time.monotonic() - start
+        report = OntoKBShardReport(
+            shards=totals["shards"],
+            triples=totals["triples"],
+            retries=totals["retries"],
+            cleared=totals["cleared"],
+            seconds=seconds,
+            throughput=totals["bytes"] / seconds if seconds else 0.0,
         )
-        response = requests.post(
-            url,
-            files={"ontology": (self.resource_config.configuration.filename, content)},
+        return report, totals["bytes"]
+
+    def _diff(
+        self,
+        previous: "Optional[TripleFingerprint]",
+        fingerprint: TripleFingerprint,
+    ) -> "Optional[Tuple[TripleFingerprint, TripleFingerprint, Set[int], Set[int]]]":
+        """Return the previous and new fingerprints with the added and removed triple
+        hashes since the previous upload, or `None` if the content must be fully
+        uploaded."""
+        if previous is None:
+            LOGGER.info("No previous upload, uploading the file")
+            return None
+        if previous.bnodes != fingerprint.bnodes:
+            LOGGER.info("Blank nodes changed, uploading the file")
+            return None
+
+        added, removed = diff_hashes(previous.hashes, fingerprint.hashes)
+        threshold = self.resource_config.configuration.delta_threshold
+        if len(added) + len(removed) > threshold * max(fingerprint.triples, 1):
+            LOGGER.info("Delta too large, uploading the file")
+            return None
+        LOGGER.info(
+            "Uploading a delta of %d added and %d removed triples",
+            len(added),
+            len(removed),
         )
+        return previous, fingerprint, added, removed
 
-        if response.status_code/100 != 2 :
-            raise Exception("Error during ontorec upload")
+    def _update(
+        self,
+        client: "Session",
+        cache: "DataCache",
+        previous: TripleFingerprint,
+        fingerprint: TripleFingerprint,
+        added: "Set[int]",
+        removed: "Set[int]",
+    ) -> int:
+        """Send the delta as SPARQL updates.
 
-        # Save result in session
-        return SessionUpdate()
+        Returns:
+            The number of bytes sent.
+
+        """
+        configuration = self.resource_config.configuration
+        url = self.resource_config.accessUrl + configuration.update_path.format(
+            database=configuration.database
+        )
+
+        encoding = configuration.compression.request_encoding
+        headers = {"Content-Type": "application/sparql-update"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        def _send(updates: "Iterable[Tuple[str, int]]") -> int:
+            size = 0
+            for update, _ in updates:
+                body = update.encode("utf-8")
+                if encoding:
+                    body = compress(body, encoding, configuration.compression.level)
+                response = client.post(url, data=body, headers=headers)
+                if response.status_code // 100 != 2:
+                    raise Exception("Error during ontorec update")
+                size += len(body)
+            return size
+
+        size = 0
+        if removed:
+            with open_cached(cache, previous.snapshot) as handle:
+                size += _send(
+                    iter_updates(
+                        "DELETE DATA",
+                        select_lines(handle, removed),
+                        configuration.update_batch_size,
+                    )
+                )
+        if added:
+            fingerprint.snapshot.seek(0)
+            size += _send(
+                iter_updates(
+                    "INSERT DATA",
+                    select_lines(fingerprint.snapshot, added),
+                    configuration.update_batch_size,
+                )
+            )
+        return size
+
+    def _cache(self) -> "DataCache":
+        """Return the data cache holding the content and the upload records."""
+        from oteapi.datacache import (  # pylint: disable=import-outside-toplevel
+            DataCache,
+        )
+
+        return DataCache(self.resource_config.configuration.datacache_config)
+
+    def _file_config(self) -> "Optional[FileResourceConfig]":
+        """Return `fileConfig` as a configuration of the file download strategy."""
+        from oteapi.strategies.download.file import (  # pylint: disable=import-outside-toplevel
+            FileResourceConfig,
+        )
+
+        file_config = self.resource_config.configuration.fileConfig
+        if file_config is None or isinstance(file_config, FileResourceConfig):
+            return file_config
+        return FileResourceConfig(**file_config.dict())
+
+    @contextmanager
+    def _open_source(
+        self, cache: "DataCache", session: "Optional[Dict[str, Any]]"
+    ) -> "Iterator[BinaryIO]":
+        """Open the content to upload as a binary file."""
+        file_config = self._file_config()
+
+        if cache.config.accessKey and cache.config.accessKey in cache:
+            LOGGER.debug("Cached data")
+            key = cache.config.accessKey
+        elif session and "key" in session:
+            LOGGER.debug("Found file strategy in pipeline")
+            key = session["key"]
+        elif file_config and file_config.downloadUrl.scheme == "file":
+            LOGGER.debug("Reading local file")
+            with open(uri_to_path(file_config.downloadUrl), "rb") as handle:
+                yield handle
+            return
+        else:
+            LOGGER.debug("Downloading data by means of a download strategy")
+            from oteapi.plugins import (  # pylint: disable=import-outside-toplevel
+                create_strategy,
+            )
+
+            downloader = create_strategy("download", file_config)
+            with timed("download"):
+                output = downloader.get()
+            key = output["key"]
+
+        with open_cached(cache, key) as handle:
+            yield handle
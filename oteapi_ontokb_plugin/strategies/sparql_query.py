@@ -1,20 +1,42 @@
 """SPARQL query filter strategy."""
 # pylint: disable=no-self-use,unused-argument
-from typing import TYPE_CHECKING, Optional
+from typing import Any, Dict, List, Optional
 
 from oteapi.models import AttrDict, SessionUpdate
 from oteapi.models.filterconfig import FilterConfig
 from pydantic import Field
 from pydantic.dataclasses import dataclass
 
-if TYPE_CHECKING:  # pragma: no cover
-    from typing import Any, Dict
+from oteapi_ontokb_plugin.utils.sparql import TemplateQuery
+
+
+class SPARQLBindingBatches(AttrDict):
+    """Batches of bindings of a templated query, as sent to the database."""
+
+    variables: List[str] = Field(..., description="Names of the parameter variables.")
+    added: List[str] = Field(
+        [],
+        description="Parameter variables added to the projection of the template.",
+    )
+    batches: Dict[str, List[List[str]]] = Field(
+        ...,
+        description=(
+            "Canonical bindings of each batch, keyed by the name of the batch query "
+            "in `sparql_queries`."
+        ),
+    )
 
 
 class SessionUpdateSPARQLQueryFilter(SessionUpdate):
     """Return model for `SPARQLQuery`."""
 
-    sparql_query: str = Field(..., description="SPARQL query definition.")
+    sparql_query: Optional[str] = Field(..., description="SPARQL query definition.")
+    sparql_queries: Optional[Dict[str, str]] = Field(
+        None, description="Named SPARQL query definitions."
+    )
+    sparql_bindings: Optional[SPARQLBindingBatches] = Field(
+        None, description="Batches of bindings of a templated query."
+    )
 
     reasoning: bool = Field(..., description="Enable reasoning for this specific query")
 
@@ -25,6 +47,25 @@ class SPARQLQueryConfig(AttrDict):
     reasoning: Optional[bool] = Field(
         False, description="Enable reasoning for this specific query"
     )
+    queries: Optional[Dict[str, str]] = Field(
+        None,
+        description=(
+            "Named SPARQL queries, executed concurrently by the OntoKB access "
+            "strategy. Results are returned keyed by name."
+        ),
+    )
+    bindings: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        description=(
+            "Parameter bindings for the query, used as a template. Each binding maps "
+            "variable names (without `?`) to full IRIs (`<...>`) or literals. The "
+            "bindings are sent in batches through SPARQL `VALUES` blocks and the "
+            "results are returned per binding."
+        ),
+    )
+    max_batch_size: int = Field(
+        100, description="Maximum number of bindings sent in a single query."
+    )
 
 
 class SPARQLQueryFilterConfig(FilterConfig):
@@ -66,7 +107,30 @@ class SPARQLQueryFilter:
             dictionary context.
 
         """
+        configuration = self.filter_config.configuration
+        query = self.filter_config.query
+        queries = dict(configuration.queries) if configuration.queries else {}
+        bindings = None
+
+        if configuration.bindings:
+            # Expand the template into batched queries
+            variables = list(configuration.bindings[0])
+            template = TemplateQuery(query, variables)
+            batches = {}
+            for index, (batch_query, batch) in enumerate(
+                template.batches(configuration.bindings, configuration.max_batch_size)
+            ):
+                name = f"_batch_{index}"
+                queries[name] = batch_query
+                batches[name] = batch
+            bindings = SPARQLBindingBatches(
+                variables=variables, added=template.added, batches=batches
+            )
+            query = None
+
         return SessionUpdateSPARQLQueryFilter(
-            sparql_query=self.filter_config.query,
-            reasoning=self.filter_config.configuration.reasoning,
+            sparql_query=query,
+            reasoning=configuration.reasoning,
+            sparql_queries=queries if queries else None,
+            sparql_bindings=bindings,
         )
@@ -0,0 +1,140 @@
+"""HTTP client towards OntoREC, built on `requests` with pooled connections.
+
+Sessions should be obtained through
+[`get_session()`][oteapi_ontokb_plugin.utils.pool.get_session], which shares them
+process-wide. This module is imported lazily, on the first request.
+"""
+from typing import TYPE_CHECKING
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from oteapi_ontokb_plugin.utils.metrics import (
+    BYTES_OUT,
+    PHASE_SECONDS,
+    enabled,
+    increment,
+    observe,
+    timed,
+)
+from oteapi_ontokb_plugin.utils.pool import PoolConfig, PoolStatistics
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Iterable, Iterator, Optional, Tuple, Type
+
+
+def _counting_pool(
+    base: "Type[HTTPConnectionPool]", statistics: PoolStatistics
+) -> "Type[HTTPConnectionPool]":
+    """Create a connection pool class recording its usage in `statistics`."""
+
+    def _get_conn(self, timeout=None):
+        statistics.incr("requests")
+        if self.block and self.pool is not None and self.pool.empty():
+            statistics.incr("waits")
+        return base._get_conn(self, timeout=timeout)  # pylint: disable=protected-access
+
+    def _new_conn(self):
+        statistics.incr("new_connections")
+        conn = base._new_conn(self)  # pylint: disable=protected-access
+        connect = conn.connect
+
+        def _connect():
+            with timed("http_connect"):
+                connect()
+
+        conn.connect = _connect
+        return conn
+
+    return type(
+        f"Counting{base.__name__}",
+        (base,),
+        {"_get_conn": _get_conn, "_new_conn": _new_conn},
+    )
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTP adapter whose connection pools update a `PoolStatistics`."""
+
+    def __init__(self, statistics: PoolStatistics, **kwargs: "Any") -> None:
+        self.statistics = statistics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: "Any", **kwargs: "Any") -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.statistics),
+            "https": _counting_pool(HTTPSConnectionPool, self.statistics),
+        }
+
+
+class PooledSession(requests.Session):
+    """A `requests.Session` applying the configured timeouts by default."""
+
+    def __init__(self, config: PoolConfig) -> None:
+        super().__init__()
+        self.config = config
+        self.statistics = PoolStatistics()
+
+        retry = Retry(
+            total=config.retries,
+            connect=config.retries,
+            read=0,
+            status=config.retries if config.retry_statuses else 0,
+            backoff_factor=config.backoff_factor,
+            status_forcelist=config.retry_statuses,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        adapter = _CountingAdapter(
+            self.statistics,
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+            max_retries=retry,
+        )
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    @property
+    def timeout(self) -> "Tuple[Optional[float], Optional[float]]":
+        """The default `(connect, read)` timeout."""
+        return (self.config.connect_timeout, self.config.read_timeout)
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        kwargs.setdefault("timeout", self.timeout)
+        if not enabled():
+            return super().request(method, url, *args, **kwargs)
+
+        data = kwargs.get("data")
+        if _is_stream(data):
+            kwargs["data"] = _count_sent(data)
+        response = super().request(method, url, *args, **kwargs)
+
+        # `elapsed` ends once the response headers are parsed
+        observe(PHASE_SECONDS, response.elapsed.total_seconds(), phase="http_ttfb")
+        body = response.request.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if isinstance(body, bytes):
+            increment(BYTES_OUT, len(body))
+        return response
+
+
+def _is_stream(data: "Any") -> bool:
+    """Whether `data` is a request body sent chunk by chunk."""
+    return (
+        data is not None
+        and not isinstance(data, (bytes, str, dict, list, tuple))
+        and not hasattr(data, "read")
+        and hasattr(data, "__iter__")
+    )
+
+
+def _count_sent(chunks: "Iterable[bytes]") -> "Iterator[bytes]":
+    """Yield the chunks of a streamed request body, counting the bytes sent."""
+    for chunk in chunks:
+        increment(BYTES_OUT, len(chunk))
+        yield chunk
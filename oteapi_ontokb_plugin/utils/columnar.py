@@ -0,0 +1,230 @@
+"""Compact columnar representation of SPARQL SELECT results.
+
+Instead of one dictionary per cell, each variable is stored as three arrays:
+
+- `kinds` (`uint8`): term kind per row, see `UNBOUND`, `URI`, `LITERAL`, `BNODE`.
+- `values` (`int32`): index of the term value in the shared value dictionary, or
+  `-1` when unbound. IRIs and literal values are thus dictionary encoded.
+- `annotations` (`int32`): index of the interned language tag or datatype in the
+  annotation table (`0` being "no annotation").
+
+The binary form is a short JSON header (variables, dictionaries) followed by the
+raw arrays, which can be viewed with NumPy without copying.
+"""
+import json
+import struct
+from array import array
+from typing import TYPE_CHECKING
+
+from oteapi_ontokb_plugin.utils.compression import load_cached
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, List, Optional, Tuple, Union
+
+    from oteapi.models import DataCacheConfig
+
+
+UNBOUND, URI, LITERAL, BNODE = 0, 1, 2, 3
+_KINDS = {"uri": URI, "literal": LITERAL, "typed-literal": LITERAL, "bnode": BNODE}
+_NAMES = {URI: "uri", LITERAL: "literal", BNODE: "bnode"}
+
+MAGIC = b"OKBCOL1\n"
+_HEADER = struct.Struct("<I")
+
+
+class ColumnarResult:
+    """Columnar SPARQL SELECT result.
+
+    Parameters:
+        variables: The projected variables.
+        rows: Number of rows.
+        values: The value dictionary.
+        annotations: The annotation table. Entries are `""`, `"@<lang>"` or
+            `"^^<datatype>"`.
+        columns: The `(kinds, values, annotations)` arrays of each variable.
+
+    """
+
+    def __init__(
+        self,
+        variables: "List[str]",
+        rows: int,
+        values: "List[str]",
+        annotations: "List[str]",
+        columns: "Dict[str, Tuple[Any, Any, Any]]",
+    ) -> None:
+        self.variables = variables
+        self.rows = rows
+        self.values = values
+        self.annotations = annotations
+        self.columns = columns
+
+    @classmethod
+    def from_sparql_json(cls, result: "Dict[str, Any]") -> "ColumnarResult":
+        """Convert a SPARQL-JSON SELECT result."""
+        variables = list(result.get("head", {}).get("vars", []))
+        bindings = result.get("results", {}).get("bindings", [])
+
+        value_ids: "Dict[str, int]" = {}
+        annotation_ids: "Dict[str, int]" = {"": 0}
+        columns = {
+            variable: (bytearray(len(bindings)), array("i"), array("i"))
+            for variable in variables
+        }
+
+        for row in bindings:
+            for variable, (kinds, values, annotations) in columns.items():
+                term = row.get(variable)
+                if term is None:
+                    values.append(-1)
+                    annotations.append(0)
+                    continue
+
+                kinds[len(values)] = _KINDS[term["type"]]
+                values.append(value_ids.setdefault(term["value"], len(value_ids)))
+                if "xml:lang" in term:
+                    annotation = "@" + term["xml:lang"]
+                elif "datatype" in term:
+                    annotation = "^^" + term["datatype"]
+                else:
+                    annotation = ""
+                annotations.append(
+                    annotation_ids.setdefault(annotation, len(annotation_ids))
+                )
+
+        return cls(
+            variables=variables,
+            rows=len(bindings),
+            values=list(value_ids),
+            annotations=list(annotation_ids),
+            columns=columns,
+        )
+
+    def to_bytes(self) -> bytes:
+        """Serialize to the compact binary form."""
+        header = json.dumps(
+            {
+                "variables": self.variables,
+                "rows": self.rows,
+                "values": self.values,
+                "annotations": self.annotations,
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        # Keep the int32 arrays 4-byte aligned
+        header += b" " * (-(len(MAGIC) + _HEADER.size + len(header)) % 4)
+
+        parts = [MAGIC, _HEADER.pack(len(header)), header]
+        for variable in self.variables:
+            _, values, annotations = self.columns[variable]
+            parts.extend([bytes(memoryview(values)), bytes(memoryview(annotations))])
+        for variable in self.variables:
+            parts.append(bytes(self.columns[variable][0]))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: "Union[bytes, memoryview]") -> "ColumnarResult":
+        """Load from the compact binary form, without copying the arrays."""
+        view = memoryview(data)
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a columnar SPARQL result.")
+        offset = len(MAGIC) + _HEADER.size
+        (size,) = _HEADER.unpack_from(view, len(MAGIC))
+        header = json.loads(bytes(view[offset : offset + size]))
+        offset += size
+
+        rows = header["rows"]
+        arrays = {}
+        for variable in header["variables"]:
+            values = view[offset : offset + 4 * rows].cast("i")
+            offset += 4 * rows
+            annotations = view[offset : offset + 4 * rows].cast("i")
+            offset += 4 * rows
+            arrays[variable] = (values, annotations)
+
+        columns = {}
+        for variable in header["variables"]:
+            columns[variable] = (view[offset : offset + rows], *arrays[variable])
+            offset += rows
+
+        return cls(
+            variables=header["variables"],
+            rows=rows,
+            values=header["values"],
+            annotations=header["annotations"],
+            columns=columns,
+        )
+
+    def column(self, variable: str) -> "List[Optional[str]]":
+        """Return the values of `variable`, `None` where unbound."""
+        values = self.values
+        return [None if _ < 0 else values[_] for _ in self.columns[variable][1]]
+
+    def to_sparql_json(self) -> "Dict[str, Any]":
+        """Convert back to a SPARQL-JSON result."""
+        bindings: "List[Dict[str, Any]]" = [{} for _ in range(self.rows)]
+        for variable in self.variables:
+            kinds, values, annotations = self.columns[variable]
+            for row, (kind, value, annotation) in enumerate(
+                zip(kinds, values, annotations)
+            ):
+                if kind == UNBOUND:
+                    continue
+                term = {"type": _NAMES[kind], "value": self.values[value]}
+                annotation = self.annotations[annotation]
+                if annotation.startswith("@"):
+                    term["xml:lang"] = annotation[1:]
+                elif annotation.startswith("^^"):
+                    term["datatype"] = annotation[2:]
+                bindings[row][variable] = term
+        return {"head": {"vars": self.variables}, "results": {"bindings": bindings}}
+
+    def to_numpy(self) -> "Dict[str, Dict[str, Any]]":
+        """Return NumPy views of the arrays of each variable.
+
+        Returns:
+            A dictionary mapping each variable to its `kinds`, `values` and
+            `annotations` arrays. The arrays share memory with this object.
+
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        return {
+            variable: {
+                "kinds": np.frombuffer(kinds, dtype=np.uint8),
+                "values": np.frombuffer(values, dtype=np.int32),
+                "annotations": np.frombuffer(annotations, dtype=np.int32),
+            }
+            for variable, (kinds, values, annotations) in self.columns.items()
+        }
+
+    def to_pandas(self) -> "Any":
+        """Return a `pandas.DataFrame` with one categorical column per variable.
+
+        The dictionary encoding is reused as-is for the categories, so no per-row
+        Python objects are created. Unbound values are missing values.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        categories = pd.Index(self.values)
+        return pd.DataFrame(
+            {
+                variable: pd.Categorical.from_codes(
+                    arrays["values"], categories=categories
+                )
+                for variable, arrays in self.to_numpy().items()
+            },
+            columns=self.variables,
+        )
+
+
+def load_columnar(
+    key: str, datacache_config: "Optional[DataCacheConfig]" = None
+) -> ColumnarResult:
+    """Load a columnar result stored in the data cache under `key`."""
+    from oteapi.datacache import DataCache  # pylint: disable=import-outside-toplevel
+
+    content = load_cached(DataCache(datacache_config), key)
+    if isinstance(content, str):
+        raise TypeError(f"The value stored under {key!r} is not a columnar result.")
+    return ColumnarResult.from_bytes(content)
@@ -0,0 +1,331 @@
+"""Compression of HTTP bodies and of payloads stored in the data cache.
+
+`gzip` is always available, `zstd` requires the `zstandard` package.
+
+Compressed payloads are stored with a short header (`MAGIC` and the encoding), so
+that `load_cached()` and
+[`open_cached()`][oteapi_ontokb_plugin.utils.streaming.open_cached] decompress them
+transparently, only when accessed.
+"""
+import gzip
+import io
+import zlib
+from typing import TYPE_CHECKING, List, Literal, Optional
+
+from oteapi.models import AttrDict
+from pydantic import Field
+
+from oteapi_ontokb_plugin.utils.metrics import BYTES_IN, enabled, increment, timed
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, BinaryIO, Iterable, Iterator, Union
+
+    from oteapi.datacache import DataCache
+    from requests import Response
+
+
+MAGIC = b"OKBZ"
+_IDS = {"gzip": b"g", "zstd": b"z"}
+_ENCODINGS = {value: key for key, value in _IDS.items()}
+_HEADER_SIZE = len(MAGIC) + 1
+# Leading bytes of the compressed data, checked to tell packed payloads from raw
+# payloads starting with `MAGIC`
+_SIGNATURES = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+_PREFIX_SIZE = _HEADER_SIZE + max(len(_) for _ in _SIGNATURES.values())
+_GZIP_LEVEL = 6
+_CHUNK_SIZE = 1024**2
+
+
+class CompressionConfig(AttrDict):
+    """Compression configuration."""
+
+    accept_encoding: List[Literal["gzip", "deflate", "zstd"]] = Field(
+        ["gzip", "deflate"],
+        description=(
+            "Encodings accepted for the responses of OntoREC, decoded while reading. "
+            "`zstd` requires the `zstandard` package."
+        ),
+    )
+    request_encoding: Optional[Literal["gzip", "zstd"]] = Field(
+        None,
+        description=(
+            "Encoding of the uploaded request bodies (`Content-Encoding`). Only set "
+            "it if OntoREC (or a proxy in front of it) decodes compressed requests."
+        ),
+    )
+    storage_encoding: Optional[Literal["gzip", "zstd"]] = Field(
+        None,
+        description="Encoding of the large payloads stored in the data cache.",
+    )
+    storage_min_size: int = Field(
+        64 * 1024,
+        description="Minimum size (in bytes) of the payloads compressed for storage.",
+    )
+    level: Optional[int] = Field(
+        None, description="Compression level, the encoding default if not given."
+    )
+
+
+def import_zstandard() -> "Any":
+    """Import and return `zstandard`, with a helpful error if it is not installed."""
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:  # pragma: no cover
+        raise ImportError(
+            "zstd compression requires zstandard. Install it with "
+            "`pip install oteapi-ontokb-plugin[zstd]`."
+        ) from exc
+    return zstandard
+
+
+def _decodable() -> str:
+    """Return the encodings decoded by urllib3 itself."""
+    from urllib3.util.request import (  # pylint: disable=import-outside-toplevel
+        ACCEPT_ENCODING,
+    )
+
+    return ACCEPT_ENCODING
+
+
+def accept_encoding(encodings: "Iterable[str]") -> str:
+    """Return the `Accept-Encoding` header value for `encodings`."""
+    encodings = list(encodings)
+    if "zstd" in encodings:
+        import_zstandard()
+    return ", ".join(encodings) or "identity"
+
+
+def read_body(response: "Response", chunk_size: int = 1024**2) -> bytes:
+    """Return the decoded body of a response requested with `stream=True`.
+
+    `gzip` and `deflate` bodies are decoded by urllib3 while being read. `zstd`
+    bodies are decoded here, chunk by chunk, if urllib3 cannot decode them.
+
+    The transfer is timed as the `http_transfer` phase, and the bytes received (as
+    sent by the server, before decoding) are counted.
+    """
+    encoding = response.headers.get("Content-Encoding", "").strip().lower()
+    with timed("http_transfer"):
+        if encoding != "zstd" or "zstd" in _decodable():
+            content = response.content
+        else:
+            decompressor = import_zstandard().ZstdDecompressor().decompressobj()
+            content = b"".join(
+                decompressor.decompress(chunk)
+                for chunk in response.raw.stream(chunk_size, decode_content=False)
+            )
+
+    if enabled():
+        tell = getattr(response.raw, "tell", None)
+        increment(BYTES_IN, tell() if tell else len(content))
+    return content
+
+
+def iter_body(response: "Response", chunk_size: int = 64 * 1024) -> "Iterator[bytes]":
+    """Yield the decoded body of a response requested with `stream=True`, chunk by
+    chunk, as it is received.
+
+    Like `read_body()`, but the body is never held in memory as a whole. The bytes
+    received are counted once the iteration ends, even if it is stopped early.
+    """
+    encoding = response.headers.get("Content-Encoding", "").strip().lower()
+    received = 0
+    try:
+        if encoding != "zstd" or "zstd" in _decodable():
+            for chunk in response.raw.stream(chunk_size, decode_content=True):
+                received += len(chunk)
+                yield chunk
+        else:
+            decompressor = import_zstandard().ZstdDecompressor().decompressobj()
+            for chunk in response.raw.stream(chunk_size, decode_content=False):
+                received += len(chunk)
+                yield decompressor.decompress(chunk)
+    finally:
+        if enabled():
+            tell = getattr(response.raw, "tell", None)
+            increment(BYTES_IN, tell() if tell else received)
+
+
+def compress(data: bytes, encoding: str, level: "Optional[int]" = None) -> bytes:
+    """Compress `data` with `encoding`."""
+    if encoding == "gzip":
+        return gzip.compress(data, _GZIP_LEVEL if level is None else level)
+    if encoding == "zstd":
+        compressor = import_zstandard().ZstdCompressor(
+            **({} if level is None else {"level": level})
+        )
+        return compressor.compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def iter_compress(
+    chunks: "Iterable[bytes]", encoding: str, level: "Optional[int]" = None
+) -> "Iterator[bytes]":
+    """Compress a stream of chunks with `encoding`, chunk by chunk."""
+    if encoding == "gzip":
+        compressor = zlib.compressobj(_GZIP_LEVEL if level is None else level, wbits=31)
+    elif encoding == "zstd":
+        compressor = (
+            import_zstandard()
+            .ZstdCompressor(**({} if level is None else {"level": level}))
+            .compressobj()
+        )
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def pack(data: bytes, config: "Optional[CompressionConfig]") -> bytes:
+    """Return `data` as stored in the data cache, compressed if configured."""
+    if (
+        config is None
+        or config.storage_encoding is None
+        or len(data) < config.storage_min_size
+    ):
+        return data
+    return (
+        MAGIC
+        + _IDS[config.storage_encoding]
+        + compress(data, config.storage_encoding, config.level)
+    )
+
+
+def iter_packed(
+    chunks: "Iterable[bytes]", config: "CompressionConfig"
+) -> "Iterator[bytes]":
+    """Yield a payload to store in the data cache, compressed chunk by chunk.
+
+    Unlike `pack()`, the payload is compressed whatever its size.
+    """
+    if config.storage_encoding is None:
+        yield from chunks
+        return
+    yield MAGIC + _IDS[config.storage_encoding]
+    yield from iter_compress(chunks, config.storage_encoding, config.level)
+
+
+def _packed_encoding(prefix: bytes) -> "Optional[str]":
+    """Return the encoding of a packed payload from its first bytes, or `None` if
+    the payload is not packed."""
+    if prefix[: len(MAGIC)] != MAGIC:
+        return None
+    encoding = _ENCODINGS.get(prefix[len(MAGIC) : _HEADER_SIZE])
+    if encoding is None or not prefix[_HEADER_SIZE:].startswith(_SIGNATURES[encoding]):
+        return None
+    return encoding
+
+
+def unpack(data: "Union[bytes, str]") -> "Union[bytes, str]":
+    """Return the original content of a stored payload."""
+    if not isinstance(data, bytes):
+        return data
+    encoding = _packed_encoding(data[:_PREFIX_SIZE])
+    if encoding is None:
+        return data
+    if encoding == "gzip":
+        return gzip.decompress(data[_HEADER_SIZE:])
+    return (
+        import_zstandard()
+        .ZstdDecompressor()
+        .decompressobj()
+        .decompress(data[_HEADER_SIZE:])
+    )
+
+
+class _PackedReader(io.RawIOBase):
+    """Read-only binary file-like view of a compressed stream, decompressed on the
+    fly.
+
+    Positions are offsets in the decompressed content. Seeking backwards
+    decompresses the stream again from its start, which is not necessarily the
+    start of `handle`.
+    """
+
+    def __init__(self, handle: "BinaryIO", encoding: str) -> None:
+        super().__init__()
+        self._handle = handle
+        self._encoding = encoding
+        self._start = handle.tell()
+        self._reader = self._open()
+        self._offset = 0
+
+    def _open(self) -> "Any":
+        """Open a decompressing reader at the start of the stream."""
+        self._handle.seek(self._start)
+        if self._encoding == "gzip":
+            return gzip.GzipFile(fileobj=self._handle, mode="rb")
+        return (
+            import_zstandard()
+            .ZstdDecompressor()
+            .stream_reader(self._handle, closefd=False)
+        )
+
+    def readable(self) -> bool:  # pylint: disable=no-self-use
+        """Whether the file can be read, always."""
+        return True
+
+    def seekable(self) -> bool:  # pylint: disable=no-self-use
+        """Whether the file supports seeking, always."""
+        return True
+
+    def readinto(self, buffer: "Any") -> int:
+        """Decompress up to `len(buffer)` bytes into `buffer`."""
+        size = self._reader.readinto(buffer)
+        self._offset += size
+        return size
+
+    def tell(self) -> int:
+        """Return the position in the decompressed content."""
+        return self._offset
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to `offset` in the decompressed content."""
+        if whence == io.SEEK_CUR:
+            offset += self._offset
+        elif whence == io.SEEK_END:
+            while self.read(_CHUNK_SIZE):
+                pass
+            offset += self._offset
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence: {whence}")
+        if offset < 0:
+            raise ValueError(f"Negative seek position: {offset}")
+
+        if offset < self._offset:
+            self._reader.close()
+            self._reader = self._open()
+            self._offset = 0
+        while self._offset < offset and self.read(
+            min(offset - self._offset, _CHUNK_SIZE)
+        ):
+            pass
+        return self._offset
+
+    def close(self) -> None:
+        """Close the decompressing reader, leaving the stored payload open."""
+        self._reader.close()
+        super().close()
+
+
+def open_packed(handle: "BinaryIO") -> "BinaryIO":
+    """Return a seekable binary file decompressing the stored payload of `handle`
+    lazily.
+
+    Uncompressed payloads are returned as is, rewound to their start.
+    """
+    start = handle.tell()
+    encoding = _packed_encoding(handle.read(_PREFIX_SIZE))
+    handle.seek(start if encoding is None else start + _HEADER_SIZE)
+    if encoding is None:
+        return handle
+    return io.BufferedReader(_PackedReader(handle, encoding))
+
+
+def load_cached(cache: "DataCache", key: str) -> "Union[bytes, str]":
+    """Return the content stored under `key` in `cache`, decompressed if needed."""
+    return unpack(cache.get(key))
@@ -0,0 +1,274 @@
+"""Triple-level differences between versions of an uploaded document.
+
+The triples of an uploaded document are kept as a fingerprint:
+
+- the sorted 64-bit hashes of its ground triples (triples without blank nodes),
+- a digest of its blank node triples, independent of the blank node labels,
+- a snapshot of its ground triples in N-Triples, stored in the data cache.
+
+Comparing the fingerprints of two versions gives the added and removed ground
+triples, which can be sent as SPARQL `INSERT DATA`/`DELETE DATA` updates. Blank
+nodes cannot be addressed by such updates, so a change in the blank node triples
+requires a full upload.
+"""
+import hashlib
+import re
+import tempfile
+from array import array
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from oteapi_ontokb_plugin.utils.compression import iter_packed
+from oteapi_ontokb_plugin.utils.rdf import iter_ntriples, parse_graph, term_to_nt
+from oteapi_ontokb_plugin.utils.streaming import iter_chunks
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import (
+        IO,
+        Any,
+        BinaryIO,
+        Dict,
+        Iterable,
+        Iterator,
+        List,
+        Optional,
+        Set,
+        Tuple,
+    )
+
+    from oteapi.datacache import DataCache
+
+    from oteapi_ontokb_plugin.utils.compression import CompressionConfig
+
+
+_IRI = r'<[^<>"\s]*>'
+_BNODE = r'_:[^\s<>"]*[^\s<>".]'
+_LITERAL = r'"(?:[^"\\\n]|\\.)*"(?:@[A-Za-z]+(?:-[A-Za-z0-9]+)*|\^\^<[^<>"\s]*>)?'
+_TRIPLE = re.compile(
+    rf"^\s*({_IRI}|{_BNODE})\s*({_IRI})\s*({_IRI}|{_BNODE}|{_LITERAL})"
+    r"\s*\.\s*(?:#.*)?$"
+)
+_IGNORED = re.compile(r"^\s*(?:#.*)?$")
+
+
+def hash_triple(line: str) -> int:
+    """Return the 64-bit hash of an N-Triples line."""
+    return int.from_bytes(
+        hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def split_triple(line: str) -> "Optional[Tuple[str, str, str]]":
+    """Split an N-Triples line into its terms.
+
+    Returns:
+        The subject, predicate and object, or `None` for blank and comment lines.
+
+    Raises:
+        ValueError: If the line is not a valid N-Triples triple.
+
+    """
+    match = _TRIPLE.match(line)
+    if match is not None:
+        return match.group(1), match.group(2), match.group(3)
+    if _IGNORED.match(line):
+        return None
+    raise ValueError(f"Invalid N-Triples line: {line[:200]!r}")
+
+
+def _distinct(hashes: "Iterable[int]") -> "array":
+    """Return the sorted distinct values of `hashes`."""
+    result = array("Q")
+    for value in sorted(hashes):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+
+def iter_triples(handle: "BinaryIO", rdf_format: str) -> "Iterator[str]":
+    """Yield the N-Triples lines of a document.
+
+    N-Triples and Turtle documents are read incrementally, other formats are
+    parsed as a whole with rdflib.
+    """
+    if rdf_format in ("nt", "turtle"):
+        yield from iter_ntriples(handle, rdf_format)
+        return
+    for triple in parse_graph(handle.read(), rdf_format):
+        yield " ".join(term_to_nt(term) for term in triple) + " ."
+
+
+def _bnode_digest(triples: "List[Tuple[str, str, str]]") -> str:
+    """Return a digest of blank node triples, independent of the labels.
+
+    Each blank node is replaced by a hash of its neighbourhood (its incoming and
+    outgoing edges, with neighbouring blank nodes anonymized).
+    """
+    edges: "Dict[str, List[Tuple[str, ...]]]" = defaultdict(list)
+    for subject, predicate, obj in triples:
+        if subject.startswith("_:"):
+            edges[subject].append(("out", predicate, "_:" if obj[:2] == "_:" else obj))
+        if obj.startswith("_:"):
+            edges[obj].append(
+                ("in", predicate, "_:" if subject[:2] == "_:" else subject)
+            )
+    colours = {
+        node: "_:" + hashlib.sha256(repr(sorted(node_edges)).encode()).hexdigest()
+        for node, node_edges in edges.items()
+    }
+
+    digest = hashlib.sha256()
+    for triple in sorted(
+        " ".join(colours.get(term, term) for term in triple) for triple in triples
+    ):
+        digest.update(triple.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+class TripleFingerprint:
+    """Fingerprint of the triples of a document.
+
+    Parameters:
+        hashes: Sorted hashes of the ground triples.
+        bnodes: Digest of the blank node triples.
+        snapshot: Binary file holding the ground triples in N-Triples, or the data
+            cache key of the snapshot once stored.
+
+    """
+
+    def __init__(self, hashes: "array", bnodes: str, snapshot: "Any") -> None:
+        self.hashes = hashes
+        self.bnodes = bnodes
+        self.snapshot = snapshot
+
+    @property
+    def triples(self) -> int:
+        """Number of ground triples."""
+        return len(self.hashes)
+
+    @classmethod
+    def from_lines(cls, lines: "Iterable[str]") -> "TripleFingerprint":
+        """Fingerprint the given N-Triples lines.
+
+        The ground triples are spooled to a temporary file, only their hashes and
+        the blank node triples are kept in memory. Triples are normalized (single
+        spaces, no comments) before being hashed.
+
+        Raises:
+            ValueError: If a line is not a valid N-Triples triple.
+
+        """
+        hashes = array("Q")
+        bnode_triples = []
+        snapshot = tempfile.TemporaryFile()  # pylint: disable=consider-using-with
+        try:
+            for line in lines:
+                terms = split_triple(line)
+                if terms is None:
+                    continue
+                if terms[0][:2] == "_:" or terms[2][:2] == "_:":
+                    bnode_triples.append(terms)
+                    continue
+                triple = " ".join(terms) + " ."
+                hashes.append(hash_triple(triple))
+                snapshot.write(triple.encode("utf-8") + b"\n")
+        except BaseException:
+            snapshot.close()
+            raise
+        snapshot.seek(0)
+        return cls(_distinct(hashes), _bnode_digest(bnode_triples), snapshot)
+
+    def store(
+        self,
+        cache: "DataCache",
+        key: str,
+        compression: "Optional[CompressionConfig]" = None,
+    ) -> None:
+        """Store the fingerprint and its snapshot in `cache` under `key`.
+
+        The snapshot is compressed with the storage encoding of `compression`, if
+        any.
+        """
+        self.snapshot.seek(0)
+        snapshot_key = key + "-snapshot"
+        if compression is not None and compression.storage_encoding:
+            with tempfile.TemporaryFile() as packed:
+                for chunk in iter_packed(iter_chunks(self.snapshot), compression):
+                    packed.write(chunk)
+                packed.seek(0)
+                cache.diskcache.set(snapshot_key, packed, read=True)
+        else:
+            cache.diskcache.set(snapshot_key, self.snapshot, read=True)
+        cache.diskcache.set(
+            key,
+            {
+                "hashes": self.hashes.tobytes(),
+                "bnodes": self.bnodes,
+                "snapshot": snapshot_key,
+            },
+        )
+
+    @classmethod
+    def load(cls, cache: "DataCache", key: str) -> "Optional[TripleFingerprint]":
+        """Load the fingerprint stored under `key`, if any."""
+        stored = cache.diskcache.get(key, default=None)
+        if stored is None or stored["snapshot"] not in cache.diskcache:
+            return None
+        hashes = array("Q")
+        hashes.frombytes(stored["hashes"])
+        return cls(hashes, stored["bnodes"], stored["snapshot"])
+
+
+def diff_hashes(old: "array", new: "array") -> "Tuple[Set[int], Set[int]]":
+    """Return the `(added, removed)` hashes between two sorted hash arrays.
+
+    The arrays are compared as sets: repeated hashes are only counted once.
+    """
+    added: "Set[int]" = set()
+    removed: "Set[int]" = set()
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            value = old[i]
+            while i < len(old) and old[i] == value:
+                i += 1
+            while j < len(new) and new[j] == value:
+                j += 1
+        elif old[i] < new[j]:
+            removed.add(old[i])
+            i += 1
+        else:
+            added.add(new[j])
+            j += 1
+    removed.update(old[i:])
+    added.update(new[j:])
+    return added, removed
+
+
+def select_lines(handle: "IO[bytes]", hashes: "Set[int]") -> "Iterator[str]":
+    """Yield the N-Triples lines of `handle` whose hash is in `hashes`."""
+    for raw in handle:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if line and hash_triple(line) in hashes:
+            yield line
+
+
+def iter_updates(
+    operation: str, lines: "Iterable[str]", batch_size: int = 1000
+) -> "Iterator[Tuple[str, int]]":
+    """Yield `(update, triples)` for SPARQL updates of at most `batch_size` triples.
+
+    Parameters:
+        operation: `INSERT DATA` or `DELETE DATA`.
+        lines: The N-Triples lines of the triples.
+        batch_size: Maximum number of triples per update.
+
+    """
+    batch: "List[str]" = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield f"{operation} {{\n" + "\n".join(batch) + "\n}", len(batch)
+            batch = []
+    if batch:
+        yield f"{operation} {{\n" + "\n".join(batch) + "\n}", len(batch)
@@ -0,0 +1,187 @@
+"""Merging of the SPARQL-JSON results of a query federated over several databases.
+
+The results are merged one source at a time, as they arrive, so that only the
+merged rows are kept in memory. `DISTINCT`, `ORDER BY` and `LIMIT` are applied
+locally, across all the sources.
+"""
+import re
+from functools import partial
+from typing import TYPE_CHECKING, List, Optional
+
+from oteapi.models import AttrDict
+from pydantic import Field
+
+from oteapi_ontokb_plugin.utils.sparql import XSD, term_from_json
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, Iterable, Set, Tuple
+
+
+_ORDER = re.compile(r"^(?:(ASC|DESC)\s*\(\s*)?\??(\w+)\s*\)?$", re.IGNORECASE)
+_NUMERIC = {
+    XSD + _
+    for _ in (
+        "integer",
+        "decimal",
+        "double",
+        "float",
+        "int",
+        "long",
+        "short",
+        "byte",
+        "nonNegativeInteger",
+        "nonPositiveInteger",
+        "positiveInteger",
+        "negativeInteger",
+        "unsignedInt",
+        "unsignedLong",
+        "unsignedShort",
+        "unsignedByte",
+    )
+}
+# Order of the kinds of terms, as in SPARQL `ORDER BY`
+_RANKS = {"bnode": 1, "uri": 2, "literal": 3, "typed-literal": 3}
+
+
+class FederationConfig(AttrDict):
+    """Local post-processing of the merged results of a federated query."""
+
+    distinct: bool = Field(
+        False, description="Remove the duplicate rows across all the sources."
+    )
+    order_by: List[str] = Field(
+        [],
+        description=(
+            "Sort keys of the merged rows, as variables (`?name`), optionally "
+            "wrapped in `ASC()` or `DESC()`."
+        ),
+    )
+    limit: Optional[int] = Field(
+        None,
+        description=(
+            "Maximum number of merged rows, applied after `distinct` and `order_by`. "
+            "A `LIMIT` in the query only applies to each source."
+        ),
+        ge=0,
+    )
+    allow_partial: bool = Field(
+        True,
+        description=(
+            "Return the results of the successful sources when some sources fail, "
+            "instead of raising an error. An error is raised if all sources fail."
+        ),
+    )
+
+
+def parse_order_by(order_by: "Iterable[str]") -> "List[Tuple[str, bool]]":
+    """Return the `(variable, descending)` sort keys of `ORDER BY` expressions."""
+    keys = []
+    for expression in order_by:
+        match = _ORDER.match(expression.strip())
+        if match is None:
+            raise ValueError(
+                f"Unsupported ORDER BY expression: {expression!r}. Use variables, "
+                "optionally wrapped in ASC() or DESC()."
+            )
+        direction, variable = match.groups()
+        keys.append((variable, (direction or "").upper() == "DESC"))
+    return keys
+
+
+def _sort_key(term: "Optional[Dict[str, str]]") -> "Tuple[Any, ...]":
+    """Return the sort key of a SPARQL-JSON term.
+
+    Unbound values come first, then blank nodes, IRIs and literals. Numeric
+    literals are compared by value, before the other literals.
+    """
+    if term is None:
+        return (0,)
+    rank = _RANKS.get(term["type"], 4)
+    if rank == 3 and term.get("datatype") in _NUMERIC:
+        try:
+            return (rank, 0, float(term["value"]), "")
+        except ValueError:
+            pass
+    return (rank, 1, 0.0, term["value"])
+
+
+def _row_key(row: "Dict[str, Any]", variable: str) -> "Tuple[Any, ...]":
+    """Return the sort key of the value of `variable` in a result row."""
+    return _sort_key(row.get(variable))
+
+
+class ResultMerger:
+    """Incremental merge of SPARQL-JSON results.
+
+    Parameters:
+        distinct: Remove the duplicate rows.
+        order_by: Sort keys of the merged rows, see `parse_order_by()`.
+        limit: Maximum number of merged rows, kept after sorting.
+
+    """
+
+    def __init__(
+        self,
+        distinct: bool = False,
+        order_by: "Iterable[str]" = (),
+        limit: "Optional[int]" = None,
+    ) -> None:
+        self.distinct = distinct
+        self.order_by = parse_order_by(order_by)
+        self.limit = limit
+        self.variables: "List[str]" = []
+        self.links: "List[str]" = []
+        self.bindings: "List[Dict[str, Any]]" = []
+        self.boolean: "Optional[bool]" = None
+        self._seen: "Set[Tuple[Tuple[str, Optional[str]], ...]]" = set()
+
+    def add(self, result: "Dict[str, Any]") -> int:
+        """Merge a SPARQL-JSON result.
+
+        Returns:
+            The number of rows added (after removing the duplicates).
+
+        """
+        head = result.get("head", {})
+        for variable in head.get("vars", []):
+            if variable not in self.variables:
+                self.variables.append(variable)
+        for link in head.get("link", []):
+            if link not in self.links:
+                self.links.append(link)
+        if "boolean" in result:
+            # ASK queries: true if true for any source
+            self.boolean = bool(self.boolean) or bool(result["boolean"])
+
+        added = 0
+        for row in result.get("results", {}).get("bindings", []):
+            if self.distinct:
+                key = tuple(
+                    sorted((name, term_from_json(term)) for name, term in row.items())
+                )
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+            self.bindings.append(row)
+            added += 1
+        return added
+
+    def result(self) -> "Dict[str, Any]":
+        """Return the merged SPARQL-JSON result, sorted and limited if requested."""
+        head: "Dict[str, Any]" = {}
+        if self.boolean is not None and not self.variables:
+            if self.links:
+                head["link"] = self.links
+            return {"head": head, "boolean": self.boolean}
+
+        bindings = self.bindings
+        # Stable sorts, from the least to the most significant key
+        for variable, descending in reversed(self.order_by):
+            bindings.sort(key=partial(_row_key, variable=variable), reverse=descending)
+        if self.limit is not None:
+            bindings = bindings[: self.limit]
+
+        head["vars"] = self.variables
+        if self.links:
+            head["link"] = self.links
+        return {"head": head, "results": {"bindings": bindings}}
@@ -0,0 +1,56 @@
+"""JSON (de)coding of OntoREC responses, with an optional fast backend.
+
+[orjson](https://github.com/ijl/orjson) decodes large SPARQL-JSON results several
+times faster than the standard library, and encodes them faster too. It is used
+when installed (`pip install oteapi-ontokb-plugin[fast]`) and requested, the
+standard library otherwise.
+"""
+import json
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Union
+
+
+_ORJSON: "Any" = None
+
+
+def import_orjson() -> "Any":
+    """Import and return `orjson`, or `None` if it is not installed."""
+    global _ORJSON  # pylint: disable=global-statement
+    if _ORJSON is None:
+        try:
+            import orjson  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            _ORJSON = False
+        else:
+            _ORJSON = orjson
+    return _ORJSON or None
+
+
+def loads(content: "Union[bytes, str]", fast: bool = False) -> "Any":
+    """Decode a JSON document.
+
+    Parameters:
+        content: The JSON document, UTF-8 encoded if bytes.
+        fast: Use orjson if it is installed.
+
+    """
+    orjson = import_orjson() if fast else None
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dumps(obj: "Any", fast: bool = False) -> bytes:
+    """Encode `obj` as a UTF-8 JSON document.
+
+    Parameters:
+        obj: The object to encode.
+        fast: Use orjson if it is installed.
+
+    """
+    orjson = import_orjson() if fast else None
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,233 @@
+"""In-process SPARQL evaluation over the RDF document of a pipeline.
+
+When the `application/rdf` parse strategy already brought a document into the
+pipeline, SPARQL queries can be evaluated against it in-process, without a round
+trip to OntoREC. The document is found in the session as left by the parse
+strategy:
+
+- `graph`: reference to the parsed graph in compact binary form,
+- `reference`: reference to the document in the data cache,
+- `file`: reference to the document spilled to local disk,
+- `content`: the document itself.
+
+Only SELECT and ASK queries are evaluated in-process, other queries (CONSTRUCT,
+DESCRIBE) are recognized before any graph is loaded.
+
+The document is loaded into an rdflib in-memory graph, indexed by subject,
+predicate and object (SPO, POS and OSP). Graphs are kept in a process-wide
+least-recently used cache keyed by the hash of the document, so a document is
+only loaded once for all the queries over it.
+
+Evaluating queries requires rdflib (`pip install oteapi-ontokb-plugin[rdf]`).
+"""
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import TYPE_CHECKING
+
+from oteapi_ontokb_plugin.utils.compression import load_cached
+from oteapi_ontokb_plugin.utils.metrics import timed
+from oteapi_ontokb_plugin.utils.rdf import graph_from_bytes, import_rdflib, parse_graph
+from oteapi_ontokb_plugin.utils.spill import map_spilled
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+    from oteapi.models import DataCacheConfig
+    from rdflib import Graph
+    from rdflib.plugins.sparql.sparql import Query
+
+
+LOGGER = logging.getLogger(__name__)
+
+SPARQL_JSON = "application/sparql-results+json"
+
+
+class GraphCache:
+    """Thread-safe least-recently used cache of in-memory graphs.
+
+    Parameters:
+        max_graphs: Maximum number of graphs kept.
+
+    """
+
+    def __init__(self, max_graphs: int = 2) -> None:
+        self.max_graphs = max_graphs
+        self._lock = threading.Lock()
+        self._graphs: "OrderedDict[str, Graph]" = OrderedDict()
+
+    def get(self, key: str, load: "Callable[[], Graph]") -> "Graph":
+        """Return the graph of `key`, loading it with `load` if not cached."""
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                return graph
+
+        # Loaded without the lock, concurrent loads of the same graph are harmless
+        graph = load()
+        with self._lock:
+            self._graphs[key] = graph
+            self._graphs.move_to_end(key)
+            while len(self._graphs) > self.max_graphs:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def clear(self) -> None:
+        """Forget all the graphs."""
+        with self._lock:
+            self._graphs.clear()
+
+
+GRAPHS = GraphCache()
+
+
+def sniff_format(content: "Union[bytes, str]") -> str:
+    """Guess the rdflib parser name of a document from its first characters."""
+    start = content[:256]
+    if isinstance(start, bytes):
+        start = start.decode("utf-8", errors="ignore")
+    start = start.lstrip("\ufeff \t\r\n")
+    if start.startswith("<?xml") or start.startswith("<rdf:RDF"):
+        return "xml"
+    if start[:1] in ("{", "["):
+        return "json-ld"
+    # Turtle is a superset of N-Triples
+    return "turtle"
+
+
+def _cache(datacache_config: "Optional[DataCacheConfig]") -> "Any":
+    """Return the data cache holding the document."""
+    from oteapi.datacache import DataCache  # pylint: disable=import-outside-toplevel
+
+    return DataCache(datacache_config)
+
+
+def _load_graph(datacache_config: "Optional[DataCacheConfig]", key: str) -> "Graph":
+    """Load a graph stored in compact binary form in the data cache."""
+    content = load_cached(_cache(datacache_config), key)
+    if isinstance(content, str):
+        raise TypeError(f"The value stored under {key!r} is not a graph.")
+    return graph_from_bytes(content)
+
+
+def _load_reference(datacache_config: "Optional[DataCacheConfig]", key: str) -> "Graph":
+    """Parse a document stored in the data cache."""
+    content = load_cached(_cache(datacache_config), key)
+    return parse_graph(content, sniff_format(content))
+
+
+def _load_file(reference: "Dict[str, Any]") -> "Graph":
+    """Parse a document spilled to local disk, reading it from its file."""
+    with map_spilled(reference) as view:
+        rdf_format = sniff_format(bytes(view[:256]))
+    graph = import_rdflib().Graph()
+    graph.parse(reference["path"], format=rdf_format)
+    return graph
+
+
+def _load_content(content: "Union[bytes, str]") -> "Graph":
+    """Parse a document found in the session."""
+    return parse_graph(content, sniff_format(content))
+
+
+def _document(
+    session: "Dict[str, Any]", datacache_config: "Optional[DataCacheConfig]"
+) -> "Optional[Tuple[str, Callable[[], Graph]]]":
+    """Return the hash of the document in the session, and how to load it."""
+    graph = session.get("graph")
+    if graph:
+        return graph["content_hash"], partial(
+            _load_graph, datacache_config, graph["key"]
+        )
+
+    reference = session.get("reference")
+    if reference:
+        return reference["checksum"], partial(
+            _load_reference, datacache_config, reference["key"]
+        )
+
+    spilled = session.get("file")
+    if spilled:
+        return spilled["checksum"], partial(_load_file, spilled)
+
+    content = session.get("content")
+    if content:
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        return hashlib.sha256(data).hexdigest(), partial(_load_content, content)
+    return None
+
+
+def session_graph(
+    session: "Optional[Dict[str, Any]]",
+    datacache_config: "Optional[DataCacheConfig]" = None,
+) -> "Optional[Graph]":
+    """Return the in-memory graph of the RDF document in the session, if any.
+
+    Parameters:
+        session: The session, as left by the `application/rdf` parse strategy.
+        datacache_config: Configuration of the data cache holding the document.
+
+    Returns:
+        The graph, loaded once and cached, or `None` if there is no document.
+
+    """
+    document = _document(session or {}, datacache_config)
+    if document is None:
+        return None
+    key, load = document
+
+    def _load() -> "Graph":
+        LOGGER.debug("Loading the graph of document %s", key)
+        with timed("graph_load"):
+            return load()
+
+    return GRAPHS.get(key, _load)
+
+
+def prepare_query(query: str) -> "Optional[Query]":
+    """Parse a SPARQL query for in-process evaluation.
+
+    Returns:
+        The parsed SELECT or ASK query, or `None` for other queries (CONSTRUCT,
+        DESCRIBE), which are not evaluated in-process.
+
+    Raises:
+        ImportError: If rdflib is not installed.
+
+    """
+    import_rdflib()
+    from rdflib.plugins.sparql import (  # pylint: disable=import-outside-toplevel
+        prepareQuery,
+    )
+
+    prepared = prepareQuery(query)
+    if prepared.algebra.name not in ("SelectQuery", "AskQuery"):
+        return None
+    return prepared
+
+
+def query_graph(graph: "Graph", query: "Union[Query, str]") -> bytes:
+    """Evaluate a SELECT or ASK query over `graph`.
+
+    Parameters:
+        graph: The graph.
+        query: The query, as text or as prepared by `prepare_query()`.
+
+    Returns:
+        The SPARQL-JSON result.
+
+    Raises:
+        ValueError: For other queries (CONSTRUCT, DESCRIBE).
+
+    """
+    with timed("local_query"):
+        result = graph.query(query)
+        if result.type not in ("SELECT", "ASK"):
+            raise ValueError(f"{result.type} queries are not evaluated in-process.")
+        output = io.BytesIO()
+        result.serialize(output, format="json")
+        return output.getvalue()
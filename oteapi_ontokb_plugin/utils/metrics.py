@@ -0,0 +1,247 @@
+"""Timing and byte-count instrumentation of the OntoKB strategies.
+
+Measurements are sent to the registered metrics hooks. Nothing is measured while
+no hook is registered, instrumented code then only pays for a function call.
+
+Phases are timed with `timed()` and reported as the `ontokb_phase_seconds`
+observation, labelled with the phase name, and exported as a histogram by
+`OpenMetricsExporter`:
+
+- `download`: download of a document by a download strategy.
+- `cache_read`: read of a cached document or query result.
+- `http_connect`: establishment of a new connection towards OntoREC.
+- `http_ttfb`: time until the response headers of a request are received.
+- `http_transfer`: transfer (and decoding) of a response body.
+- `json_decode`: decoding of a JSON response.
+- `graph_load`: loading of an RDF document into an in-memory graph.
+- `local_query`: in-process evaluation of a SPARQL query.
+- `result_stream`: incremental decoding of a streamed SELECT result, and storage
+  of its batches.
+- `session_update`: creation (validation) of the session update of a strategy.
+
+Counters (`increment()`) are `ontokb_received_bytes` and `ontokb_sent_bytes` (HTTP
+body bytes received from and sent to OntoREC), `ontokb_rows` (SPARQL result rows),
+`ontokb_retries` and `ontokb_hedges` (retried and duplicated read requests) and
+`ontokb_coalesced` (queries sharing the result of an identical query in flight).
+
+Example:
+    ```python
+    from oteapi_ontokb_plugin.utils.metrics import OpenMetricsExporter, add_hook
+
+    exporter = OpenMetricsExporter()
+    add_hook(exporter)
+    ...
+    print(exporter.render())
+    ```
+"""
+import bisect
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+    Labels = Tuple[Tuple[str, str], ...]
+
+
+LOGGER = logging.getLogger(__name__)
+
+PHASE_SECONDS = "ontokb_phase_seconds"
+BYTES_IN = "ontokb_received_bytes"
+BYTES_OUT = "ontokb_sent_bytes"
+ROWS = "ontokb_rows"
+
+# Upper bounds (seconds) of the histogram buckets of the OpenMetrics exporter
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+
+class MetricsHook:
+    """Base class of metrics hooks, ignoring all measurements."""
+
+    def observe(self, name: str, value: float, labels: "Dict[str, str]") -> None:
+        """Record an observation (e.g. a duration in seconds) of `name`."""
+
+    def increment(self, name: str, value: float, labels: "Dict[str, str]") -> None:
+        """Increment the counter `name` by `value`."""
+
+
+_HOOKS: "Tuple[MetricsHook, ...]" = ()
+_HOOKS_LOCK = threading.Lock()
+
+
+def add_hook(hook: MetricsHook) -> None:
+    """Register a metrics hook, enabling the instrumentation."""
+    global _HOOKS  # pylint: disable=global-statement
+    with _HOOKS_LOCK:
+        _HOOKS = _HOOKS + (hook,)
+
+
+def remove_hook(hook: MetricsHook) -> None:
+    """Unregister a metrics hook."""
+    global _HOOKS  # pylint: disable=global-statement
+    with _HOOKS_LOCK:
+        _HOOKS = tuple(_ for _ in _HOOKS if _ is not hook)
+
+
+def enabled() -> bool:
+    """Whether any metrics hook is registered."""
+    return bool(_HOOKS)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Send an observation of `name` to the registered hooks."""
+    for hook in _HOOKS:
+        hook.observe(name, value, labels)
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """Increment the counter `name` of the registered hooks."""
+    for hook in _HOOKS:
+        hook.increment(name, value, labels)
+
+
+class _NullTimer:
+    """Timer used while the instrumentation is disabled."""
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *args: "Any") -> None:
+        pass
+
+
+class _Timer:
+    """Context manager observing its duration as a phase."""
+
+    def __init__(self, labels: "Dict[str, str]") -> None:
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: "Any") -> None:
+        duration = time.perf_counter() - self.start
+        for hook in _HOOKS:
+            hook.observe(PHASE_SECONDS, duration, self.labels)
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(phase: str, **labels: str) -> "Any":
+    """Return a context manager timing `phase`.
+
+    Parameters:
+        phase: Name of the phase.
+        **labels: Additional labels, e.g. `strategy` and `database`.
+
+    """
+    if not _HOOKS:
+        return _NULL_TIMER
+    return _Timer({"phase": phase, **labels})
+
+
+class LoggingHook(MetricsHook):
+    """Metrics hook logging every measurement.
+
+    Parameters:
+        logger: The logger, `oteapi_ontokb_plugin.utils.metrics` by default.
+        level: The logging level.
+
+    """
+
+    def __init__(
+        self, logger: "Optional[logging.Logger]" = None, level: int = logging.DEBUG
+    ) -> None:
+        self.logger = logger or LOGGER
+        self.level = level
+
+    def observe(self, name: str, value: float, labels: "Dict[str, str]") -> None:
+        self.logger.log(self.level, "%s %s %.6f", name, labels, value)
+
+    def increment(self, name: str, value: float, labels: "Dict[str, str]") -> None:
+        self.logger.log(self.level, "%s %s +%s", name, labels, value)
+
+
+def _format_labels(labels: "Tuple[Tuple[str, str], ...]") -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class OpenMetricsExporter(MetricsHook):
+    """Metrics hook aggregating the measurements for the OpenMetrics text format.
+
+    Observations are exported as histograms, counters as counters.
+
+    Parameters:
+        buckets: Upper bounds of the histogram buckets, in increasing order. The
+            `+Inf` bucket is always added.
+
+    """
+
+    def __init__(self, buckets: "Sequence[float]" = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # Per series: the count of every bucket (with `+Inf`), the count and the sum
+        self._histograms: "Dict[str, Dict[Labels, List[float]]]" = {}
+        self._counters: "Dict[str, Dict[Labels, float]]" = {}
+
+    def observe(self, name: str, value: float, labels: "Dict[str, str]") -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {}).setdefault(
+                key, [0] * (len(self.buckets) + 2) + [0.0]
+            )
+            histogram[index] += 1
+            histogram[-2] += 1
+            histogram[-1] += value
+
+    def increment(self, name: str, value: float, labels: "Dict[str, str]") -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counters = self._counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + value
+
+    def reset(self) -> None:
+        """Forget all measurements."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Return the measurements in the OpenMetrics text format."""
+        lines = []
+        bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                if name.endswith("_seconds"):
+                    lines.append(f"# UNIT {name} seconds")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(bounds, histogram):
+                        cumulative += int(count)
+                        bucket = _format_labels(labels + (("le", bound),))
+                        lines.append(f"{name}_bucket{bucket} {cumulative}")
+                    lines.append(
+                        f"{name}_count{_format_labels(labels)} {int(histogram[-2])}"
+                    )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram[-1]}")
+            for name, counters in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                if name.endswith("_bytes"):
+                    lines.append(f"# UNIT {name} bytes")
+                for labels, value in sorted(counters.items()):
+                    lines.append(f"{name}_total{_format_labels(labels)} {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,175 @@
+"""Process-wide registry of pooled HTTP sessions towards OntoREC.
+
+Every strategy talking to an OntoREC instance should fetch its session through
+[`get_session()`][oteapi_ontokb_plugin.utils.pool.get_session], so TCP (and TLS)
+connections to the same `accessUrl` are kept alive and reused between pipeline
+runs instead of being opened anew for every request. Strategies with different
+pool configurations towards the same `accessUrl` get separate sessions.
+
+The HTTP client itself
+([`PooledSession`][oteapi_ontokb_plugin.utils.client.PooledSession]) is only
+imported when the first session is created.
+"""
+import threading
+from typing import TYPE_CHECKING, List, Optional
+
+from oteapi.models import AttrDict
+from pydantic import Field
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, Tuple
+
+    from oteapi_ontokb_plugin.utils.client import PooledSession
+
+
+class PoolConfig(AttrDict):
+    """Connection pool configuration for the OntoREC HTTP client."""
+
+    pool_connections: int = Field(
+        10, description="Number of per-host connection pools to keep around."
+    )
+    pool_maxsize: int = Field(
+        10, description="Maximum number of connections kept alive per host."
+    )
+    pool_block: bool = Field(
+        False,
+        description=(
+            "Whether to wait for a free connection when the pool is exhausted, "
+            "instead of opening an extra (non-pooled) connection."
+        ),
+    )
+    connect_timeout: Optional[float] = Field(
+        None, description="Seconds to wait for a connection to be established."
+    )
+    read_timeout: Optional[float] = Field(
+        None, description="Seconds to wait between bytes received from the server."
+    )
+    retries: int = Field(
+        3,
+        description=(
+            "Number of retries on connection errors. Requests that reached the "
+            "server are not retried."
+        ),
+    )
+    backoff_factor: float = Field(
+        0.5, description="Backoff factor (in seconds) applied between retries."
+    )
+    retry_statuses: List[int] = Field(
+        [],
+        description=(
+            "HTTP status codes for which idempotent requests (GET, HEAD) are retried."
+        ),
+    )
+
+
+class PoolStatistics:
+    """Thread-safe counters for a pooled session.
+
+    Attributes:
+        requests: Number of connections handed out by the pool.
+        new_connections: Number of connections that had to be opened.
+        waits: Number of times a request had to wait for a free connection.
+
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.waits = 0
+
+    def incr(self, counter: str) -> None:
+        """Increment `counter` by one."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @property
+    def hits(self) -> int:
+        """Number of requests served by an already open connection."""
+        return max(self.requests - self.new_connections, 0)
+
+    def as_dict(self) -> "Dict[str, int]":
+        """Return the statistics as a dictionary."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "new_connections": self.new_connections,
+                "waits": self.waits,
+            }
+
+
+_SESSIONS: "Dict[Tuple[str, str], PooledSession]" = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _normalize_url(access_url: "Any") -> str:
+    """Normalize an `accessUrl` for use as registry key."""
+    return str(access_url).rstrip("/")
+
+
+def get_session(
+    access_url: "Any", config: "Optional[PoolConfig]" = None
+) -> "PooledSession":
+    """Return the pooled session for `access_url` and `config`, creating it if
+    needed.
+
+    The session is shared by all strategies in the process using the same
+    `access_url` and pool configuration.
+
+    Parameters:
+        access_url: The OntoREC `accessUrl`.
+        config: The connection pool configuration.
+
+    Returns:
+        The pooled session to use for requests towards `access_url`.
+
+    """
+    from oteapi_ontokb_plugin.utils.client import (  # pylint: disable=import-outside-toplevel
+        PooledSession,
+    )
+
+    config = config if config is not None else PoolConfig()
+    key = (_normalize_url(access_url), config.json(sort_keys=True))
+
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = PooledSession(config)
+            _SESSIONS[key] = session
+        return session
+
+
+def pool_statistics(
+    access_url: "Optional[Any]" = None,
+) -> "Dict[str, Dict[str, int]]":
+    """Return the connection pool statistics, keyed by `accessUrl`.
+
+    Parameters:
+        access_url: Only return the statistics for this `accessUrl`.
+
+    Returns:
+        A dictionary mapping each `accessUrl` to its `requests`, `hits`,
+        `new_connections` and `waits` counters, summed over its sessions.
+
+    """
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.items())
+    url = None if access_url is None else _normalize_url(access_url)
+
+    statistics: "Dict[str, Dict[str, int]]" = {}
+    for (key, _), session in sessions:
+        if url is not None and key != url:
+            continue
+        totals = statistics.setdefault(key, {})
+        for counter, value in session.statistics.as_dict().items():
+            totals[counter] = totals.get(counter, 0) + value
+    return statistics
+
+
+def close_sessions() -> None:
+    """Close all pooled sessions and empty the registry."""
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
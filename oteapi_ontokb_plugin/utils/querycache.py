@@ -0,0 +1,203 @@
+"""Cache of SPARQL query results stored in the OTE-API `DataCache`.
+
+Results are keyed by `accessUrl`, database, normalized query text, reasoning flag
+and the *generation* of the database. The generation is a counter bumped by the
+upload strategy every time new content is added to a database, so results cached
+before an upload are never served again.
+"""
+from typing import TYPE_CHECKING, Optional
+
+from oteapi.models import AttrDict, DataCacheConfig
+from pydantic import Field
+
+from oteapi_ontokb_plugin.utils.compression import pack, unpack
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, List
+
+    from oteapi.datacache import DataCache
+
+    from oteapi_ontokb_plugin.utils.compression import CompressionConfig
+
+
+QUERY_RESULT_TAG = "ontokb-query-result"
+_INDEX_KEY = "ontokb-query-index"
+
+
+class QueryCacheConfig(AttrDict):
+    """SPARQL result cache configuration."""
+
+    enabled: bool = Field(False, description="Whether to cache query results.")
+    expireTime: int = Field(
+        3600, description="Number of seconds before a cached result expires."
+    )
+    max_entries: int = Field(
+        1000, description="Maximum number of results kept in the cache."
+    )
+    max_bytes: int = Field(
+        256 * 1024**2,
+        description="Maximum total size (in bytes) of the results kept in the cache.",
+    )
+    datacache_config: Optional[DataCacheConfig] = Field(
+        None,
+        description=(
+            "Configurations for the data cache storing the results. The `cacheDir` "
+            "must be shared with the upload strategy for invalidation to work."
+        ),
+    )
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a SPARQL query for use in a cache key.
+
+    Comments are dropped and runs of whitespace are collapsed into a single space,
+    except inside string literals and IRIs.
+
+    Parameters:
+        query: The SPARQL query.
+
+    Returns:
+        The normalized query text.
+
+    """
+    result: "List[str]" = []
+    index, length = 0, len(query)
+    pending_space = False
+    while index < length:
+        char = query[index]
+        if char.isspace():
+            pending_space = bool(result)
+            index += 1
+            continue
+        if char == "#":
+            while index < length and query[index] not in "\r\n":
+                index += 1
+            pending_space = bool(result)
+            continue
+
+        if pending_space:
+            result.append(" ")
+            pending_space = False
+
+        if char in "\"'":
+            quote = (
+                query[index : index + 3]
+                if query[index : index + 3] == char * 3
+                else char
+            )
+            end = index + len(quote)
+            while end < length and query[end : end + len(quote)] != quote:
+                end += 2 if query[end] == "\\" else 1
+            end += len(quote)
+            result.append(query[index:end])
+            index = end
+        elif char == "<" and query.find(">", index) != -1:
+            end = query.find(">", index) + 1
+            token = query[index:end]
+            if any(_.isspace() for _ in token):
+                # Less-than operator, not an IRI
+                result.append(char)
+                index += 1
+            else:
+                result.append(token)
+                index = end
+        else:
+            result.append(char)
+            index += 1
+    return "".join(result)
+
+
+def _generation_key(access_url: "Any", database: str) -> str:
+    """Return the cache key of the generation counter of `database`."""
+    return f"ontokb-generation:{str(access_url).rstrip('/')}:{database}"
+
+
+def database_generation(cache: "DataCache", access_url: "Any", database: str) -> int:
+    """Return the current generation of `database`."""
+    return cache.diskcache.get(_generation_key(access_url, database), default=0)
+
+
+def bump_database_generation(
+    cache: "DataCache", access_url: "Any", database: str
+) -> int:
+    """Increment the generation of `database`, invalidating its cached results.
+
+    Returns:
+        The new generation.
+
+    """
+    return cache.diskcache.incr(_generation_key(access_url, database), default=0)
+
+
+class QueryResultCache:
+    """Size-bounded cache of raw SPARQL query results.
+
+    Parameters:
+        config: The result cache configuration.
+        compression: Compression of the stored results, if any.
+
+    """
+
+    def __init__(
+        self,
+        config: QueryCacheConfig,
+        compression: "Optional[CompressionConfig]" = None,
+    ) -> None:
+        from oteapi.datacache import (  # pylint: disable=import-outside-toplevel
+            DataCache,
+        )
+
+        self.config = config
+        self.compression = compression
+        self.cache = DataCache(config.datacache_config)
+
+    def key(self, access_url: "Any", database: str, query: str, reasoning: bool) -> str:
+        """Return the cache key for a query against the current database content."""
+        from oteapi.datacache.datacache import (  # pylint: disable=import-outside-toplevel
+            gethash,
+        )
+
+        return "ontokb-query-" + gethash(
+            [
+                str(access_url).rstrip("/"),
+                database,
+                normalize_query(query),
+                bool(reasoning),
+                database_generation(self.cache, access_url, database),
+            ]
+        )
+
+    def get(self, key: str) -> "Optional[bytes]":
+        """Return the cached result for `key`, or `None` if it is not cached."""
+        value = self.cache.diskcache.get(key, default=None)
+        if value is None:
+            return None
+        content = unpack(value)
+        return content.encode("utf-8") if isinstance(content, str) else content
+
+    def add(self, key: str, value: bytes) -> None:
+        """Store `value` under `key`, evicting the oldest results if needed."""
+        value = pack(value, self.compression)
+        if len(value) > self.config.max_bytes:
+            return
+
+        with self.cache.diskcache.transact():
+            self.cache.add(
+                value, key=key, expire=self.config.expireTime, tag=QUERY_RESULT_TAG
+            )
+            index = [
+                entry
+                for entry in self.cache.diskcache.get(_INDEX_KEY, default=[])
+                if entry[0] != key and entry[0] in self.cache.diskcache
+            ]
+            index.append((key, len(value)))
+
+            total = sum(size for _, size in index)
+            while index and (
+                len(index) > self.config.max_entries or total > self.config.max_bytes
+            ):
+                evicted, size = index.pop(0)
+                self.cache.diskcache.delete(evicted)
+                total -= size
+
+            self.cache.diskcache.set(_INDEX_KEY, index)
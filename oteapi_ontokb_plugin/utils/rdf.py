@@ -0,0 +1,373 @@
+"""RDF parsing helpers and compact binary serialization of parsed graphs.
+
+Parsing relies on [rdflib](https://rdflib.readthedocs.io), an optional dependency
+which can be installed with `pip install oteapi-ontokb-plugin[rdf]`.
+
+A parsed graph is serialized as a term table followed by the triples as arrays of
+term indices. Loading it back only requires creating the terms, which is much
+faster than parsing RDF/XML or Turtle again.
+"""
+import codecs
+import itertools
+import json
+import re
+import struct
+from array import array
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import (
+        Any,
+        BinaryIO,
+        Dict,
+        Iterable,
+        Iterator,
+        List,
+        Optional,
+        Tuple,
+        Union,
+    )
+
+    from rdflib import Graph
+    from rdflib.term import Node
+
+
+IRI, BNODE, LITERAL = 0, 1, 2
+
+MAGIC = b"OKBRDF1\n"
+_HEADER = struct.Struct("<I")
+
+_FORMATS = {
+    "nt": "nt",
+    "ntriples": "nt",
+    "nq": "nquads",
+    "nquads": "nquads",
+    "ttl": "turtle",
+    "turtle": "turtle",
+    "n3": "n3",
+    "rdf": "xml",
+    "owl": "xml",
+    "xml": "xml",
+    "jsonld": "json-ld",
+    "json": "json-ld",
+    "trig": "trig",
+}
+
+
+def import_rdflib() -> "Any":
+    """Import and return `rdflib`, with a helpful error if it is not installed."""
+    try:
+        import rdflib as _rdflib  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:  # pragma: no cover
+        raise ImportError(
+            "Parsing RDF requires rdflib. Install it with "
+            "`pip install oteapi-ontokb-plugin[rdf]`."
+        ) from exc
+    return _rdflib
+
+
+def guess_format(name: "Optional[str]", default: str = "xml") -> str:
+    """Guess the rdflib parser name from a file name or URL extension."""
+    if name:
+        extension = str(name).rsplit("?", 1)[0].rsplit(".", 1)[-1].lower()
+        if extension in _FORMATS:
+            return _FORMATS[extension]
+    return default
+
+
+def parse_graph(data: "Union[bytes, str]", rdf_format: str) -> "Graph":
+    """Parse `data` in `rdf_format` into an in-memory graph."""
+    graph = import_rdflib().Graph()
+    graph.parse(data=data, format=rdf_format)
+    return graph
+
+
+def _encode_term(term: "Node") -> "Tuple[int, str, str]":
+    """Return the `(kind, value, annotation)` encoding of an rdflib term."""
+    rdf = import_rdflib()
+    if isinstance(term, rdf.Literal):
+        if term.language:
+            return LITERAL, str(term), "@" + term.language
+        if term.datatype:
+            return LITERAL, str(term), "^^" + str(term.datatype)
+        return LITERAL, str(term), ""
+    if isinstance(term, rdf.BNode):
+        return BNODE, str(term), ""
+    return IRI, str(term), ""
+
+
+def decode_term(kind: int, value: str, annotation: str) -> "Node":
+    """Create the rdflib term for a `(kind, value, annotation)` encoding."""
+    rdf = import_rdflib()
+    if kind == LITERAL:
+        if annotation.startswith("@"):
+            return rdf.Literal(value, lang=annotation[1:])
+        if annotation.startswith("^^"):
+            return rdf.Literal(value, datatype=rdf.URIRef(annotation[2:]))
+        return rdf.Literal(value)
+    if kind == BNODE:
+        return rdf.BNode(value)
+    return rdf.URIRef(value)
+
+
+def graph_to_bytes(triples: "Iterable[Tuple[Node, Node, Node]]") -> bytes:
+    """Serialize triples to the compact binary form."""
+    term_ids: "Dict[Node, int]" = {}
+    ids = array("I")
+    for triple in triples:
+        for term in triple:
+            ids.append(term_ids.setdefault(term, len(term_ids)))
+
+    header = json.dumps(
+        {"terms": [_encode_term(term) for term in term_ids], "triples": len(ids) // 3},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + _HEADER.size + len(header)) % 4)
+    return b"".join([MAGIC, _HEADER.pack(len(header)), header, bytes(memoryview(ids))])
+
+
+def iter_graph_bytes(
+    data: "Union[bytes, memoryview]",
+) -> "Iterator[Tuple[Node, Node, Node]]":
+    """Yield the triples stored in the compact binary form."""
+    view = memoryview(data)
+    if bytes(view[: len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a serialized RDF graph.")
+    offset = len(MAGIC) + _HEADER.size
+    (size,) = _HEADER.unpack_from(view, len(MAGIC))
+    header = json.loads(bytes(view[offset : offset + size]))
+    offset += size
+
+    terms: "List[Node]" = [decode_term(*term) for term in header["terms"]]
+    ids = view[offset : offset + 12 * header["triples"]].cast("I")
+    for index in range(0, len(ids), 3):
+        yield terms[ids[index]], terms[ids[index + 1]], terms[ids[index + 2]]
+
+
+def graph_from_bytes(data: "Union[bytes, memoryview]") -> "Graph":
+    """Load an in-memory graph from the compact binary form."""
+    graph = import_rdflib().Graph()
+    graph.addN((*triple, graph) for triple in iter_graph_bytes(data))
+    return graph
+
+
+BNODE_IRI = "urn:x-ontokb-bnode:"
+
+_DIRECTIVE = re.compile(
+    r"^(?:@?(?P<prefix>[Pp][Rr][Ee][Ff][Ii][Xx])\s+(?P<name>[^\s:]*):\s*"
+    r"|@?(?P<base>[Bb][Aa][Ss][Ee])\s+)<(?P<iri>[^>]*)>\s*\.?"
+)
+_SKIPPED = re.compile(
+    r'"""(?:[^"\\]|\\.|"(?!""))*"""'
+    r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    r'|"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*'"
+    r"|<[^>]*>"
+    r"|#[^\n]*",
+    re.DOTALL,
+)
+_NAME_CHAR = re.compile(r"[\w:%-]")
+_BNODE_LABEL = re.compile(r"_:([\w-]+(?:\.+[\w-]+)*)")
+_NT_ESCAPES = {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r"}
+
+
+def term_to_nt(term: "Node") -> str:
+    """Return the N-Triples form of an rdflib term.
+
+    IRIs standing for labelled blank nodes (see `BNODE_IRI`) are turned back into
+    blank nodes.
+    """
+    kind, value, annotation = _encode_term(term)
+    if kind == BNODE:
+        return "_:" + value
+    if kind == IRI:
+        if value.startswith(BNODE_IRI):
+            return "_:" + value[len(BNODE_IRI) :]
+        return f"<{value}>"
+    value = "".join(_NT_ESCAPES.get(char, char) for char in value)
+    if annotation.startswith("^^"):
+        return f'"{value}"^^<{annotation[2:]}>'
+    return f'"{value}"{annotation}'
+
+
+def _label_bnodes(text: str) -> str:
+    """Replace labelled blank nodes by IRIs, so that labels are kept when the
+    statements of a document are parsed separately."""
+    pieces = []
+    position = 0
+    for match in _SKIPPED.finditer(text):
+        pieces.append(
+            _BNODE_LABEL.sub(rf"<{BNODE_IRI}\1>", text[position : match.start()])
+        )
+        pieces.append(match.group(0))
+        position = match.end()
+    pieces.append(_BNODE_LABEL.sub(rf"<{BNODE_IRI}\1>", text[position:]))
+    return "".join(pieces)
+
+
+def _split_directives(text: str) -> "Iterator[Tuple[str, str]]":
+    """Yield `("directive", text)` for the leading directives of `text`, then
+    `("statement", text)` for the rest of it, if any."""
+    text = text.strip()
+    while True:
+        match = _DIRECTIVE.match(text)
+        if not match:
+            break
+        yield "directive", match.group(0)
+        text = text[match.end() :].strip()
+    if text:
+        yield "statement", text
+
+
+def iter_turtle_statements(chunks: "Iterable[str]") -> "Iterator[Tuple[str, str]]":
+    """Split a Turtle document into directives and statements.
+
+    The document is read chunk by chunk, only keeping the current statement in
+    memory.
+
+    Parameters:
+        chunks: The decoded document, in chunks of any size.
+
+    Yields:
+        `(kind, text)` tuples, where `kind` is either `"directive"` (`@prefix`,
+        `@base` and their SPARQL-style variants) or `"statement"`.
+
+    """
+    buffer, position, start = "", 0, 0
+    depth = 0
+    state: "Optional[str]" = None  # "iri", "comment" or the quote of a string
+
+    for chunk in itertools.chain(chunks, [None]):
+        eof = chunk is None
+        if chunk is not None:
+            buffer = buffer[start:] + chunk
+            position -= start
+            start = 0
+
+        while position < len(buffer):
+            char = buffer[position]
+            if state == "comment":
+                state = None if char in "\r\n" else state
+                position += 1
+            elif state == "iri":
+                state = None if char == ">" else state
+                position += 1
+            elif state is not None:
+                if not eof and position + len(state) >= len(buffer):
+                    break  # Wait for an escape sequence or closing quotes
+                if char == "\\":
+                    position += 2
+                elif buffer.startswith(state, position):
+                    position += len(state)
+                    state = None
+                else:
+                    position += 1
+            elif char in "\"'":
+                if not eof and position + 3 > len(buffer):
+                    break
+                state = char * 3 if buffer.startswith(char * 3, position) else char
+                position += len(state)
+            elif char == "<":
+                state = "iri"
+                position += 1
+            elif char == "#":
+                state = "comment"
+                position += 1
+            elif char in "[(":
+                depth += 1
+                position += 1
+            elif char in "])":
+                depth -= 1
+                position += 1
+            elif char == "." and depth == 0:
+                if not eof and position + 1 >= len(buffer):
+                    break
+                following = buffer[position + 1 : position + 2]
+                preceding = buffer[position - 1 : position]
+                # Not a terminator in decimals (1.5, .5) and prefixed names (ex:a.b)
+                if not following.isdigit() and not (
+                    _NAME_CHAR.match(following) and _NAME_CHAR.match(preceding)
+                ):
+                    yield from _split_directives(buffer[start : position + 1])
+                    position += 1
+                    start = position
+                else:
+                    position += 1
+            else:
+                position += 1
+
+    yield from _split_directives(buffer[start:])
+
+
+def iter_ntriples(
+    handle: "BinaryIO",
+    rdf_format: str,
+    prefixes: "Optional[Dict[str, str]]" = None,
+    chunk_size: int = 1024**2,
+    batch_size: int = 1000,
+) -> "Iterator[str]":
+    """Yield the N-Triples (or N-Quads) lines of a document, in bounded memory.
+
+    N-Triples and N-Quads documents are passed through line by line. Turtle
+    documents are split into statements, parsed `batch_size` statements at a time.
+
+    Parameters:
+        handle: The document, opened in binary mode.
+        rdf_format: `nt`, `nquads` or `turtle`.
+        prefixes: If given, filled with the prefixes declared in the document.
+        chunk_size: Number of bytes read from `handle` at a time.
+        batch_size: Number of Turtle statements parsed at a time.
+
+    Yields:
+        N-Triples (N-Quads for `nquads`) lines, without trailing newline.
+
+    """
+    if rdf_format in ("nt", "nquads"):
+        for raw in handle:
+            line = raw.decode("utf-8").strip()
+            if line and not line.startswith("#"):
+                yield line
+        return
+    if rdf_format != "turtle":
+        raise ValueError(
+            f"Streaming is only supported for nt, nquads and turtle, not {rdf_format}."
+        )
+
+    prefixes = prefixes if prefixes is not None else {}
+    base: "Optional[str]" = None
+    batch: "List[str]" = []
+
+    def _parse(declared: "Dict[str, str]") -> "Iterator[str]":
+        header = f"@base <{base}> .\n" if base else ""
+        header += "".join(
+            f"@prefix {name}: <{iri}> .\n" for name, iri in declared.items()
+        )
+        graph = parse_graph(header + "\n".join(batch), "turtle")
+        batch.clear()
+        for triple in graph:
+            yield " ".join(term_to_nt(term) for term in triple) + " ."
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = (
+        decoder.decode(chunk) for chunk in iter(lambda: handle.read(chunk_size), b"")
+    )
+    for kind, text in iter_turtle_statements(chunks):
+        if kind == "directive":
+            # Statements must be parsed with the directives declared before them
+            if batch:
+                yield from _parse(prefixes)
+            match = _DIRECTIVE.match(text)
+            if match is None:
+                raise ValueError(f"Invalid Turtle directive: {text[:200]!r}")
+            if match.group("base"):
+                base = match.group("iri")
+            else:
+                prefixes[match.group("name")] = match.group("iri")
+            continue
+
+        batch.append(_label_bnodes(text))
+        if len(batch) >= batch_size:
+            yield from _parse(prefixes)
+    if batch:
+        yield from _parse(prefixes)
@@ -0,0 +1,134 @@
+"""References to payloads stored in the data cache, put in sessions instead of them.
+
+The session of an OTE-API pipeline is serialized at every step, so a large result
+put in the session is encoded and copied over and over. With a reference, the
+payload is stored once in the data cache, and only its key, size, content type
+and checksum go through the session. The payload is loaded when needed with
+`resolve_reference()` or `open_reference()`.
+
+Referenced payloads do not expire from the data cache, as the sessions holding
+the references may outlive the default expiry time of the cache.
+"""
+import hashlib
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from oteapi.models import AttrDict
+from pydantic import Field
+
+from oteapi_ontokb_plugin.utils.compression import load_cached, pack
+from oteapi_ontokb_plugin.utils.jsonbackend import loads
+from oteapi_ontokb_plugin.utils.streaming import hash_content, open_cached
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, BinaryIO, Dict, Iterator, Optional, Union
+
+    from oteapi.datacache import DataCache
+    from oteapi.models import DataCacheConfig
+
+    from oteapi_ontokb_plugin.utils.compression import CompressionConfig
+
+
+class DataReference(AttrDict):
+    """Reference to a payload stored in the data cache."""
+
+    key: str = Field(..., description="Data cache key of the payload.")
+    size: int = Field(..., description="Size of the payload in bytes.")
+    content_type: str = Field(..., description="Content type of the payload.")
+    checksum: str = Field(..., description="SHA-256 hex digest of the payload.")
+
+
+def store_reference(
+    cache: "DataCache",
+    content: bytes,
+    content_type: str,
+    compression: "Optional[CompressionConfig]" = None,
+) -> DataReference:
+    """Store `content` in the data cache, keyed by its checksum, without expiry.
+
+    Parameters:
+        cache: The data cache.
+        content: The payload.
+        content_type: Content type of the payload.
+        compression: Compression of the stored payload.
+
+    Returns:
+        The reference to the stored payload.
+
+    """
+    checksum = hashlib.sha256(content).hexdigest()
+    key = "ontokb-ref-" + checksum
+    if key not in cache:
+        cache.diskcache.set(key, pack(content, compression), tag=cache.config.tag)
+    return DataReference(
+        key=key, size=len(content), content_type=content_type, checksum=checksum
+    )
+
+
+def reference_cached(cache: "DataCache", key: str, content_type: str) -> DataReference:
+    """Return the reference to a payload already stored in the data cache.
+
+    The checksum is computed by reading the payload chunk by chunk. The expiry
+    time of the payload is removed.
+    """
+    cache.diskcache.touch(key, expire=None)
+    with open_cached(cache, key) as handle:
+        checksum, size = hash_content(handle)
+    return DataReference(
+        key=key, size=size, content_type=content_type, checksum=checksum
+    )
+
+
+def _cache(datacache_config: "Optional[DataCacheConfig]") -> "DataCache":
+    from oteapi.datacache import DataCache  # pylint: disable=import-outside-toplevel
+
+    return DataCache(datacache_config)
+
+
+@contextmanager
+def open_reference(
+    reference: "Union[DataReference, Dict[str, Any]]",
+    datacache_config: "Optional[DataCacheConfig]" = None,
+) -> "Iterator[BinaryIO]":
+    """Open a referenced payload as a binary file, without loading it in memory.
+
+    Parameters:
+        reference: The reference, as a model or as found in the session.
+        datacache_config: Configuration of the data cache holding the payload.
+
+    """
+    with open_cached(_cache(datacache_config), reference["key"]) as handle:
+        yield handle
+
+
+def resolve_reference(
+    reference: "Union[DataReference, Dict[str, Any]]",
+    datacache_config: "Optional[DataCacheConfig]" = None,
+    decode: bool = False,
+    verify: bool = True,
+) -> "Any":
+    """Load a referenced payload.
+
+    Parameters:
+        reference: The reference, as a model or as found in the session.
+        datacache_config: Configuration of the data cache holding the payload.
+        decode: Decode the payload as JSON, e.g. a SPARQL-JSON result.
+        verify: Check the payload against the checksum of the reference.
+
+    Returns:
+        The payload, as bytes or decoded.
+
+    Raises:
+        KeyError: If the payload is not in the data cache (anymore).
+        ValueError: If the payload does not match the checksum.
+
+    """
+    content = load_cached(_cache(datacache_config), reference["key"])
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if verify and hashlib.sha256(content).hexdigest() != reference["checksum"]:
+        raise ValueError(
+            f"The payload stored under {reference['key']!r} does not match the "
+            "checksum of the reference."
+        )
+    return loads(content) if decode else content
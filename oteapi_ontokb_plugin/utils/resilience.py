@@ -0,0 +1,311 @@
+"""Deadlines, retries and hedging of the read requests towards OntoREC.
+
+Read requests (SPARQL queries and database exports) are idempotent, so they can
+safely be retried or sent twice:
+
+- Every attempt is bounded by a timeout, and all attempts of a request by an
+  optional deadline.
+- Failed attempts (connection errors, timeouts and transient statuses) are
+  retried after a jittered exponential backoff. Retries are limited to a fraction
+  of the recent requests, so that an overloaded OntoREC is not flooded with them.
+- With hedging, a duplicate of an attempt is sent once it takes longer than a
+  percentile of the recent latencies, and the first response wins.
+
+The recent latencies and retries are tracked per OntoREC instance and database,
+process-wide. The retries of the connection pool (`PoolConfig.retries`) are
+disabled for these requests, so that at most `retries + 1` attempts are sent,
+hedges aside.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, List, Optional
+
+from oteapi.models import AttrDict
+from pydantic import Field
+
+from oteapi_ontokb_plugin.utils.metrics import increment
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Callable, Deque, Dict, Tuple, Type, TypeVar
+
+    T = TypeVar("T")
+
+
+LOGGER = logging.getLogger(__name__)
+
+RETRIES = "ontokb_retries"
+HEDGES = "ontokb_hedges"
+
+
+class DeadlineExceeded(TimeoutError):
+    """The deadline of a request expired before any attempt succeeded."""
+
+
+def retryable_errors() -> "Tuple[Type[BaseException], ...]":
+    """Return the errors of an attempt worth retrying."""
+    import requests  # pylint: disable=import-outside-toplevel
+
+    return (
+        DeadlineExceeded,
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    )
+
+
+class ResilienceConfig(AttrDict):
+    """Deadline, retry and hedging configuration of the read requests."""
+
+    timeout: Optional[float] = Field(
+        60.0,
+        description=(
+            "Timeout (seconds) of every attempt, both to connect and between bytes "
+            "received. The pool timeouts apply if not set."
+        ),
+    )
+    deadline: Optional[float] = Field(
+        None,
+        description="Maximum time (seconds) spent on a request, all attempts included.",
+    )
+    retries: int = Field(2, description="Maximum number of retries of a request.")
+    backoff_factor: float = Field(
+        0.1,
+        description=(
+            "Base delay (seconds) of the exponential backoff. The delay before the "
+            "n-th retry is drawn uniformly up to `backoff_factor * 2 ** (n - 1)`."
+        ),
+    )
+    backoff_max: float = Field(5.0, description="Maximum delay between retries.")
+    retry_statuses: List[int] = Field(
+        [429, 502, 503, 504], description="HTTP status codes retried."
+    )
+    retry_budget: float = Field(
+        0.2,
+        ge=0,
+        description=(
+            "Maximum ratio of retries to recent requests, beyond which failed "
+            "attempts are no longer retried."
+        ),
+    )
+    hedge: bool = Field(
+        False,
+        description=(
+            "Send a duplicate of slow attempts, once they take longer than the "
+            "`hedge_percentile` of the recent latencies."
+        ),
+    )
+    hedge_percentile: float = Field(
+        0.95,
+        gt=0,
+        le=1,
+        description="Percentile of the recent latencies triggering a hedge.",
+    )
+    hedge_min_delay: float = Field(
+        0.01, description="Minimum delay (seconds) before sending a hedge."
+    )
+    hedge_min_samples: int = Field(
+        20, description="Number of recent latencies required before hedging."
+    )
+    window: int = Field(
+        256, description="Number of recent requests tracked for the statistics."
+    )
+
+
+class LatencyTracker:
+    """Thread-safe statistics of the recent requests towards a database.
+
+    Parameters:
+        window: Number of recent requests tracked.
+
+    """
+
+    def __init__(self, window: int = 256) -> None:
+        self._lock = threading.Lock()
+        self.latencies: "Deque[float]" = deque(maxlen=window)
+        self.attempts: "Deque[bool]" = deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        """Record the latency of a successful request."""
+        with self._lock:
+            self.latencies.append(latency)
+
+    def record_attempt(self, retry: bool) -> None:
+        """Record an attempt, and whether it is a retry."""
+        with self._lock:
+            self.attempts.append(retry)
+
+    def percentile(self, percentile: float, min_samples: int = 1) -> "Optional[float]":
+        """Return a percentile of the recent latencies, if there are enough."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies or len(latencies) < min_samples:
+            return None
+        return latencies[min(int(len(latencies) * percentile), len(latencies) - 1)]
+
+    def allow_retry(self, budget: float) -> bool:
+        """Whether the recent retries are within `budget` of the recent attempts.
+
+        A few retries are always allowed, so that isolated failures are retried.
+        """
+        with self._lock:
+            retries = sum(self.attempts)
+            return retries < max(budget * (len(self.attempts) - retries), 3)
+
+
+_TRACKERS: "Dict[Tuple[str, str], LatencyTracker]" = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def get_tracker(access_url: "Any", database: str, window: int = 256) -> LatencyTracker:
+    """Return the latency tracker of a database, creating it if needed."""
+    key = (str(access_url).rstrip("/"), database)
+    with _TRACKERS_LOCK:
+        tracker = _TRACKERS.get(key)
+        if tracker is None or tracker.latencies.maxlen != window:
+            tracker = LatencyTracker(window)
+            _TRACKERS[key] = tracker
+        return tracker
+
+
+def _backoff(config: ResilienceConfig, retry: int) -> float:
+    """Return the jittered delay before the `retry`-th retry."""
+    return random.uniform(  # nosec
+        0, min(config.backoff_max, config.backoff_factor * 2 ** (retry - 1))
+    )
+
+
+def _run(
+    attempt: "Callable[[], T]",
+    hedge_delay: "Optional[float]",
+    timeout: "Optional[float]",
+) -> "T":
+    """Run `attempt` in a thread, waiting at most `timeout` for its result.
+
+    If `hedge_delay` is given and the attempt does not complete within it, a
+    duplicate is started and the result of the first successful one is returned.
+    Attempts still running are left to complete in the background.
+    """
+    end = None if timeout is None else time.monotonic() + timeout
+
+    def _remaining() -> "Optional[float]":
+        return None if end is None else max(end - time.monotonic(), 0)
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        pending = {executor.submit(attempt)}
+        if hedge_delay is not None:
+            remaining = _remaining()
+            hedge = remaining is None or remaining > hedge_delay
+            done, _ = wait(pending, timeout=hedge_delay if hedge else remaining)
+            if not done and hedge:
+                increment(HEDGES)
+                pending.add(executor.submit(attempt))
+
+        error: "Optional[BaseException]" = None
+        while pending:
+            done, pending = wait(
+                pending, timeout=_remaining(), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if error is not None:
+            raise error
+        raise DeadlineExceeded("The deadline expired while waiting for a response.")
+    finally:
+        executor.shutdown(wait=False)
+
+
+def resilient_call(
+    attempt: "Callable[[Optional[float]], T]",
+    config: ResilienceConfig,
+    tracker: LatencyTracker,
+    should_retry: "Optional[Callable[[T], bool]]" = None,
+) -> "T":
+    """Call `attempt` with the configured deadline, retries and hedging.
+
+    Parameters:
+        attempt: Performs one attempt of the request. It is given the timeout
+            (seconds) of the attempt, or `None` to use the default.
+        config: The resilience configuration.
+        tracker: The statistics of the requests towards the same database.
+        should_retry: Whether a result (e.g. a transient error status) is retried.
+
+    Returns:
+        The result of the first successful attempt. The last result is returned
+        when no retries are left.
+
+    Raises:
+        DeadlineExceeded: If the deadline expired before any attempt completed.
+
+    """
+    errors = retryable_errors()
+    start = time.monotonic()
+    retry = 0
+    while True:
+        remaining = None
+        if config.deadline is not None:
+            remaining = config.deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                raise DeadlineExceeded(
+                    f"The deadline of {config.deadline}s expired after "
+                    f"{retry} retries."
+                )
+        timeout = min(
+            (_ for _ in (config.timeout, remaining) if _ is not None), default=None
+        )
+
+        tracker.record_attempt(retry > 0)
+        attempt_start = time.monotonic()
+        error: "Optional[BaseException]" = None
+        try:
+            delay = (
+                tracker.percentile(config.hedge_percentile, config.hedge_min_samples)
+                if config.hedge
+                else None
+            )
+            if delay is None and remaining is None:
+                result = attempt(timeout)
+            else:
+                # In a thread, to hedge the attempt or to bound it by the deadline
+                result = _run(
+                    lambda: attempt(timeout),
+                    None if delay is None else max(delay, config.hedge_min_delay),
+                    remaining,
+                )
+        except errors as exc:
+            error = exc
+        else:
+            if not (should_retry and should_retry(result)):
+                tracker.record(time.monotonic() - attempt_start)
+                return result
+
+        retry += 1
+        sleep = _backoff(config, retry)
+        if (
+            retry > config.retries
+            or not tracker.allow_retry(config.retry_budget)
+            or (
+                config.deadline is not None
+                and time.monotonic() - start + sleep >= config.deadline
+            )
+        ):
+            if error is not None:
+                raise error
+            return result
+        LOGGER.debug(
+            "Retrying (%d/%d) in %.3fs after %s",
+            retry,
+            config.retries,
+            sleep,
+            error if error is not None else "a transient status",
+        )
+        increment(RETRIES)
+        time.sleep(sleep)
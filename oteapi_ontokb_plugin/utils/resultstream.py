@@ -0,0 +1,233 @@
+"""Incremental decoding of large SPARQL-JSON SELECT results.
+
+Decoding a SELECT result with `json.loads()` requires the whole response body, so
+the first row is only available once the transfer is complete, and the memory
+used grows with the size of the result. `SelectResultStream` instead decodes the
+rows of the `results.bindings` array one by one, as the chunks of the body are
+received. Only the row being decoded is buffered.
+
+Row and byte budgets stop the transfer early, e.g. for a runaway query. The rows
+decoded until then are kept, and the result is flagged as truncated.
+
+Example:
+    ```python
+    from oteapi_ontokb_plugin.utils.resultstream import SelectResultStream
+
+    stream = SelectResultStream(chunks, max_rows=1_000_000)
+    for batch in stream.batches(10_000):
+        ...
+    print(stream.variables, stream.rows, stream.truncated)
+    ```
+"""
+import codecs
+import json
+import re
+from typing import TYPE_CHECKING
+
+from oteapi_ontokb_plugin.utils.compression import load_cached
+from oteapi_ontokb_plugin.utils.jsonbackend import loads
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+    from oteapi.models import DataCacheConfig
+
+
+_BINDINGS = re.compile(r'"bindings"\s*:\s*\[')
+_HEAD = re.compile(r'"head"\s*:\s*')
+_DECODER = json.JSONDecoder()
+_SEPARATORS = " \t\r\n,"
+# Characters searched again for the start of the bindings, split across chunks
+_OVERLAP = 64
+
+
+def _head(text: str) -> "Optional[Dict[str, Any]]":
+    """Decode the `head` object found in a part of a SPARQL-JSON result."""
+    match = _HEAD.search(text)
+    if match is None:
+        return None
+    try:
+        head, _ = _DECODER.raw_decode(text, match.end())
+    except json.JSONDecodeError:
+        return None
+    return head if isinstance(head, dict) else None
+
+
+class SelectResultStream:
+    """Rows of a SPARQL-JSON SELECT result, decoded as its body is received.
+
+    The rows are yielded by iterating over the stream, once. `head`, `rows`,
+    `size` and `truncated` are up to date once the iteration has ended.
+
+    Parameters:
+        chunks: The body of the result, chunk by chunk.
+        max_rows: Maximum number of rows decoded.
+        max_bytes: Maximum number of body bytes read. The chunk exceeding it is
+            dropped.
+        encoding: Text encoding of the body.
+
+    """
+
+    def __init__(
+        self,
+        chunks: "Iterable[bytes]",
+        max_rows: "Optional[int]" = None,
+        max_bytes: "Optional[int]" = None,
+        encoding: str = "utf-8",
+    ) -> None:
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.head: "Dict[str, Any]" = {}
+        self.rows = 0
+        self.size = 0
+        self.truncated = False
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._text = ""
+        self._pos = 0
+        self._exhausted = False
+
+    @property
+    def variables(self) -> "List[str]":
+        """The projected variables."""
+        return list(self.head.get("vars", []))
+
+    def __iter__(self) -> "Iterator[Dict[str, Any]]":
+        if not self._find_bindings():
+            return
+        while True:
+            token = self._next_token()
+            if token is None:
+                if self.truncated:
+                    return
+                raise ValueError("The SPARQL-JSON result ends within its bindings.")
+            if token == "]":
+                self._pos += 1
+                self._finish()
+                return
+            if self.max_rows is not None and self.rows >= self.max_rows:
+                self.truncated = True
+                return
+
+            row = self._row()
+            if row is None:
+                return
+            self.rows += 1
+            yield row
+
+    def batches(self, batch_size: int) -> "Iterator[List[Dict[str, Any]]]":
+        """Yield the rows in lists of at most `batch_size` rows."""
+        batch: "List[Dict[str, Any]]" = []
+        for row in self:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _read(self) -> bool:
+        """Append the next chunk of the body to the buffer.
+
+        Returns:
+            Whether a chunk was read, `False` at the end of the body or when the
+            byte budget is exceeded.
+
+        """
+        if self._exhausted:
+            return False
+        if self._pos:
+            self._text = self._text[self._pos :]
+            self._pos = 0
+        for chunk in self._chunks:
+            if self.max_bytes is not None and self.size + len(chunk) > self.max_bytes:
+                self.truncated = True
+                self._exhausted = True
+                return False
+            self.size += len(chunk)
+            text = self._decoder.decode(chunk)
+            if text:
+                self._text += text
+                return True
+        self._text += self._decoder.decode(b"", final=True)
+        self._exhausted = True
+        return False
+
+    def _find_bindings(self) -> bool:
+        """Move to the first row of the bindings, decoding `head` if before them."""
+        start = 0
+        while True:
+            match = _BINDINGS.search(self._text, start)
+            if match is not None:
+                self.head = _head(self._text[: match.start()]) or {}
+                self._pos = match.end()
+                return True
+            start = max(len(self._text) - _OVERLAP, 0)
+            if not self._read():
+                break
+
+        if self.truncated:
+            return False
+        try:
+            document = loads(self._text)
+        except ValueError as exc:
+            raise ValueError("The response is not a SPARQL-JSON result.") from exc
+        raise ValueError(
+            "The response is not a SPARQL-JSON SELECT result: "
+            f"{', '.join(document) if isinstance(document, dict) else type(document)}"
+        )
+
+    def _next_token(self) -> "Optional[str]":
+        """Skip the separators between rows, return the next character."""
+        while True:
+            while self._pos < len(self._text) and self._text[self._pos] in _SEPARATORS:
+                self._pos += 1
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._read():
+                return None
+
+    def _row(self) -> "Optional[Dict[str, Any]]":
+        """Decode the next row, reading more of the body until it is complete."""
+        while True:
+            try:
+                row, end = _DECODER.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError as exc:
+                if self._read():
+                    continue
+                if self.truncated:
+                    return None
+                raise ValueError(
+                    "The SPARQL-JSON result ends within its bindings."
+                ) from exc
+            self._pos = end
+            return row
+
+    def _finish(self) -> None:
+        """Read the rest of the body, decoding `head` if after the bindings."""
+        while self._read():
+            pass
+        if not self.head:
+            self.head = _head(self._text[self._pos :]) or {}
+
+
+def iter_stored_batches(
+    keys: "Iterable[str]",
+    datacache_config: "Optional[Union[DataCacheConfig, Dict[str, Any]]]" = None,
+) -> "Iterator[List[Dict[str, Any]]]":
+    """Load the batches of rows of a streamed result from the data cache.
+
+    Parameters:
+        keys: Data cache keys of the batches, e.g. the `batches` of the
+            `ontokb_stream` manifest.
+        datacache_config: Configuration of the data cache holding the batches.
+
+    Yields:
+        The rows of each batch.
+
+    """
+    from oteapi.datacache import DataCache  # pylint: disable=import-outside-toplevel
+
+    cache = DataCache(datacache_config)
+    for key in keys:
+        yield loads(load_cached(cache, key))
@@ -0,0 +1,209 @@
+"""Splitting of large ontologies into shards uploaded in parallel.
+
+A document is converted to N-Triples (or N-Quads) lines, which are grouped into
+shards of about `shard_size` bytes, each shard holding whole triples. N-Triples,
+N-Quads and Turtle documents are converted incrementally, other formats (e.g.
+RDF/XML) are parsed as a whole with rdflib first.
+
+Blank node labels are scoped to a document, so the triples sharing blank nodes
+must be uploaded together: they are grouped by connected component of blank
+nodes into the last shards, a component never being split across shards.
+"""
+import re
+import tempfile
+from collections import defaultdict
+from contextlib import ExitStack
+from typing import TYPE_CHECKING
+
+from oteapi.models import AttrDict
+from pydantic import Field
+
+from oteapi_ontokb_plugin.utils.delta import iter_triples
+from oteapi_ontokb_plugin.utils.rdf import iter_ntriples
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import IO, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# An N-Triples term, capturing the label of blank nodes only
+_TERM = re.compile(r'"(?:[^"\\\n]|\\.)*"|<[^<>"\s]*>|(_:[^\s<>"]*[^\s<>".])')
+
+
+class ShardingConfig(AttrDict):
+    """Configuration of the sharded upload of large ontologies."""
+
+    enabled: bool = Field(
+        False,
+        description=(
+            "Split the ontology into shards of whole triples, uploaded concurrently "
+            "as separate N-Triples (or N-Quads) files."
+        ),
+    )
+    shard_size: int = Field(
+        64 * 1024**2, description="Target size (in bytes) of the shards.", gt=0
+    )
+    max_workers: int = Field(
+        4,
+        description=(
+            "Maximum number of shards uploaded concurrently. It should not exceed "
+            "the `pool_maxsize` of the pool configuration."
+        ),
+        gt=0,
+    )
+    retries: int = Field(
+        2, description="Maximum number of retries of a failed shard.", ge=0
+    )
+    backoff_factor: float = Field(
+        0.5,
+        description=(
+            "Base delay (seconds) before retrying a shard, doubled at every retry."
+        ),
+    )
+
+
+def shard_extension(rdf_format: str) -> str:
+    """Return the file extension of the shards of a document in `rdf_format`."""
+    return "nq" if rdf_format == "nquads" else "nt"
+
+
+def _blank_nodes(line: str) -> "List[str]":
+    """Return the blank node labels of an N-Triples (or N-Quads) line."""
+    return [label for label in _TERM.findall(line) if label]
+
+
+class _Components:
+    """Union-find of blank node labels, giving the connected components of the
+    triples sharing blank nodes."""
+
+    def __init__(self) -> None:
+        self._parent: "Dict[str, str]" = {}
+
+    def find(self, label: str) -> str:
+        """Return the representative label of the component of `label`."""
+        root = label
+        while self._parent.get(root, root) != root:
+            root = self._parent[root]
+        while label != root:
+            self._parent[label], label = root, self._parent[label]
+        return root
+
+    def union(self, labels: "Iterable[str]") -> None:
+        """Merge the components of `labels`."""
+        roots = [self.find(_) for _ in labels]
+        for root in roots[1:]:
+            if root != roots[0]:
+                self._parent[root] = roots[0]
+
+
+def _assign_components(
+    sizes: "Dict[str, int]", shard_size: int
+) -> "Tuple[Dict[str, int], int]":
+    """Assign components to shards, in order of appearance, a new shard being
+    started when the current one would exceed `shard_size`.
+
+    Returns:
+        The shard index of every component, and the number of shards.
+
+    """
+    assigned: "Dict[str, int]" = {}
+    totals: "List[int]" = []
+    for root, size in sizes.items():
+        if not totals or (totals[-1] and totals[-1] + size > shard_size):
+            totals.append(0)
+        assigned[root] = len(totals) - 1
+        totals[-1] += size
+    return assigned, len(totals)
+
+
+def _component_shards(
+    spool: "IO[bytes]", components: _Components, shard_size: int
+) -> "Iterator[Tuple[bytes, int]]":
+    """Group the spooled triples with blank nodes into shards of whole components.
+
+    Each spooled line is prefixed with one of its blank node labels.
+    """
+    sizes: "Dict[str, int]" = defaultdict(int)
+    spool.seek(0)
+    for line in spool:
+        label, data = line.split(b" ", 1)
+        sizes[components.find(label.decode("utf-8"))] += len(data)
+
+    assigned, number = _assign_components(sizes, shard_size)
+    with ExitStack() as stack:
+        shards = [stack.enter_context(tempfile.TemporaryFile()) for _ in range(number)]
+        counts = [0] * number
+        spool.seek(0)
+        for line in spool:
+            label, data = line.split(b" ", 1)
+            index = assigned[components.find(label.decode("utf-8"))]
+            shards[index].write(data)
+            counts[index] += 1
+        for shard, count in zip(shards, counts):
+            shard.seek(0)
+            yield shard.read(), count
+
+
+def iter_shards(
+    handle: "BinaryIO", rdf_format: str, shard_size: int
+) -> "Iterator[Tuple[bytes, int]]":
+    """Split a document into shards of whole triples.
+
+    Only the current shard is held in memory, the triples with blank nodes are
+    spooled to temporary files and only their blank node labels are kept in
+    memory.
+
+    Parameters:
+        handle: The document, opened in binary mode.
+        rdf_format: rdflib parser name of the document format.
+        shard_size: Target size (in bytes) of the shards. A shard of triples
+            sharing blank nodes is larger when their component is.
+
+    Yields:
+        `(content, triples)` tuples: the N-Triples (or N-Quads) content of a shard
+        and its number of triples.
+
+    """
+    if rdf_format in ("nt", "nquads", "turtle"):
+        lines = iter_ntriples(handle, rdf_format)
+    else:
+        lines = iter_triples(handle, rdf_format)
+
+    components = _Components()
+    with tempfile.SpooledTemporaryFile(max_size=shard_size) as bnodes:
+        shard, size = [], 0
+        for line in lines:
+            data = line.encode("utf-8") + b"\n"
+            labels = _blank_nodes(line)
+            if labels:
+                components.union(labels)
+                bnodes.write(labels[0].encode("utf-8") + b" " + data)
+                continue
+            shard.append(data)
+            size += len(data)
+            if size >= shard_size:
+                yield b"".join(shard), len(shard)
+                shard, size = [], 0
+        if shard:
+            yield b"".join(shard), len(shard)
+        yield from _component_shards(bnodes, components, shard_size)
+
+
+def pad_shards(
+    shards: "Iterable[Tuple[bytes, int]]",
+    previous: int,
+    record: "Callable[[int], None]",
+) -> "Iterator[Tuple[bytes, int]]":
+    """Yield `shards`, then empty shards up to the `previous` number of shards.
+
+    The empty shards overwrite the stale shards of a previous upload in more
+    shards. `record` is called with the number of shards whenever it exceeds
+    `previous`, before yielding the shard, so the shards of an interrupted upload
+    can be cleared as well.
+    """
+    count = 0
+    for shard in shards:
+        count += 1
+        if count > previous:
+            record(count)
+        yield shard
+    for _ in range(count, previous):
+        yield b"", 0
@@ -0,0 +1,109 @@
+"""Coalescing of identical in-flight requests ("single flight").
+
+While a call with a given key is in flight, other calls with the same key wait for
+it and share its result (or its error) instead of running again. Threads wait with
+`SingleFlight.run()`, asyncio tasks with `SingleFlight.run_async()`, without
+blocking the event loop. Both kinds of callers can share the same calls.
+
+Example:
+    ```python
+    flight = SingleFlight()
+
+    result, shared = flight.run(("db", query), lambda: run_query(query))
+    result, shared = await flight.run_async(("db", query), lambda: arun_query(query))
+    ```
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+
+from oteapi_ontokb_plugin.utils.metrics import increment
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+    T = TypeVar("T")
+
+
+COALESCED = "ontokb_coalesced"
+
+
+class _Call:
+    """A call in flight."""
+
+    def __init__(self) -> None:
+        self.future: "Future[Any]" = Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-safe registry of the calls in flight, by key."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: "Dict[Hashable, _Call]" = {}
+
+    def _join(self, key: "Hashable") -> "Tuple[_Call, bool]":
+        """Return the call in flight for `key`, and whether it is a new one."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                return call, True
+            call.waiters += 1
+        increment(COALESCED)
+        return call, False
+
+    def _finish(self, key: "Hashable", call: _Call) -> bool:
+        """Remove the call from the calls in flight, return whether it is shared."""
+        with self._lock:
+            del self._calls[key]
+            return call.waiters > 0
+
+    def run(self, key: "Hashable", func: "Callable[[], T]") -> "Tuple[T, bool]":
+        """Call `func`, unless a call with the same key is in flight.
+
+        Parameters:
+            key: Identifies identical calls.
+            func: The call.
+
+        Returns:
+            The result of the call and whether it was shared with other callers.
+
+        Raises:
+            Exception: The error raised by the call.
+
+        """
+        call, new = self._join(key)
+        if not new:
+            return call.future.result(), True
+        try:
+            result = func()
+        except BaseException as exc:
+            self._finish(key, call)
+            call.future.set_exception(exc)
+            raise
+        shared = self._finish(key, call)
+        call.future.set_result(result)
+        return result, shared
+
+    async def run_async(
+        self, key: "Hashable", func: "Callable[[], Awaitable[T]]"
+    ) -> "Tuple[T, bool]":
+        """Await `func()`, unless a call with the same key is in flight.
+
+        See `run()`.
+        """
+        call, new = self._join(key)
+        if not new:
+            return await asyncio.wrap_future(call.future), True
+        try:
+            result = await func()
+        except BaseException as exc:
+            self._finish(key, call)
+            call.future.set_exception(exc)
+            raise
+        shared = self._finish(key, call)
+        call.future.set_result(result)
+        return result, shared
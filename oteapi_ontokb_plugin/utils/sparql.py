@@ -0,0 +1,307 @@
+"""Helpers for templated SPARQL queries with batched `VALUES` bindings.
+
+A template is a regular SPARQL query using the parameter variables (e.g.
+`?material`) like any other variable. For a list of bindings, the template is
+rewritten into a handful of queries, each with a `VALUES` block holding a batch
+of bindings. The combined results are then split back per binding, by matching
+the values of the parameter variables in each result row.
+"""
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+_LITERAL = re.compile(
+    r"""^(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)')"""
+    r"""(?:@([a-zA-Z]+(?:-[a-zA-Z0-9]+)*)|\^\^<([^<>"{}|^`\\\s]*)>)?$""",
+    re.DOTALL,
+)
+_IRI = re.compile(r"""^<([^<>"{}|^`\\\s]*)>$""")
+_INTEGER = re.compile(r"^[+-]?[0-9]+$")
+_DECIMAL = re.compile(r"^[+-]?[0-9]*\.[0-9]+$")
+_DOUBLE = re.compile(r"^[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)[eE][+-]?[0-9]+$")
+_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f"}
+_AGGREGATES = {"COUNT", "SUM", "MIN", "MAX", "AVG", "SAMPLE", "GROUP_CONCAT"}
+
+
+def _unescape(value: str) -> str:
+    """Decode the escape sequences of a SPARQL string literal."""
+
+    def _replace(match: "re.Match") -> str:
+        escape = match.group(1)
+        if escape[0] in "uU":
+            return chr(int(escape[1:], 16))
+        return _ESCAPES.get(escape, escape)
+
+    return re.sub(r"\\(u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|.)", _replace, value)
+
+
+def _escape(value: str) -> str:
+    """Escape a string for use in a SPARQL/N-Triples string literal."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _literal(value: str, language: "Optional[str]", datatype: "Optional[str]") -> str:
+    """Return the canonical form of a literal."""
+    if language:
+        return f'"{_escape(value)}"@{language.lower()}'
+    if datatype and datatype != XSD + "string":
+        return f'"{_escape(value)}"^^<{datatype}>'
+    return f'"{_escape(value)}"'
+
+
+def canonical_term(value: "Any") -> str:
+    """Return the canonical SPARQL form of a binding value.
+
+    Accepted values are full IRIs (`<http://...>`), quoted literals with an
+    optional language tag or datatype IRI, SPARQL numeric and boolean shorthands
+    and Python `int`, `float` and `bool` values.
+
+    Raises:
+        ValueError: If the value cannot be interpreted as an RDF term, e.g. a
+            prefixed name or a blank node.
+
+    """
+    if isinstance(value, bool):
+        return _literal(str(value).lower(), None, XSD + "boolean")
+    if isinstance(value, int):
+        return _literal(str(value), None, XSD + "integer")
+    if isinstance(value, float):
+        return _literal(repr(value), None, XSD + "double")
+    if not isinstance(value, str):
+        raise ValueError(f"Unsupported binding value: {value!r}")
+
+    value = value.strip()
+    match = _IRI.match(value)
+    if match:
+        return value
+    match = _LITERAL.match(value)
+    if match:
+        lexical = match.group(1) if match.group(1) is not None else match.group(2)
+        return _literal(_unescape(lexical), match.group(3), match.group(4))
+    if value in ("true", "false"):
+        return _literal(value, None, XSD + "boolean")
+    for pattern, datatype in (
+        (_INTEGER, "integer"),
+        (_DECIMAL, "decimal"),
+        (_DOUBLE, "double"),
+    ):
+        if pattern.match(value):
+            return _literal(value, None, XSD + datatype)
+    raise ValueError(
+        f"Unsupported binding value: {value!r}. Use full IRIs (<...>) or literals."
+    )
+
+
+def term_from_json(term: "Optional[Dict[str, str]]") -> "Optional[str]":
+    """Return the canonical SPARQL form of a SPARQL-JSON result term."""
+    if term is None:
+        return None
+    if term["type"] == "uri":
+        return f"<{term['value']}>"
+    if term["type"] == "bnode":
+        return f"_:{term['value']}"
+    return _literal(term["value"], term.get("xml:lang"), term.get("datatype"))
+
+
+def _tokens(query: str) -> "Iterator[Tuple[int, str]]":
+    """Yield `(position, token)` for the keywords, variables and brackets of a
+    query, skipping string literals, IRIs and comments."""
+    index, length = 0, len(query)
+    while index < length:
+        char = query[index]
+        if char in "\"'":
+            quote = char * 3 if query[index : index + 3] == char * 3 else char
+            index += len(quote)
+            while index < length and query[index : index + len(quote)] != quote:
+                index += 2 if query[index] == "\\" else 1
+            index += len(quote)
+        elif char == "<" and re.match(r"<[^<>\"{}|^`\\\s]*>", query[index:]):
+            index = query.index(">", index) + 1
+        elif char == "#":
+            while index < length and query[index] not in "\r\n":
+                index += 1
+        elif char.isalpha() or char in "?$":
+            match = re.match(r"[?$]?[\w:.-]*\w|[?$]?\w", query[index:])
+            if match is None:
+                # A lone `?` or `$`, not followed by a variable name
+                index += 1
+                continue
+            token = match.group(0)
+            yield index, token
+            index += len(token)
+        elif char in "{}()*":
+            yield index, char
+            index += 1
+        else:
+            index += 1
+
+
+class TemplateQuery:
+    """A SPARQL query template, to be expanded with batches of bindings.
+
+    Parameters:
+        query: The SPARQL template.
+        variables: Names (without `?`) of the parameter variables.
+
+    Raises:
+        ValueError: If the template has no group graph pattern, or if it
+            aggregates results without grouping by and projecting the parameter
+            variables.
+
+    """
+
+    def __init__(self, query: str, variables: "List[str]") -> None:
+        self.query = query
+        self.variables = variables
+
+        tokens = list(_tokens(query))
+        upper = [token.upper() for _, token in tokens]
+
+        # Position of the group graph pattern, where VALUES is injected
+        if "WHERE" in upper:
+            start = upper.index("WHERE")
+        elif "{" in upper:
+            start = upper.index("{")
+        else:
+            start = len(upper)
+        if "{" not in upper[start:]:
+            raise ValueError("The SPARQL template has no group graph pattern.")
+        self._values_position = tokens[upper.index("{", start)][0] + 1
+
+        # Parameter variables missing from the projection of a SELECT
+        self.added: "List[str]" = []
+        self._projection_position: "Optional[int]" = None
+        if "SELECT" in upper:
+            start = upper.index("SELECT")
+            end = start + 1
+            # Variables projected as such or bound with `(expression AS ?var)`
+            projected, depth, star, aggregate = set(), 0, False, False
+            while end < len(tokens) and upper[end] not in ("WHERE", "FROM", "{"):
+                token = tokens[end][1]
+                if token == "(":
+                    depth += 1
+                elif token == ")":
+                    depth -= 1
+                elif token == "*" and depth == 0:
+                    star = True
+                elif token[0] in "?$" and (depth == 0 or upper[end - 1] == "AS"):
+                    projected.add(token[1:])
+                elif depth and upper[end] in _AGGREGATES:
+                    aggregate = True
+                end += 1
+            if not star:
+                self.added = [_ for _ in variables if _ not in projected]
+                self._projection_position = (
+                    tokens[end][0] if end < len(tokens) else len(query)
+                )
+            if aggregate and "GROUP" not in upper:
+                raise ValueError(
+                    "Aggregating SPARQL templates must group by the parameter "
+                    f"variables {', '.join('?' + _ for _ in variables)}."
+                )
+        if self.added and "GROUP" in upper:
+            raise ValueError(
+                "Aggregating SPARQL templates must project the parameter variables "
+                f"{', '.join('?' + _ for _ in self.added)}."
+            )
+
+        # Batching changes the meaning of LIMIT/OFFSET, which apply to all rows
+        self.batchable = "LIMIT" not in upper and "OFFSET" not in upper
+
+    def render(self, bindings: "List[List[str]]") -> str:
+        """Return the query for a batch of canonical bindings."""
+        values = (
+            f" VALUES ({' '.join('?' + _ for _ in self.variables)}) {{ "
+            + " ".join(f"({' '.join(binding)})" for binding in bindings)
+            + " } "
+        )
+        query = (
+            self.query[: self._values_position]
+            + values
+            + self.query[self._values_position :]
+        )
+        if self._projection_position is not None and self.added:
+            query = (
+                query[: self._projection_position]
+                + " ".join("?" + _ for _ in self.added)
+                + " "
+                + query[self._projection_position :]
+            )
+        return query
+
+    def batches(
+        self, bindings: "List[Dict[str, Any]]", max_batch_size: int
+    ) -> "List[Tuple[str, List[List[str]]]]":
+        """Split `bindings` into batches, returning `(query, batch)` pairs.
+
+        Raises:
+            ValueError: If a binding does not bind exactly the parameter variables.
+
+        """
+        canonical = []
+        for binding in bindings:
+            if set(binding) != set(self.variables):
+                raise ValueError(
+                    f"Binding {binding!r} must define exactly the variables "
+                    f"{', '.join(self.variables)}."
+                )
+            canonical.append([canonical_term(binding[_]) for _ in self.variables])
+
+        size = max(max_batch_size, 1) if self.batchable else 1
+        return [
+            (
+                self.render(canonical[start : start + size]),
+                canonical[start : start + size],
+            )
+            for start in range(0, len(canonical), size)
+        ]
+
+
+def split_values_result(
+    result: "Dict[str, Any]",
+    variables: "List[str]",
+    bindings: "List[List[str]]",
+    added: "Optional[List[str]]" = None,
+) -> "List[Dict[str, Any]]":
+    """Split the SPARQL-JSON result of a batched query per binding.
+
+    Parameters:
+        result: The SPARQL-JSON result of the batched query.
+        variables: Names of the parameter variables.
+        bindings: The canonical bindings of the batch.
+        added: Parameter variables that were added to the projection, removed
+            again from the split results.
+
+    Returns:
+        One SPARQL-JSON result per binding, in the order of `bindings`.
+
+    """
+    added = added or []
+    head = dict(result.get("head", {}))
+    if "vars" in head:
+        head["vars"] = [_ for _ in head["vars"] if _ not in added]
+
+    rows: "Dict[Tuple[Optional[str], ...], List[Dict[str, Any]]]" = {
+        tuple(binding): [] for binding in bindings
+    }
+    for row in result.get("results", {}).get("bindings", []):
+        key = tuple(term_from_json(row.get(_)) for _ in variables)
+        if key in rows:
+            rows[key].append(
+                {name: value for name, value in row.items() if name not in added}
+            )
+
+    return [
+        {"head": head, "results": {"bindings": rows[tuple(binding)]}}
+        for binding in bindings
+    ]
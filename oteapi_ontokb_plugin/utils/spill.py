@@ -0,0 +1,154 @@
+"""Content-addressed spill files, accessed through memory maps.
+
+Large documents are copied chunk by chunk to a file on local disk named after the
+SHA-256 hash of their content, instead of being loaded in memory. Only a reference
+to the file goes into the session. Consumers then map the file in memory with
+`map_spilled()`, letting the operating system page it in on demand, or decode it
+lazily with `iter_text()`. The file can also be given, by path, to parsers reading
+from files.
+
+Identical documents share the same file. The files are not removed automatically.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from oteapi.models import AttrDict
+from pydantic import Field
+
+from oteapi_ontokb_plugin.utils.streaming import DEFAULT_CHUNK_SIZE, iter_chunks
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, BinaryIO, Dict, Iterator, Optional, Union
+
+
+class SpilledFile(AttrDict):
+    """Reference to a document spilled to a content-addressed file."""
+
+    path: str = Field(..., description="Path of the file on local disk.")
+    size: int = Field(..., description="Size of the document in bytes.")
+    checksum: str = Field(..., description="SHA-256 hex digest of the document.")
+    encoding: str = Field("utf-8", description="Text encoding of the document.")
+
+
+def default_spill_dir() -> str:
+    """Return the default directory of the spill files."""
+    return os.path.join(tempfile.gettempdir(), "oteapi-ontokb-spill")
+
+
+def spill(
+    handle: "BinaryIO",
+    directory: "Optional[str]" = None,
+    suffix: str = "",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> SpilledFile:
+    """Copy the content of `handle` to a content-addressed file.
+
+    The content is written chunk by chunk to a temporary file, renamed after its
+    hash once complete. An existing file with the same content is reused.
+
+    Parameters:
+        handle: The document, opened in binary mode.
+        directory: Directory of the spill files, `default_spill_dir()` by default.
+        suffix: Suffix of the file name, e.g. the `.ttl` extension.
+        chunk_size: Number of bytes copied at a time.
+
+    Returns:
+        The reference to the file.
+
+    """
+    directory = directory or default_spill_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    descriptor, partial = tempfile.mkstemp(dir=directory, suffix=".partial")
+    try:
+        with os.fdopen(descriptor, "wb") as output:
+            for chunk in iter_chunks(handle, chunk_size):
+                digest.update(chunk)
+                output.write(chunk)
+                size += len(chunk)
+        checksum = digest.hexdigest()
+        path = os.path.join(directory, checksum + suffix)
+        if os.path.exists(path) and os.path.getsize(path) == size:
+            os.remove(partial)
+        else:
+            os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return SpilledFile(path=path, size=size, checksum=checksum)
+
+
+def _path(reference: "Union[SpilledFile, Dict[str, Any]]") -> str:
+    """Return the path of a spilled file, checking that it is still there."""
+    path = reference["path"]
+    if not os.path.exists(path) or os.path.getsize(path) != reference["size"]:
+        raise FileNotFoundError(f"The spilled file {path!r} is missing or changed.")
+    return path
+
+
+@contextmanager
+def map_spilled(
+    reference: "Union[SpilledFile, Dict[str, Any]]",
+) -> "Iterator[memoryview]":
+    """Map a spilled file in memory, read-only.
+
+    Pages are only read from disk when accessed. The returned view is released at
+    the end of the block. Views sliced from it keep the file mapped until they are
+    released or garbage collected: release them, or copy them with `bytes()`, to
+    unmap the file at the end of the block.
+
+    Parameters:
+        reference: The reference, as a model or as found in the session.
+
+    Yields:
+        A memory view of the whole document.
+
+    """
+    path = _path(reference)
+    if reference["size"] == 0:
+        yield memoryview(b"")
+        return
+    with open(path, "rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                # Slices of the view are still alive, the map is closed with them
+                pass
+
+
+def iter_text(
+    reference: "Union[SpilledFile, Dict[str, Any]]",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> "Iterator[str]":
+    """Decode a spilled file lazily, `chunk_size` characters at a time.
+
+    Parameters:
+        reference: The reference, as a model or as found in the session.
+        chunk_size: Number of characters decoded at a time.
+
+    Yields:
+        The decoded text, chunk by chunk.
+
+    """
+    with open(
+        _path(reference), "r", encoding=reference["encoding"], newline=""
+    ) as handle:
+        yield from iter(lambda: handle.read(chunk_size), "")
+
+
+def read_text(reference: "Union[SpilledFile, Dict[str, Any]]") -> str:
+    """Decode a whole spilled file."""
+    return "".join(iter_text(reference))
@@ -0,0 +1,167 @@
+"""Helpers for streaming content in bounded memory."""
+import hashlib
+import io
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from oteapi_ontokb_plugin.utils.compression import open_packed
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, BinaryIO, Iterable, Iterator, Tuple
+
+    from oteapi.datacache import DataCache
+
+
+DEFAULT_CHUNK_SIZE = 1024**2
+
+
+class _TextEncoder(io.RawIOBase):
+    """Read-only binary file-like view of a `str`, encoded on the fly.
+
+    Positions are byte offsets in the encoded text. Seeking backwards encodes the
+    text again from the start.
+    """
+
+    def __init__(self, text: str, encoding: str = "utf-8") -> None:
+        super().__init__()
+        self._text = text
+        self._encoding = encoding
+        self._position = 0
+        self._buffer = b""
+        self._offset = 0
+
+    def readable(self) -> bool:  # pylint: disable=no-self-use
+        """Whether the file can be read, always."""
+        return True
+
+    def seekable(self) -> bool:  # pylint: disable=no-self-use
+        """Whether the file supports seeking, always."""
+        return True
+
+    def readinto(self, buffer: "Any") -> int:
+        """Encode up to `len(buffer)` bytes of the text into `buffer`."""
+        while len(self._buffer) < len(buffer) and self._position < len(self._text):
+            step = max(len(buffer) // 4, 1)
+            self._buffer += self._text[self._position : self._position + step].encode(
+                self._encoding
+            )
+            self._position += step
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        self._offset += size
+        return size
+
+    def tell(self) -> int:
+        """Return the position in the encoded text."""
+        return self._offset
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to `offset` in the encoded text."""
+        if whence == io.SEEK_CUR:
+            offset += self._offset
+        elif whence == io.SEEK_END:
+            while self.read(DEFAULT_CHUNK_SIZE):
+                pass
+            offset += self._offset
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence: {whence}")
+        if offset < 0:
+            raise ValueError(f"Negative seek position: {offset}")
+
+        if offset < self._offset:
+            self._position = self._offset = 0
+            self._buffer = b""
+        while self._offset < offset and self.read(
+            min(offset - self._offset, DEFAULT_CHUNK_SIZE)
+        ):
+            pass
+        return self._offset
+
+
+@contextmanager
+def open_cached(cache: "DataCache", key: str) -> "Iterator[BinaryIO]":
+    """Open the value stored under `key` in `cache` as a binary file.
+
+    Binary values stored on disk by the cache are read directly from their file,
+    without loading them in memory. Compressed payloads are decompressed and text
+    values encoded as UTF-8 on the fly.
+
+    Parameters:
+        cache: The data cache.
+        key: Key of the value to open.
+
+    Yields:
+        A binary file-like object positioned at the start of the value.
+
+    """
+    if key not in cache:
+        raise KeyError(key)
+
+    reader: "BinaryIO"
+    handle = cache.diskcache.get(key, read=True)
+    if isinstance(handle, str):
+        handle = reader = io.BufferedReader(_TextEncoder(handle))
+    else:
+        if isinstance(handle, (bytes, bytearray)):
+            handle = io.BytesIO(handle)
+        reader = open_packed(handle)
+    try:
+        yield reader
+    finally:
+        if reader is not handle:
+            reader.close()
+        handle.close()
+
+
+def iter_chunks(
+    handle: "BinaryIO", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> "Iterator[bytes]":
+    """Yield the content of `handle` in chunks of at most `chunk_size` bytes."""
+    while True:
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def hash_content(
+    handle: "BinaryIO", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> "Tuple[str, int]":
+    """Return the SHA-256 hex digest and the size of the content of `handle`.
+
+    The content is read chunk by chunk, and `handle` is rewound afterwards.
+    """
+    start = handle.tell()
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter_chunks(handle, chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    handle.seek(start)
+    return digest.hexdigest(), size
+
+
+def iter_multipart(
+    field: str, filename: str, chunks: "Iterable[bytes]", boundary: str
+) -> "Iterator[bytes]":
+    """Yield a `multipart/form-data` body holding a single file part.
+
+    Parameters:
+        field: Name of the form field.
+        filename: Name of the uploaded file.
+        chunks: The file content.
+        boundary: The multipart boundary, which must not occur in the content.
+
+    Yields:
+        The encoded body, chunk by chunk.
+
+    """
+    filename = filename.replace('"', "%22")
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8")
+    yield from chunks
+    yield f"\r\n--{boundary}--\r\n".encode("utf-8")
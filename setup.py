@@ -1,6 +1,7 @@
 """Setup for OTE-API OntoKB Plugin."""
 import re
 from pathlib import Path
+from typing import List
 
 from setuptools import find_packages, setup
 
@@ -37,23 +38,23 @@ with open(TOP_DIR / PACKAGE_NAME / "__init__.py", "r", encoding="utf8") as handl
     AUTHOR = AUTHOR.group("author")  # type: ignore[union-attr]
     AUTHOR_EMAIL = AUTHOR_EMAIL.group("email")  # type: ignore[union-attr]
 
-BASE = [
-    _.strip()
-    for _ in (TOP_DIR / "requirements.txt").read_text(encoding="utf8").splitlines()
-    if not _.startswith("#") and "git+" not in _
-]
 
-DOCS = [
-    _.strip()
-    for _ in (TOP_DIR / "requirements_docs.txt").read_text(encoding="utf8").splitlines()
-    if not _.startswith("#") and "git+" not in _
-]
+def requirements(filename: str) -> List[str]:
+    """Return the requirements listed in `filename`, skipping comments and git
+    dependencies."""
+    return [
+        _.strip()
+        for _ in (TOP_DIR / filename).read_text(encoding="utf8").splitlines()
+        if not _.startswith("#") and "git+" not in _
+    ]
 
-DEV = [
-    _.strip()
-    for _ in (TOP_DIR / "requirements_dev.txt").read_text(encoding="utf8").splitlines()
-    if not _.startswith("#") and "git+" not in _
-] + DOCS
+
+BASE = requirements("requirements.txt")
+DOCS = requirements("requirements_docs.txt")
+RDF = requirements("requirements_rdf.txt")
+ZSTD = requirements("requirements_zstd.txt")
+FAST = requirements("requirements_fast.txt")
+DEV = requirements("requirements_dev.txt") + DOCS + RDF + ZSTD + FAST
 
 setup(
     name="oteapi-ontokb-plugin",
@@ -67,5 +68,5 @@ setup(
     packages=find_packages(),
     python_requires=">=3.9",
     install_requires=BASE,
-    extras_require={"dev": DEV, "docs": DOCS},
+    extras_require={"dev": DEV, "docs": DOCS, "rdf": RDF, "zstd": ZSTD, "fast": FAST},
 )
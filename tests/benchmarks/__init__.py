@@ -0,0 +1 @@
+"""Benchmarks of the OntoKB strategies against a fake OntoREC server."""
@@ -0,0 +1,174 @@
+"""Pytest fixtures for the benchmarks.
+
+The benchmarks run with small payloads by default, so that they double as smoke
+tests. The following environment variables tune them:
+
+- `ONTOKB_BENCHMARK_SIZES`: comma-separated payload sizes (triples, rows or
+  bindings), default `100,1000`.
+- `ONTOKB_BENCHMARK_CONCURRENCY`: comma-separated concurrency levels, default `1,4`.
+- `ONTOKB_BENCHMARK_REPEAT`: number of measured rounds, default `3`.
+- `ONTOKB_BENCHMARK_JSON`: path of the JSON file the results are written to. The
+  results are only written if set.
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import pytest
+
+from oteapi_ontokb_plugin import __version__
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+def _integers(name: str, default: str) -> "List[int]":
+    return [int(_) for _ in os.getenv(name, default).split(",") if _.strip()]
+
+
+SIZES = _integers("ONTOKB_BENCHMARK_SIZES", "100,1000")
+CONCURRENCY = _integers("ONTOKB_BENCHMARK_CONCURRENCY", "1,4")
+REPEAT = max(int(os.getenv("ONTOKB_BENCHMARK_REPEAT", "3")), 1)
+
+
+class BenchmarkRecorder:
+    """Measure and collect benchmark results."""
+
+    def __init__(self) -> None:
+        self.results: "List[Dict[str, Any]]" = []
+
+    def measure(
+        self,
+        name: str,
+        func: "Callable[[], Any]",
+        size: int,
+        unit: str,
+        concurrency: int = 1,
+        **parameters: "Any",
+    ) -> "Dict[str, Any]":
+        """Measure `func`, called `concurrency` times in parallel per round.
+
+        Parameters:
+            name: Name of the benchmark.
+            func: The measured operation.
+            size: Number of `unit` processed by each call of `func`.
+            unit: Unit of `size`, e.g. `"triples"`.
+            concurrency: Number of concurrent calls per round.
+            **parameters: Additional parameters recorded with the result.
+
+        Returns:
+            The recorded result: call latencies (seconds), throughput (`unit` per
+            second) and peak memory (bytes allocated by a single call).
+
+        """
+        func()  # Warm-up (imports, connections, caches)
+
+        tracemalloc.start()
+        try:
+            func()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        def _timed() -> float:
+            start = time.perf_counter()
+            func()
+            return time.perf_counter() - start
+
+        latencies: "List[float]" = []
+        wall = 0.0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                latencies.extend(executor.map(lambda _: _timed(), range(concurrency)))
+                wall += time.perf_counter() - start
+
+        return self.record(
+            name,
+            latencies,
+            size,
+            unit,
+            concurrency=concurrency,
+            throughput=size * concurrency * REPEAT / wall if wall else None,
+            peak_memory=peak_memory,
+            **parameters,
+        )
+
+    def record(
+        self,
+        name: str,
+        latencies: "List[float]",
+        size: int,
+        unit: str,
+        concurrency: int = 1,
+        throughput: "Optional[float]" = None,
+        peak_memory: "Optional[int]" = None,
+        **parameters: "Any",
+    ) -> "Dict[str, Any]":
+        """Record latencies measured elsewhere, e.g. in a subprocess.
+
+        Parameters:
+            name: Name of the benchmark.
+            latencies: The measured latencies (seconds).
+            size: Number of `unit` processed by each measured operation.
+            unit: Unit of `size`.
+            concurrency: Number of concurrent operations per round.
+            throughput: Throughput (`unit` per second), if known.
+            peak_memory: Peak memory (bytes), if known.
+            **parameters: Additional parameters recorded with the result.
+
+        Returns:
+            The recorded result.
+
+        """
+        latencies = sorted(latencies)
+        result = {
+            "name": name,
+            "size": size,
+            "unit": unit,
+            "concurrency": concurrency,
+            "parameters": parameters,
+            "rounds": len(latencies) // concurrency,
+            "latency": {
+                "min": latencies[0],
+                "median": statistics.median(latencies),
+                "p95": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+                "max": latencies[-1],
+            },
+            "throughput": throughput,
+            "peak_memory": peak_memory,
+        }
+        self.results.append(result)
+        return result
+
+    def dump(self, path: str) -> None:
+        """Write the results to `path` as JSON."""
+        with open(path, "w", encoding="utf8") as handle:
+            json.dump(
+                {
+                    "version": __version__,
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "results": self.results,
+                },
+                handle,
+                indent=2,
+            )
+
+
+@pytest.fixture(scope="session")
+def benchmark_recorder() -> "Iterator[BenchmarkRecorder]":
+    """Collect the results of all benchmarks, written out at the end."""
+    recorder = BenchmarkRecorder()
+    yield recorder
+    path = os.getenv("ONTOKB_BENCHMARK_JSON")
+    if path:
+        recorder.dump(path)
@@ -0,0 +1,298 @@
+"""In-process stand-in for the OntoREC HTTP API, with synthetic data generators.
+
+Implemented endpoints:
+
+- `GET /databases/{db}`: the whole database as a SPARQL-JSON result.
+- `POST /databases/{db}/query`: a SPARQL-JSON result of `result_rows` rows. `LIMIT`
+  and `OFFSET` page through the database triples, and `VALUES` blocks get
+  `result_rows` rows per binding. `ASK` queries are true, and answered without the
+  `latency`.
+- `POST /databases/{db}`: ontology upload (multipart body, possibly chunked and
+  compressed).
+- `POST /databases/{db}/update`: SPARQL update.
+"""
+import gzip
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, List, Optional, Tuple
+
+EX = "http://example.org/onto#"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+RDFS_SUBCLASSOF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+
+_ASK = re.compile(r"^\s*ASK\b", re.IGNORECASE)
+_LIMIT = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+_OFFSET = re.compile(r"\bOFFSET\s+(\d+)", re.IGNORECASE)
+_VALUES = re.compile(r"\bVALUES\s*\(([^)]*)\)\s*\{(.*?)\}", re.IGNORECASE | re.DOTALL)
+
+
+def synthetic_triples(count: int) -> "List[Tuple[str, str, Tuple[str, ...]]]":
+    """Return `count` triples of a synthetic class hierarchy.
+
+    Objects are `("uri", iri)` or `("literal", value, language)` tuples.
+    """
+    triples = []
+    for index in range(count):
+        subject = f"{EX}Class{index // 2}"
+        if index % 2:
+            triples.append(
+                (subject, RDFS_SUBCLASSOF, ("uri", f"{EX}Class{index // 4}"))
+            )
+        else:
+            triples.append(
+                (subject, RDFS_LABEL, ("literal", f"Class number {index // 2}", "en"))
+            )
+    return triples
+
+
+def synthetic_ntriples(count: int) -> str:
+    """Return a synthetic ontology of `count` triples in N-Triples."""
+    lines = []
+    for subject, predicate, obj in synthetic_triples(count):
+        if obj[0] == "uri":
+            lines.append(f"<{subject}> <{predicate}> <{obj[1]}> .")
+        else:
+            lines.append(f'<{subject}> <{predicate}> "{obj[1]}"@{obj[2]} .')
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_turtle(count: int) -> str:
+    """Return a synthetic ontology of `count` triples in Turtle."""
+    lines = [
+        f"@prefix ex: <{EX}> .",
+        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
+        "",
+    ]
+    for subject, predicate, obj in synthetic_triples(count):
+        name = "ex:" + subject[len(EX) :]
+        if obj[0] == "uri":
+            lines.append(f"{name} rdfs:subClassOf ex:{obj[1][len(EX):]} .")
+        else:
+            lines.append(f'{name} rdfs:label "{obj[1]}"@{obj[2]} .')
+    return "\n".join(lines) + "\n"
+
+
+def _term(obj: "Tuple[str, ...]") -> "Dict[str, str]":
+    if obj[0] == "uri":
+        return {"type": "uri", "value": obj[1]}
+    return {"type": "literal", "value": obj[1], "xml:lang": obj[2]}
+
+
+def select_result(
+    triples: "List[Tuple[str, str, Tuple[str, ...]]]",
+) -> "Dict[str, Any]":
+    """Return a `SELECT ?s ?p ?o` SPARQL-JSON result of `triples`."""
+    return {
+        "head": {"vars": ["s", "p", "o"]},
+        "results": {
+            "bindings": [
+                {
+                    "s": {"type": "uri", "value": subject},
+                    "p": {"type": "uri", "value": predicate},
+                    "o": _term(obj),
+                }
+                for subject, predicate, obj in triples
+            ]
+        },
+    }
+
+
+class FakeOntoREC:
+    """Threaded in-process OntoREC server.
+
+    Parameters:
+        triples: Number of triples in every database.
+        result_rows: Number of rows of the results of unpaged queries.
+        latency: Simulated processing time of every request but `ASK` queries, in
+            seconds.
+        stall_every: Every n-th request is stalled (tail latency), none if 0.
+        stall: Additional processing time of the stalled requests, in seconds.
+        fail_every: Every n-th request fails with a 503 status, none if 0.
+
+    """
+
+    def __init__(
+        self,
+        triples: int = 1000,
+        result_rows: int = 100,
+        latency: float = 0.0,
+        stall_every: int = 0,
+        stall: float = 0.0,
+        fail_every: int = 0,
+    ) -> None:
+        self.triples = triples
+        self.result_rows = result_rows
+        self.latency = latency
+        self.stall_every = stall_every
+        self.stall = stall
+        self.fail_every = fail_every
+        self.requests = 0
+        self.bytes_received = 0
+        self.uploads: "List[int]" = []
+        self.updates: "List[str]" = []
+        self._lock = threading.Lock()
+        self._server: "Optional[ThreadingHTTPServer]" = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        if self._server is None:
+            raise RuntimeError("The server is not running.")
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "FakeOntoREC":
+        """Start serving in a background thread."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeOntoREC":
+        return self.start()
+
+    def __exit__(self, *args: "Any") -> None:
+        self.stop()
+
+    def reset(self) -> None:
+        """Reset the request statistics."""
+        with self._lock:
+            self.requests = 0
+            self.bytes_received = 0
+            self.uploads.clear()
+            self.updates.clear()
+
+    def query(self, query: str) -> "Dict[str, Any]":
+        """Return the result of a SPARQL query."""
+        if _ASK.match(query):
+            return {"head": {}, "boolean": True}
+        limit, offset = _LIMIT.search(query), _OFFSET.search(query)
+        if limit or offset:
+            start = int(offset.group(1)) if offset else 0
+            stop = min(start + int(limit.group(1)), self.triples) if limit else None
+            return select_result(
+                synthetic_triples(self.triples if stop is None else stop)[start:]
+            )
+
+        result = select_result(synthetic_triples(self.result_rows))
+        values = _VALUES.search(query)
+        if values:
+            # Rows for each binding, with the parameter variables bound
+            variables = [_.strip()[1:] for _ in values.group(1).split()]
+            rows = []
+            for binding in re.findall(r"\(([^)]*)\)", values.group(2)):
+                terms = [_[1:-1] for _ in binding.split()]
+                for row in result["results"]["bindings"]:
+                    row = dict(row)
+                    for variable, iri in zip(variables, terms):
+                        row[variable] = {"type": "uri", "value": iri}
+                    rows.append(row)
+            result["head"]["vars"] += [_ for _ in variables if _ not in ("s", "p", "o")]
+            result["results"]["bindings"] = rows
+        return result
+
+
+def _handler(server: FakeOntoREC) -> "type":
+    """Return the request handler class of `server`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        """OntoREC request handler."""
+
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args: "Any") -> None:  # pylint: disable=arguments-differ
+            pass
+
+        def handle(self) -> None:
+            try:
+                super().handle()
+            except ConnectionError:
+                # Transfer aborted by the client, e.g. a truncated streamed result
+                pass
+
+        def _faulty(self) -> bool:
+            """Apply the injected faults, return whether the request fails."""
+            with server._lock:  # pylint: disable=protected-access
+                index = server.requests
+            if server.stall_every and index % server.stall_every == 0:
+                time.sleep(server.stall)
+            if server.fail_every and index % server.fail_every == 0:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return True
+            return False
+
+        def _body(self) -> bytes:
+            if self.headers.get("Transfer-Encoding") == "chunked":
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().strip(), 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        break
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+                body = b"".join(chunks)
+            else:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with server._lock:  # pylint: disable=protected-access
+                server.requests += 1
+                server.bytes_received += len(body)
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return body
+
+        def _send(self, payload: "Any", status: int = 200, slow: bool = True) -> None:
+            if server.latency and slow:
+                time.sleep(server.latency)
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, 1)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            """Return the whole database."""
+            self._body()
+            if self._faulty():
+                return
+            self._send(select_result(synthetic_triples(server.triples)))
+
+        def do_POST(self) -> None:  # pylint: disable=invalid-name
+            """Query, update or upload."""
+            body = self._body()
+            if self.path.endswith("/query"):
+                if self._faulty():
+                    return
+                query = json.loads(body)["query"]
+                self._send(server.query(query), slow=not _ASK.match(query))
+            elif self.path.endswith("/update"):
+                with server._lock:  # pylint: disable=protected-access
+                    server.updates.append(body.decode("utf-8"))
+                self._send({"status": "ok"})
+            else:
+                if self._faulty():
+                    return
+                with server._lock:  # pylint: disable=protected-access
+                    server.uploads.append(len(body))
+                self._send({"status": "ok"}, 201)
+
+    return Handler
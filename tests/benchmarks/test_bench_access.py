@@ -0,0 +1,415 @@
+"""Benchmark the `datasource/ontokb` resource strategy."""
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from .conftest import CONCURRENCY, SIZES
+from .fake_ontorec import synthetic_turtle
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict
+
+    from .conftest import BenchmarkRecorder
+    from .fake_ontorec import FakeOntoREC
+
+
+pytestmark = pytest.mark.benchmark
+
+
+def _strategy(fake_ontorec: "FakeOntoREC", **configuration: "Any") -> "Any":
+    from oteapi_ontokb_plugin.strategies.ontokb_access import (
+        OntoKBResourceConfig,
+        OntoKBResourceStrategy,
+    )
+
+    return OntoKBResourceStrategy(
+        OntoKBResourceConfig(
+            accessUrl=fake_ontorec.url,
+            accessService="datasource/ontokb",
+            configuration={"database": "bench", **configuration},
+        )
+    )
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize(
+    "result_format", ["json", "columnar", "raw", "reference", "stream"]
+)
+def test_query(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    size: int,
+    concurrency: int,
+    result_format: str,
+) -> None:
+    """Run a SPARQL query returning `size` rows."""
+    fake_ontorec.result_rows = size
+    strategy = _strategy(
+        fake_ontorec, result_format=result_format, datacache_config=datacache_config
+    )
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    result = strategy.get(session)
+    if result_format == "columnar":
+        assert result.ontokb_columnar.rows == size
+    elif result_format == "raw":
+        assert result.ontokb_raw.size > 0
+    elif result_format == "reference":
+        assert result.ontokb_data_ref.size > 0
+    elif result_format == "stream":
+        assert result.ontokb_stream.rows == size
+    else:
+        assert len(result.ontokb_data["results"]["bindings"]) == size
+
+    benchmark_recorder.measure(
+        f"access.query.{result_format}",
+        lambda: strategy.get(session),
+        size,
+        "rows",
+        concurrency,
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("result_format", ["json", "reference"])
+def test_query_session(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    size: int,
+    result_format: str,
+) -> None:
+    """Run a SPARQL query returning `size` rows and serialize the session update,
+    as the session store does at every pipeline step."""
+    fake_ontorec.result_rows = size
+    strategy = _strategy(
+        fake_ontorec, result_format=result_format, datacache_config=datacache_config
+    )
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    session_size = len(strategy.get(session).json())
+    if result_format == "reference":
+        assert session_size < 1024
+
+    benchmark_recorder.measure(
+        f"access.query.session.{result_format}",
+        lambda: strategy.get(session).json(),
+        size,
+        "rows",
+        session_size=session_size,
+    )
+
+
+@pytest.mark.parametrize("max_rows", [None, 100])
+def test_query_stream_budget(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    max_rows: "Any",
+) -> None:
+    """Stream the result of a runaway SPARQL query, with and without a row budget."""
+    size = max(SIZES) * 10
+    fake_ontorec.result_rows = size
+    strategy = _strategy(
+        fake_ontorec,
+        result_format="stream",
+        max_rows=max_rows,
+        datacache_config=datacache_config,
+    )
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    result = strategy.get(session)
+    assert result.ontokb_stream.rows == (max_rows or size)
+    assert result.ontokb_stream.truncated is bool(max_rows)
+
+    benchmark_recorder.measure(
+        "access.query.stream.budget",
+        lambda: strategy.get(session),
+        result.ontokb_stream.rows,
+        "rows",
+        max_rows=max_rows,
+        bytes_read=result.ontokb_stream.size,
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_query_fast_json(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    size: int,
+) -> None:
+    """Run a SPARQL query returning `size` rows, decoded with the fast backend."""
+    fake_ontorec.result_rows = size
+    strategy = _strategy(fake_ontorec, fast_json=True)
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    result = strategy.get(session)
+    assert len(result.ontokb_data["results"]["bindings"]) == size
+
+    benchmark_recorder.measure(
+        "access.query.fast_json", lambda: strategy.get(session), size, "rows"
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_query_cached(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    size: int,
+) -> None:
+    """Serve a SPARQL query result of `size` rows from the query cache."""
+    fake_ontorec.result_rows = size
+    strategy = _strategy(
+        fake_ontorec,
+        query_cache={"enabled": True, "datacache_config": datacache_config},
+    )
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    strategy.get(session)
+    requests = fake_ontorec.requests
+    benchmark_recorder.measure(
+        "access.query.cached", lambda: strategy.get(session), size, "rows"
+    )
+    assert fake_ontorec.requests == requests
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+@pytest.mark.parametrize("size", SIZES)
+def test_named_queries(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    size: int,
+    concurrency: int,
+) -> None:
+    """Run 8 named SPARQL queries of `size` rows with `concurrency` workers."""
+    fake_ontorec.result_rows = size
+    fake_ontorec.latency = 0.01
+    strategy = _strategy(fake_ontorec, max_concurrency=concurrency)
+    session = {
+        "sparql_queries": {
+            f"query{index}": f"SELECT ?s ?p ?o WHERE {{ ?s ?p ?o }} # {index}"
+            for index in range(8)
+        }
+    }
+
+    assert len(strategy.get(session).ontokb_results) == 8
+    benchmark_recorder.measure(
+        "access.named_queries",
+        lambda: strategy.get(session),
+        8 * size,
+        "rows",
+        max_concurrency=concurrency,
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("export_page_size", [None, 250])
+def test_export(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    size: int,
+    export_page_size: "Any",
+) -> None:
+    """Get a database of `size` triples, at once or page by page."""
+    fake_ontorec.triples = fake_ontorec.result_rows = size
+    strategy = _strategy(
+        fake_ontorec,
+        export_page_size=export_page_size,
+        datacache_config=datacache_config,
+    )
+
+    result = strategy.get({})
+    if export_page_size:
+        assert result.ontokb_export.triples == size
+    else:
+        assert len(result.ontokb_data["results"]["bindings"]) == size
+
+    benchmark_recorder.measure(
+        "access.export" if export_page_size else "access.get",
+        lambda: strategy.get({}),
+        size,
+        "triples",
+        export_page_size=export_page_size,
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_query_instrumented(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    size: int,
+) -> None:
+    """Run a SPARQL query returning `size` rows with the metrics enabled."""
+    from oteapi_ontokb_plugin.utils.metrics import (
+        OpenMetricsExporter,
+        add_hook,
+        remove_hook,
+    )
+
+    fake_ontorec.result_rows = size
+    strategy = _strategy(fake_ontorec)
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    exporter = OpenMetricsExporter()
+    add_hook(exporter)
+    try:
+        strategy.get(session)
+        exported = exporter.render()
+        for phase in ("http_ttfb", "http_transfer", "json_decode", "session_update"):
+            assert f'ontokb_phase_seconds_count{{phase="{phase}"}} 1' in exported
+        assert f"ontokb_rows_total {size}" in exported
+        assert "ontokb_received_bytes_total" in exported
+        assert "ontokb_sent_bytes_total" in exported
+
+        benchmark_recorder.measure(
+            "access.query.instrumented", lambda: strategy.get(session), size, "rows"
+        )
+    finally:
+        remove_hook(exporter)
+
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_query_tail_latency(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    hedge: bool,
+) -> None:
+    """Run SPARQL queries against a server stalling or failing some requests."""
+    fake_ontorec.stall_every, fake_ontorec.stall, fake_ontorec.fail_every = 10, 0.2, 7
+    strategy = _strategy(
+        fake_ontorec,
+        database=f"bench-tail-{hedge}",
+        resilience={
+            "hedge": hedge,
+            "hedge_min_samples": 5,
+            "backoff_factor": 0.01,
+            "retry_budget": 1.0,
+        },
+    )
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    for _ in range(10):  # Learn the latencies, every query succeeds despite 503s
+        result = strategy.get(session)
+        assert len(result.ontokb_data["results"]["bindings"]) == 100
+
+    benchmark_recorder.measure(
+        "access.query.tail_latency",
+        lambda: strategy.get(session),
+        100,
+        "rows",
+        hedge=hedge,
+    )
+
+
+@pytest.mark.parametrize("databases", [1, 4])
+def test_query_federated(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    databases: int,
+) -> None:
+    """Federate a SPARQL query over `databases` databases, 10ms latency each."""
+    fake_ontorec.latency = 0.01
+    strategy = _strategy(
+        fake_ontorec,
+        databases=[f"bench-{index}" for index in range(databases)],
+        federation={"distinct": True, "order_by": ["?s"]},
+    )
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    result = strategy.get(session)
+    assert len(result.ontokb_sources) == databases
+    assert len(result.ontokb_data["results"]["bindings"]) == 100
+
+    benchmark_recorder.measure(
+        "access.query.federated",
+        lambda: strategy.get(session),
+        100 * databases,
+        "rows",
+        databases=databases,
+    )
+
+
+@pytest.mark.parametrize("coalesce", [False, True])
+def test_query_coalesced(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    coalesce: bool,
+) -> None:
+    """Run 16 identical SPARQL queries concurrently, 50ms latency each."""
+    fake_ontorec.latency = 0.05
+    strategy = _strategy(fake_ontorec, coalesce=coalesce)
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    result = benchmark_recorder.measure(
+        "access.query.coalesced",
+        lambda: strategy.get(session),
+        100,
+        "rows",
+        16,
+        coalesce=coalesce,
+    )
+    queries = 2 + 16 * result["rounds"]  # With the warm-up calls
+    if coalesce:
+        assert fake_ontorec.requests < queries
+    else:
+        assert fake_ontorec.requests == queries
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_query_prefetched(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    prefetch: bool,
+) -> None:
+    """Initialize, set up the rest of a pipeline (50ms), then run a SPARQL query
+    taking 50ms."""
+    fake_ontorec.latency = 0.05
+    strategy = _strategy(fake_ontorec, prefetch=prefetch, coalesce=False)
+    session = {"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"}
+
+    def _pipeline() -> "Any":
+        strategy.initialize(session)
+        time.sleep(0.05)
+        return strategy.get(session)
+
+    assert len(_pipeline().ontokb_data["results"]["bindings"]) == 100
+    benchmark_recorder.measure(
+        "access.query.prefetched", _pipeline, 100, "rows", prefetch=prefetch
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("local", [False, True])
+def test_query_local(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    size: int,
+    local: bool,
+) -> None:
+    """Run a SPARQL query over a Turtle ontology of `size` triples already in the
+    session, in-process or by OntoREC (10ms latency)."""
+    pytest.importorskip("rdflib")
+    fake_ontorec.latency = 0.01
+    strategy = _strategy(fake_ontorec, local=local)
+    session = {
+        "content": synthetic_turtle(size),
+        "sparql_query": "SELECT ?s WHERE { ?s ?p ?o } LIMIT 100",
+    }
+
+    result = strategy.get(session)
+    assert len(result.ontokb_data["results"]["bindings"]) == 100
+    assert (fake_ontorec.requests == 0) is local
+
+    benchmark_recorder.measure(
+        "access.query.local",
+        lambda: strategy.get(session),
+        100,
+        "rows",
+        local=local,
+        triples=size,
+    )
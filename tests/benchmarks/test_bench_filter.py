@@ -0,0 +1,60 @@
+"""Benchmark the `filter/sparql_query` filter strategy."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+from .conftest import SIZES
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .conftest import BenchmarkRecorder
+    from .fake_ontorec import FakeOntoREC
+
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_bindings(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    size: int,
+) -> None:
+    """Expand a template with `size` bindings and run it through the access
+    strategy."""
+    from oteapi_ontokb_plugin.strategies.ontokb_access import (
+        OntoKBResourceConfig,
+        OntoKBResourceStrategy,
+    )
+    from oteapi_ontokb_plugin.strategies.sparql_query import SPARQLQueryFilter
+
+    fake_ontorec.result_rows = 1
+    sparql_filter = SPARQLQueryFilter(
+        filter_config={
+            "filterType": "filter/sparql_query",
+            "query": "SELECT ?label WHERE { ?class rdfs:label ?label }",
+            "configuration": {
+                "bindings": [
+                    {"class": f"<http://example.org/onto#Class{index}>"}
+                    for index in range(size)
+                ]
+            },
+        }
+    )
+    access = OntoKBResourceStrategy(
+        OntoKBResourceConfig(
+            accessUrl=fake_ontorec.url,
+            accessService="datasource/ontokb",
+            configuration={"database": "bench"},
+        )
+    )
+
+    session = dict(sparql_filter.get())
+    assert len(access.get(session).ontokb_binding_results) == size
+
+    benchmark_recorder.measure("filter.bindings", sparql_filter.get, size, "bindings")
+    benchmark_recorder.measure(
+        "filter.bindings.query",
+        lambda: access.get(dict(sparql_filter.get())),
+        size,
+        "bindings",
+    )
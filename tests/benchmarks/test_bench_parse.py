@@ -0,0 +1,83 @@
+"""Benchmark the `application/rdf` parse strategy."""
+from itertools import count
+from typing import TYPE_CHECKING
+
+import pytest
+
+from .conftest import SIZES
+from .fake_ontorec import synthetic_turtle
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict
+
+    from .conftest import BenchmarkRecorder
+
+
+pytestmark = pytest.mark.benchmark
+
+
+def _strategy(path: "Any", **configuration: "Any") -> "Any":
+    from oteapi_ontokb_plugin.strategies.application_rdf import RDFDataParseStrategy
+
+    return RDFDataParseStrategy(
+        parse_config={
+            "downloadUrl": path.as_uri(),
+            "mediaType": "application/rdf",
+            "configuration": configuration,
+        }
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("mode", ["content", "reference", "spill", "graph", "stream"])
+def test_parse(
+    benchmark_recorder: "BenchmarkRecorder",
+    datacache_config: "Dict[str, str]",
+    tmp_path: "Any",
+    size: int,
+    mode: str,
+) -> None:
+    """Parse a Turtle ontology of `size` triples."""
+    if mode in ("graph", "stream"):
+        pytest.importorskip("rdflib")
+
+    path = tmp_path / "ontology.ttl"
+    path.write_text(synthetic_turtle(size), encoding="utf8")
+    strategy = _strategy(
+        path,
+        datacache_config=datacache_config,
+        by_reference=mode == "reference",
+        graph=mode == "graph",
+        stream=mode == "stream",
+        spill=mode == "spill",
+        spill_dir=str(tmp_path / "spill"),
+    )
+
+    result = strategy.get()
+    if mode == "graph":
+        assert result.graph.triples == size
+    elif mode == "stream":
+        assert result.stream.triples == size
+    elif mode == "reference":
+        assert result.reference.size == path.stat().st_size
+    elif mode == "spill":
+        assert result.file.size == path.stat().st_size
+    else:
+        assert result.content
+
+    if mode == "graph":
+        # Unchanged files are not parsed again, use a new cache for every run
+        caches = count()
+        benchmark_recorder.measure(
+            "parse.graph",
+            lambda: _strategy(
+                path,
+                datacache_config={"cacheDir": str(tmp_path / f"cache{next(caches)}")},
+                graph=True,
+            ).get(),
+            size,
+            "triples",
+        )
+        benchmark_recorder.measure("parse.graph.cached", strategy.get, size, "triples")
+    else:
+        benchmark_recorder.measure(f"parse.{mode}", strategy.get, size, "triples")
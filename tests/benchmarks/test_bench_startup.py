@@ -0,0 +1,103 @@
+"""Benchmark the plugin startup: strategy imports and strategy creation.
+
+Every round runs in a fresh interpreter, so that nothing is already imported.
+"""
+import json
+import subprocess  # nosec
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+from .conftest import REPEAT
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, List
+
+    from .conftest import BenchmarkRecorder
+
+
+pytestmark = pytest.mark.benchmark
+
+STRATEGIES = [
+    "oteapi_ontokb_plugin.strategies.ontokb_access",
+    "oteapi_ontokb_plugin.strategies.ontokb_upload",
+    "oteapi_ontokb_plugin.strategies.application_rdf",
+    "oteapi_ontokb_plugin.strategies.sparql_query",
+]
+
+# Dependencies only imported when a strategy is used
+LAZY = [
+    "requests",
+    "urllib3",
+    "oteapi.plugins",
+    "oteapi.datacache",
+    "diskcache",
+    "oteapi.strategies.download.file",
+    "rdflib",
+    "zstandard",
+    "orjson",
+]
+
+_IMPORT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module({module!r})
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": list(sys.modules)}}))
+"""
+
+_LOAD = """
+import json, sys, time
+start = time.perf_counter()
+from oteapi.models import ResourceConfig
+from oteapi.plugins import create_strategy, load_strategies
+load_strategies()
+loaded = time.perf_counter()
+create_strategy("resource", ResourceConfig(**{config!r}))
+print(json.dumps({{
+    "load": loaded - start,
+    "create": time.perf_counter() - loaded,
+    "modules": list(sys.modules),
+}}))
+"""
+
+
+def _run(code: str) -> "Dict[str, Any]":
+    """Run `code` in a fresh interpreter, returning its JSON output."""
+    output = subprocess.run(  # nosec
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+@pytest.mark.parametrize("module", STRATEGIES)
+def test_import(benchmark_recorder: "BenchmarkRecorder", module: str) -> None:
+    """Import a strategy module, without importing its heavy dependencies."""
+    latencies: "List[float]" = []
+    for _ in range(REPEAT):
+        output = _run(_IMPORT.format(module=module))
+        assert not set(LAZY) & set(output["modules"])
+        latencies.append(output["seconds"])
+
+    benchmark_recorder.record(
+        f"startup.import.{module.rsplit('.', 1)[-1]}", latencies, 1, "modules"
+    )
+
+
+def test_create_strategy(benchmark_recorder: "BenchmarkRecorder") -> None:
+    """Load the strategies of all plugins and create the OntoKB resource strategy."""
+    config = {
+        "accessUrl": "http://localhost:8080",
+        "accessService": "datasource/ontokb",
+        "configuration": {"database": "bench"},
+    }
+    load: "List[float]" = []
+    create: "List[float]" = []
+    for _ in range(REPEAT):
+        output = _run(_LOAD.format(config=config))
+        assert "requests" not in output["modules"]
+        load.append(output["load"])
+        create.append(output["create"])
+
+    benchmark_recorder.record("startup.load_strategies", load, 1, "calls")
+    benchmark_recorder.record("startup.create_strategy", create, 1, "strategies")
@@ -0,0 +1,174 @@
+"""Benchmark the `datasource/ontokb_upload` resource strategy."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+from .conftest import CONCURRENCY, SIZES
+from .fake_ontorec import synthetic_ntriples
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict
+
+    from .conftest import BenchmarkRecorder
+    from .fake_ontorec import FakeOntoREC
+
+
+pytestmark = pytest.mark.benchmark
+
+
+def _strategy(
+    fake_ontorec: "FakeOntoREC",
+    path: "Any",
+    datacache_config: "Dict[str, str]",
+    **configuration: "Any",
+) -> "Any":
+    from oteapi_ontokb_plugin.strategies.ontokb_upload import (
+        OntoKBResourceUploadConfig,
+        OntoKBUploadStrategy,
+    )
+
+    return OntoKBUploadStrategy(
+        OntoKBResourceUploadConfig(
+            accessUrl=fake_ontorec.url,
+            accessService="datasource/ontokb_upload",
+            configuration={
+                "database": "bench",
+                "filename": path.name,
+                "fileConfig": {
+                    "downloadUrl": path.as_uri(),
+                    "mediaType": "application/n-triples",
+                },
+                "datacache_config": datacache_config,
+                **configuration,
+            },
+        )
+    )
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("streaming", [False, True])
+def test_upload(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    tmp_path: "Any",
+    size: int,
+    concurrency: int,
+    streaming: bool,
+) -> None:
+    """Upload an ontology of `size` triples."""
+    path = tmp_path / "ontology.nt"
+    path.write_text(synthetic_ntriples(size), encoding="utf8")
+    strategy = _strategy(
+        fake_ontorec,
+        path,
+        datacache_config,
+        streaming=streaming,
+        deduplicate=False,
+    )
+
+    result = strategy.get({})
+    assert result.bytes_transferred == path.stat().st_size
+    assert fake_ontorec.uploads
+
+    benchmark_recorder.measure(
+        "upload.streaming" if streaming else "upload",
+        lambda: strategy.get({}),
+        size,
+        "triples",
+        concurrency,
+    )
+
+
+@pytest.mark.parametrize("fail_every", [0, 5])
+@pytest.mark.parametrize("size", SIZES)
+def test_upload_sharded(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    tmp_path: "Any",
+    size: int,
+    fail_every: int,
+) -> None:
+    """Upload an ontology of `size` triples in 8 shards, retrying failed shards."""
+    path = tmp_path / "ontology.nt"
+    path.write_text(synthetic_ntriples(size), encoding="utf8")
+    strategy = _strategy(
+        fake_ontorec,
+        path,
+        datacache_config,
+        deduplicate=False,
+        sharding={
+            "enabled": True,
+            "shard_size": path.stat().st_size // 8 + 1,
+            "backoff_factor": 0.001,
+            "retries": 5,
+        },
+    )
+    fake_ontorec.fail_every = fail_every
+
+    result = strategy.get({})
+    assert result.shards.triples == size
+    assert result.bytes_transferred == path.stat().st_size
+
+    benchmark_recorder.measure(
+        "upload.sharded",
+        lambda: strategy.get({}),
+        size,
+        "triples",
+        fail_every=fail_every,
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_upload_deduplicated(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    tmp_path: "Any",
+    size: int,
+) -> None:
+    """Skip the upload of an unchanged ontology of `size` triples."""
+    path = tmp_path / "ontology.nt"
+    path.write_text(synthetic_ntriples(size), encoding="utf8")
+    strategy = _strategy(fake_ontorec, path, datacache_config, deduplicate=True)
+
+    assert not strategy.get({}).skipped
+    assert strategy.get({}).skipped
+    benchmark_recorder.measure(
+        "upload.deduplicated", lambda: strategy.get({}), size, "triples"
+    )
+    assert len(fake_ontorec.uploads) == 1
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_upload_delta(
+    benchmark_recorder: "BenchmarkRecorder",
+    fake_ontorec: "FakeOntoREC",
+    datacache_config: "Dict[str, str]",
+    tmp_path: "Any",
+    size: int,
+) -> None:
+    """Upload the delta of an ontology of `size` triples, with one changed triple."""
+    path = tmp_path / "ontology.nt"
+    content = synthetic_ntriples(size)
+    path.write_text(content, encoding="utf8")
+    strategy = _strategy(
+        fake_ontorec, path, datacache_config, delta=True, deduplicate=False
+    )
+    strategy.get({})
+
+    versions = [
+        content + "<http://example.org/onto#New> <http://example.org/onto#p> "
+        '"new" .\n',
+        content,
+    ]
+
+    def _upload() -> None:
+        path.write_text(versions[0], encoding="utf8")
+        versions.reverse()
+        assert strategy.get({}).delta
+
+    benchmark_recorder.measure("upload.delta", _upload, size, "triples")
+    assert fake_ontorec.updates
@@ -1,6 +1,13 @@
 """Pytest fixtures for `strategies/`."""
+from typing import TYPE_CHECKING
+
 import pytest
 
+from tests.benchmarks.fake_ontorec import FakeOntoREC
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, Iterator
+
 
 @pytest.fixture(scope="session", autouse=True)
 def load_plugins() -> None:
@@ -8,3 +15,25 @@ def load_plugins() -> None:
     from oteapi.plugins.factories import load_strategies
 
     load_strategies()
+
+
+@pytest.fixture(scope="session")
+def ontorec() -> "Iterator[FakeOntoREC]":
+    """A running fake OntoREC server."""
+    with FakeOntoREC() as server:
+        yield server
+
+
+@pytest.fixture
+def fake_ontorec(ontorec: FakeOntoREC) -> FakeOntoREC:
+    """The fake OntoREC server, with reset statistics and default settings."""
+    ontorec.reset()
+    ontorec.triples, ontorec.result_rows, ontorec.latency = 1000, 100, 0.0
+    ontorec.stall_every, ontorec.stall, ontorec.fail_every = 0, 0.0, 0
+    return ontorec
+
+
+@pytest.fixture
+def datacache_config(tmp_path: "Any") -> "Dict[str, str]":
+    """A data cache configuration using a temporary directory."""
+    return {"cacheDir": str(tmp_path / "cache")}
@@ -0,0 +1,140 @@
+"""Test the `datasource/ontokb` strategy."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict
+
+    from tests.benchmarks.fake_ontorec import FakeOntoREC
+
+
+def _strategy(fake_ontorec: "FakeOntoREC", **configuration: "Any") -> "Any":
+    from oteapi_ontokb_plugin.strategies.ontokb_access import (
+        OntoKBResourceConfig,
+        OntoKBResourceStrategy,
+    )
+
+    return OntoKBResourceStrategy(
+        OntoKBResourceConfig(
+            accessUrl=fake_ontorec.url,
+            accessService="datasource/ontokb",
+            configuration={"database": "test", **configuration},
+        )
+    )
+
+
+def test_export_pages(
+    fake_ontorec: "FakeOntoREC", datacache_config: "Dict[str, str]"
+) -> None:
+    """The database is exported in pages through a single request."""
+    from oteapi.datacache import DataCache
+
+    from oteapi_ontokb_plugin.utils.compression import load_cached
+    from oteapi_ontokb_plugin.utils.jsonbackend import loads
+
+    fake_ontorec.triples = fake_ontorec.result_rows = 1050
+    manifest = _strategy(
+        fake_ontorec, export_page_size=500, datacache_config=datacache_config
+    ).get({})["ontokb_export"]
+
+    assert fake_ontorec.requests == 1
+    assert manifest["triples"] == 1050
+    cache = DataCache(datacache_config)
+    pages = [loads(load_cached(cache, key)) for key in manifest["pages"]]
+    assert [len(page["results"]["bindings"]) for page in pages] == [500, 500, 50]
+    assert all(page["head"]["vars"] == ["s", "p", "o"] for page in pages)
+
+
+def test_export_page_size_positive(fake_ontorec: "FakeOntoREC") -> None:
+    """The export page size must be positive."""
+    from pydantic import ValidationError
+
+    with pytest.raises(ValidationError):
+        _strategy(fake_ontorec, export_page_size=0)
+
+
+def test_resilient_session_without_retries(fake_ontorec: "FakeOntoREC") -> None:
+    """Retried reads go through a session without connection-level retries."""
+    # pylint: disable=protected-access
+    strategy = _strategy(fake_ontorec, pool_config={"retries": 5})
+
+    assert strategy._client(resilient=True).config.retries == 0
+    assert strategy._client().config.retries == 5
+
+
+@pytest.mark.parametrize(
+    "configuration",
+    [{"result_format": "columnar"}, {"databases": ["test", "other"]}],
+    ids=["columnar", "federated"],
+)
+def test_named_queries_json_only(
+    fake_ontorec: "FakeOntoREC", configuration: "Dict[str, Any]"
+) -> None:
+    """Named queries reject result formats and federation they do not support."""
+    strategy = _strategy(fake_ontorec, **configuration)
+
+    with pytest.raises(ValueError, match="Named queries"):
+        strategy.get({"sparql_queries": {"all": "SELECT * WHERE { ?s ?p ?o }"}})
+    assert fake_ontorec.requests == 0
+
+
+QUERY = "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"
+
+
+def test_prefetch(fake_ontorec: "FakeOntoREC") -> None:
+    """`get()` uses the query started by `initialize()`, even in another instance."""
+    session = {"sparql_query": QUERY}
+
+    _strategy(fake_ontorec, prefetch=True, coalesce=False).initialize(session)
+    result = _strategy(fake_ontorec, prefetch=True, coalesce=False).get(session)
+
+    assert len(result.ontokb_data["results"]["bindings"]) == 100
+    # The ASK check and the prefetched query
+    assert fake_ontorec.requests == 2
+
+
+def test_prefetch_expired(fake_ontorec: "FakeOntoREC") -> None:
+    """A prefetched result older than `prefetch_ttl` is discarded."""
+    import time
+
+    session = {"sparql_query": QUERY}
+    strategy = _strategy(fake_ontorec, prefetch=True, prefetch_ttl=0.1, coalesce=False)
+
+    strategy.initialize(session)
+    time.sleep(0.3)
+    assert len(strategy.get(session).ontokb_data["results"]["bindings"]) == 100
+    assert fake_ontorec.requests == 3
+
+
+def test_prefetch_missing_database(fake_ontorec: "FakeOntoREC") -> None:
+    """A failed `ASK {}` check drops the prefetched request."""
+    from requests import HTTPError
+
+    session = {"sparql_query": QUERY}
+    strategy = _strategy(
+        fake_ontorec,
+        prefetch=True,
+        coalesce=False,
+        resilience={"retries": 0},
+    )
+
+    fake_ontorec.fail_every = 1
+    with pytest.raises(HTTPError):
+        strategy.initialize(session)
+    fake_ontorec.fail_every = 0
+
+    # The failed prefetched request is not reused
+    assert len(strategy.get(session).ontokb_data["results"]["bindings"]) == 100
+
+
+def test_prefetch_local(fake_ontorec: "FakeOntoREC") -> None:
+    """Queries that may be evaluated in-process are not prefetched."""
+    # pylint: disable=protected-access
+    session = {"sparql_query": QUERY}
+    strategy = _strategy(fake_ontorec, prefetch=True, local=True)
+
+    assert strategy._prefetch_key(session) is None
+    assert strategy._prefetch_key({**session, "reasoning": True}) is not None
+    strategy.initialize(session)
+    assert fake_ontorec.requests == 1
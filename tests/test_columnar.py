@@ -0,0 +1,130 @@
+"""Test the columnar representation of SPARQL SELECT results."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict
+
+    from tests.benchmarks.fake_ontorec import FakeOntoREC
+
+XSD_INTEGER = "http://www.w3.org/2001/XMLSchema#integer"
+RESULT = {
+    "head": {"vars": ["s", "o"]},
+    "results": {
+        "bindings": [
+            {
+                "s": {"type": "uri", "value": "http://ex.org/a"},
+                "o": {"type": "literal", "value": "A", "xml:lang": "en"},
+            },
+            {
+                "s": {"type": "uri", "value": "http://ex.org/a"},
+                "o": {"type": "literal", "value": "1", "datatype": XSD_INTEGER},
+            },
+            {"s": {"type": "bnode", "value": "b0"}},
+            {
+                "s": {"type": "uri", "value": "http://ex.org/b"},
+                "o": {"type": "literal", "value": "B", "xml:lang": "en"},
+            },
+            {"o": {"type": "uri", "value": "http://ex.org/a"}},
+        ]
+    },
+}
+
+
+def test_round_trip() -> None:
+    """A result converted to the binary form and back is unchanged."""
+    from oteapi_ontokb_plugin.utils.columnar import ColumnarResult
+
+    columnar = ColumnarResult.from_bytes(
+        ColumnarResult.from_sparql_json(RESULT).to_bytes()
+    )
+
+    assert columnar.variables == ["s", "o"]
+    assert columnar.rows == 5
+    assert columnar.to_sparql_json() == RESULT
+
+
+def test_unbound() -> None:
+    """Unbound cells have the `UNBOUND` kind and no value."""
+    from oteapi_ontokb_plugin.utils.columnar import UNBOUND, ColumnarResult
+
+    columnar = ColumnarResult.from_sparql_json(RESULT)
+
+    assert columnar.column("s")[-1] is None
+    assert columnar.column("o")[2] is None
+    kinds, values, annotations = columnar.columns["o"]
+    assert (kinds[2], values[2], annotations[2]) == (UNBOUND, -1, 0)
+
+
+def test_dictionary_encoding() -> None:
+    """IRIs and literal values are stored once, language tags and datatypes are
+    interned."""
+    from oteapi_ontokb_plugin.utils.columnar import ColumnarResult
+
+    columnar = ColumnarResult.from_sparql_json(RESULT)
+
+    assert columnar.values == [
+        "http://ex.org/a",
+        "A",
+        "1",
+        "b0",
+        "http://ex.org/b",
+        "B",
+    ]
+    assert columnar.annotations == ["", "@en", "^^" + XSD_INTEGER]
+    # The same IRI as subject and as object shares its value index
+    assert columnar.columns["s"][1][0] == columnar.columns["o"][1][4] == 0
+    assert list(columnar.columns["o"][2]) == [1, 2, 0, 1, 0]
+
+
+def test_not_columnar() -> None:
+    """Other payloads are rejected."""
+    from oteapi_ontokb_plugin.utils.columnar import ColumnarResult
+
+    with pytest.raises(ValueError, match="Not a columnar"):
+        ColumnarResult.from_bytes(b'{"head": {}}')
+
+
+def test_pandas() -> None:
+    """The columns are categorical, unbound values are missing values."""
+    from oteapi_ontokb_plugin.utils.columnar import ColumnarResult
+
+    pytest.importorskip("pandas")
+    frame = ColumnarResult.from_sparql_json(RESULT).to_pandas()
+
+    assert list(frame.columns) == ["s", "o"]
+    assert list(frame["s"].isna()) == [False, False, False, False, True]
+    assert frame["s"][0] == frame["o"][4] == "http://ex.org/a"
+
+
+def test_columnar_result_format(
+    fake_ontorec: "FakeOntoREC", datacache_config: "Dict[str, Any]"
+) -> None:
+    """The `columnar` result format stores the result of `sparql_query` in the data
+    cache, with only a reference in the session."""
+    from oteapi_ontokb_plugin.strategies.ontokb_access import (
+        OntoKBResourceConfig,
+        OntoKBResourceStrategy,
+    )
+    from oteapi_ontokb_plugin.utils.columnar import load_columnar
+
+    fake_ontorec.result_rows = 10
+    strategy = OntoKBResourceStrategy(
+        OntoKBResourceConfig(
+            accessUrl=fake_ontorec.url,
+            accessService="datasource/ontokb",
+            configuration={
+                "database": "test",
+                "result_format": "columnar",
+                "datacache_config": datacache_config,
+            },
+        )
+    )
+    output = strategy.get({"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"})
+
+    assert output.ontokb_columnar.rows == 10
+    assert output.ontokb_columnar.variables == ["s", "p", "o"]
+    columnar = load_columnar(output.ontokb_columnar.key, datacache_config)
+    assert columnar.to_numpy()["o"]["kinds"].tolist() == [2, 1] * 5
+    assert columnar.column("o")[0] == "Class number 0"
@@ -0,0 +1,97 @@
+"""Test the compression of payloads stored in the data cache."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Dict
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_pack_unpack(encoding: str) -> None:
+    """Payloads above `storage_min_size` are compressed behind the OKBZ header."""
+    from oteapi_ontokb_plugin.utils.compression import (
+        MAGIC,
+        CompressionConfig,
+        pack,
+        unpack,
+    )
+
+    if encoding == "zstd":
+        pytest.importorskip("zstandard")
+    config = CompressionConfig(storage_encoding=encoding, storage_min_size=100)
+    data = b"<http://ex.org/a> <http://ex.org/p> <http://ex.org/b> .\n" * 100
+
+    packed = pack(data, config)
+    assert packed.startswith(MAGIC)
+    assert len(packed) < len(data)
+    assert unpack(packed) == data
+
+    # Small payloads are stored as is
+    assert pack(data[:50], config) == data[:50]
+    assert unpack(data[:50]) == data[:50]
+
+
+def test_pack_disabled() -> None:
+    """Payloads are stored as is without storage encoding, and text is unchanged."""
+    from oteapi_ontokb_plugin.utils.compression import CompressionConfig, pack, unpack
+
+    data = b"x" * 100000
+    assert pack(data, None) is data
+    assert pack(data, CompressionConfig()) is data
+    assert unpack("OKBZ text") == "OKBZ text"
+
+
+@pytest.mark.parametrize("data", [b"OKBZ", b"OKBZx payload", b"OKBZg not gzip"])
+def test_unpack_raw_magic(data: bytes) -> None:
+    """Raw payloads that merely start with the OKBZ magic are returned as is."""
+    import io
+
+    from oteapi_ontokb_plugin.utils.compression import open_packed, unpack
+
+    assert unpack(data) == data
+    assert open_packed(io.BytesIO(data)).read() == data
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_open_packed_seek(encoding: str) -> None:
+    """Packed payloads can be read again after rewinding, e.g. after hashing."""
+    import io
+
+    from oteapi_ontokb_plugin.utils.compression import (
+        CompressionConfig,
+        open_packed,
+        pack,
+    )
+    from oteapi_ontokb_plugin.utils.streaming import hash_content
+
+    if encoding == "zstd":
+        pytest.importorskip("zstandard")
+
+    data = bytes(range(256)) * 1000
+    packed = pack(data, CompressionConfig(storage_encoding=encoding))
+
+    with open_packed(io.BytesIO(packed)) as handle:
+        assert hash_content(handle, chunk_size=4096)[1] == len(data)
+        assert handle.read() == data
+        handle.seek(1000)
+        assert handle.read(10) == data[1000:1010]
+        handle.seek(-10, io.SEEK_END)
+        assert handle.read() == data[-10:]
+
+
+def test_open_cached_rewind(datacache_config: "Dict[str, str]") -> None:
+    """A zstd-packed value of the data cache can be hashed, then read."""
+    from oteapi.datacache import DataCache
+
+    from oteapi_ontokb_plugin.utils.compression import CompressionConfig, pack
+    from oteapi_ontokb_plugin.utils.streaming import hash_content, open_cached
+
+    pytest.importorskip("zstandard")
+    cache = DataCache(datacache_config)
+    data = b"<http://ex.org/a> <http://ex.org/p> <http://ex.org/b> .\n" * 5000
+    cache.add(pack(data, CompressionConfig(storage_encoding="zstd")), key="packed")
+
+    with open_cached(cache, "packed") as handle:
+        assert hash_content(handle)[1] == len(data)
+        assert handle.read() == data
@@ -0,0 +1,112 @@
+"""Test the triple-level differences of uploaded documents."""
+from array import array
+
+import pytest
+
+
+def test_diff_hashes() -> None:
+    """Added and removed hashes between two sorted hash arrays."""
+    from oteapi_ontokb_plugin.utils.delta import diff_hashes
+
+    assert diff_hashes(array("Q", [1, 2, 4]), array("Q", [2, 3, 4, 5])) == (
+        {3, 5},
+        {1},
+    )
+    assert diff_hashes(array("Q"), array("Q", [1])) == ({1}, set())
+    assert diff_hashes(array("Q", [1]), array("Q")) == (set(), {1})
+
+
+def test_diff_hashes_duplicates() -> None:
+    """Repeated hashes are compared as sets."""
+    from oteapi_ontokb_plugin.utils.delta import diff_hashes
+
+    assert diff_hashes(array("Q", [1, 1, 2]), array("Q", [1, 2])) == (set(), set())
+    assert diff_hashes(array("Q", [1, 2]), array("Q", [1, 1, 2, 2])) == (set(), set())
+    assert diff_hashes(array("Q", [1, 1, 3]), array("Q", [2, 3, 3])) == ({2}, {1})
+
+
+@pytest.mark.parametrize(
+    "line,terms",
+    [
+        (
+            "<http://a> <http://p> <http://b> .",
+            ("<http://a>", "<http://p>", "<http://b>"),
+        ),
+        (
+            "<http://a>  <http://p>\t<http://b>.",
+            ("<http://a>", "<http://p>", "<http://b>"),
+        ),
+        (
+            "<http://a> <http://p> <http://b> . # comment",
+            ("<http://a>", "<http://p>", "<http://b>"),
+        ),
+        (
+            '<http://a> <http://p> "x # y . z"@en-GB .',
+            ("<http://a>", "<http://p>", '"x # y . z"@en-GB'),
+        ),
+        (
+            '<http://a> <http://p> "a \\"q\\" ."^^<http://t> .',
+            ("<http://a>", "<http://p>", '"a \\"q\\" ."^^<http://t>'),
+        ),
+        ("_:b1 <http://p> _:b.2 .", ("_:b1", "<http://p>", "_:b.2")),
+        ("# comment", None),
+        ("   ", None),
+    ],
+)
+def test_split_triple(line: str, terms: "object") -> None:
+    """N-Triples lines are split into their terms, comments are ignored."""
+    from oteapi_ontokb_plugin.utils.delta import split_triple
+
+    assert split_triple(line) == terms
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "<http://a> <http://p> .",
+        "<http://a> <http://p> <http://b>",
+        '<http://a> <http://p> "unterminated .',
+        "ex:a ex:p ex:b .",
+    ],
+)
+def test_split_triple_invalid(line: str) -> None:
+    """Lines that are not N-Triples triples are errors, not skipped."""
+    from oteapi_ontokb_plugin.utils.delta import split_triple
+
+    with pytest.raises(ValueError, match="Invalid N-Triples line"):
+        split_triple(line)
+
+
+def test_fingerprint_normalized() -> None:
+    """Triples differing only by spacing, comments or repetition have the same
+    fingerprint."""
+    from oteapi_ontokb_plugin.utils.delta import TripleFingerprint
+
+    first = TripleFingerprint.from_lines(
+        [
+            "<http://a> <http://p> <http://b> .",
+            "<http://a> <http://p> <http://c> .",
+            "_:x <http://p> <http://b> .",
+        ]
+    )
+    second = TripleFingerprint.from_lines(
+        [
+            "# header",
+            "<http://a>  <http://p> <http://c>. # comment",
+            "<http://a> <http://p> <http://b> .",
+            "<http://a> <http://p> <http://b> .",
+            "_:y <http://p> <http://b> .",
+        ]
+    )
+    try:
+        assert list(first.hashes) == list(second.hashes)
+        assert first.triples == second.triples == 2
+        assert first.bnodes == second.bnodes
+        assert second.snapshot.read().decode("utf-8").splitlines() == [
+            "<http://a> <http://p> <http://c> .",
+            "<http://a> <http://p> <http://b> .",
+            "<http://a> <http://p> <http://b> .",
+        ]
+    finally:
+        first.snapshot.close()
+        second.snapshot.close()
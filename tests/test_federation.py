@@ -0,0 +1,152 @@
+"""Test the merging of the results of federated queries."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict, Sequence
+
+    from tests.benchmarks.fake_ontorec import FakeOntoREC
+
+IRI = {"type": "uri", "value": "http://ex.org/a"}
+BNODE = {"type": "bnode", "value": "b0"}
+LABEL = {"type": "literal", "value": "a", "xml:lang": "en"}
+TWO = {
+    "type": "typed-literal",
+    "value": "2",
+    "datatype": "http://www.w3.org/2001/XMLSchema#integer",
+}
+TEN = {
+    "type": "literal",
+    "value": "10.0",
+    "datatype": "http://www.w3.org/2001/XMLSchema#decimal",
+}
+
+
+def _result(*rows: "Dict[str, Any]", variables: "Sequence[str]" = ("x",)) -> "Any":
+    return {"head": {"vars": list(variables)}, "results": {"bindings": list(rows)}}
+
+
+def test_distinct_across_sources() -> None:
+    """Duplicate rows are removed across the sources, but kept without `distinct`."""
+    from oteapi_ontokb_plugin.utils.federation import ResultMerger
+
+    merger = ResultMerger(distinct=True)
+    assert merger.add(_result({"x": IRI}, {"x": LABEL}, {"x": IRI})) == 2
+    # The same terms from another source, `typed-literal` being a `literal`
+    assert merger.add(_result({"x": dict(LABEL)}, {"x": TWO})) == 1
+    assert merger.add(_result({"x": {**TWO, "type": "literal"}}, {})) == 1
+    assert merger.result()["results"]["bindings"] == [
+        {"x": IRI},
+        {"x": LABEL},
+        {"x": TWO},
+        {},
+    ]
+
+    merger = ResultMerger()
+    merger.add(_result({"x": IRI}))
+    merger.add(_result({"x": IRI}))
+    assert len(merger.result()["results"]["bindings"]) == 2
+
+
+def test_order_by_mixed_terms() -> None:
+    """Unbound values, blank nodes, IRIs, numeric and other literals are ordered."""
+    from oteapi_ontokb_plugin.utils.federation import ResultMerger
+
+    rows = [{"x": LABEL}, {"x": TEN}, {"x": IRI}, {}, {"x": TWO}, {"x": BNODE}]
+    merger = ResultMerger(order_by=["?x"])
+    merger.add(_result(*rows[:3]))
+    merger.add(_result(*rows[3:]))
+    ordered = [{}, {"x": BNODE}, {"x": IRI}, {"x": TWO}, {"x": TEN}, {"x": LABEL}]
+    assert merger.result()["results"]["bindings"] == ordered
+
+    merger = ResultMerger(order_by=["DESC(?x)"])
+    merger.add(_result(*rows))
+    assert merger.result()["results"]["bindings"] == ordered[::-1]
+
+
+def test_order_by_keys() -> None:
+    """Rows are sorted by the first key, then by the following ones."""
+    from oteapi_ontokb_plugin.utils.federation import ResultMerger
+
+    merger = ResultMerger(order_by=["?x", "desc( ?y )"])
+    merger.add(_result({"x": LABEL, "y": TWO}, {"x": IRI, "y": TWO}))
+    merger.add(_result({"x": LABEL, "y": TEN}, {"x": IRI}, variables=["x", "y"]))
+    assert merger.result()["results"]["bindings"] == [
+        {"x": IRI, "y": TWO},
+        {"x": IRI},
+        {"x": LABEL, "y": TEN},
+        {"x": LABEL, "y": TWO},
+    ]
+    assert merger.result()["head"]["vars"] == ["x", "y"]
+
+
+@pytest.mark.parametrize("expression", ["?x + 1", "RAND()", "STR(?x)"])
+def test_order_by_unsupported(expression: str) -> None:
+    """Only variables, optionally wrapped in `ASC()` or `DESC()`, are supported."""
+    from oteapi_ontokb_plugin.utils.federation import ResultMerger
+
+    with pytest.raises(ValueError, match="Unsupported ORDER BY"):
+        ResultMerger(order_by=[expression])
+
+
+def test_limit_after_merge() -> None:
+    """The limit is applied to the merged rows, after `distinct` and `order_by`."""
+    from oteapi_ontokb_plugin.utils.federation import ResultMerger
+
+    merger = ResultMerger(distinct=True, order_by=["?x"], limit=2)
+    merger.add(_result({"x": LABEL}, {"x": TEN}))
+    merger.add(_result({"x": LABEL}, {"x": IRI}, {"x": TWO}))
+    assert merger.result()["results"]["bindings"] == [{"x": IRI}, {"x": TWO}]
+
+    merger = ResultMerger(limit=0)
+    merger.add(_result({"x": IRI}))
+    assert merger.result()["results"]["bindings"] == []
+
+
+def test_ask() -> None:
+    """ASK results are true if true for any source."""
+    from oteapi_ontokb_plugin.utils.federation import ResultMerger
+
+    merger = ResultMerger()
+    merger.add({"head": {}, "boolean": False})
+    assert merger.result() == {"head": {}, "boolean": False}
+    merger.add({"head": {"link": ["http://ex.org/meta"]}, "boolean": True})
+    assert merger.result() == {
+        "head": {"link": ["http://ex.org/meta"]},
+        "boolean": True,
+    }
+
+
+def test_federated_query(fake_ontorec: "FakeOntoREC") -> None:
+    """The results of all the databases are deduplicated, sorted and limited."""
+    from oteapi_ontokb_plugin.strategies.ontokb_access import (
+        OntoKBResourceConfig,
+        OntoKBResourceStrategy,
+    )
+
+    fake_ontorec.result_rows = 10
+    session = OntoKBResourceStrategy(
+        OntoKBResourceConfig(
+            accessUrl=fake_ontorec.url,
+            accessService="datasource/ontokb",
+            configuration={
+                "database": "a",
+                "databases": ["a", "b", "c"],
+                "federation": {
+                    "distinct": True,
+                    "order_by": ["DESC(?s)"],
+                    "limit": 4,
+                },
+            },
+        )
+    ).get({"sparql_query": "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"})
+
+    assert fake_ontorec.requests == 3
+    assert [source["rows"] for source in session["ontokb_sources"]] == [10, 10, 10]
+    # Two rows per subject, the duplicates of the other databases are removed
+    subjects = [
+        row["s"]["value"].rsplit("#", 1)[-1]
+        for row in session["ontokb_data"]["results"]["bindings"]
+    ]
+    assert subjects == ["Class4", "Class4", "Class3", "Class3"]
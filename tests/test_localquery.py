@@ -0,0 +1,52 @@
+"""Test the in-process SPARQL evaluation."""
+import io
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any
+
+DOCUMENT = (
+    "@prefix ex: <http://ex.org/> .\n" 'ex:a ex:label "A" .\n' 'ex:b ex:label "B" .\n'
+)
+
+
+@pytest.mark.parametrize(
+    "query,local",
+    [
+        ("SELECT ?s WHERE { ?s ?p ?o }", True),
+        ("ASK { ?s ?p ?o }", True),
+        ("CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }", False),
+        ("DESCRIBE <http://ex.org/a>", False),
+    ],
+)
+def test_prepare_query(query: str, local: bool) -> None:
+    """Only SELECT and ASK queries are evaluated in-process."""
+    from oteapi_ontokb_plugin.utils.localquery import prepare_query
+
+    assert (prepare_query(query) is not None) == local
+
+
+def test_session_graph_file(tmp_path: "Any") -> None:
+    """A document spilled to local disk is queried from its file."""
+    from oteapi_ontokb_plugin.utils.localquery import (
+        GRAPHS,
+        prepare_query,
+        query_graph,
+        session_graph,
+    )
+    from oteapi_ontokb_plugin.utils.spill import spill
+
+    reference = spill(io.BytesIO(DOCUMENT.encode("utf-8")), str(tmp_path), ".ttl")
+    GRAPHS.clear()
+    graph = session_graph({"file": reference.dict()})
+    assert graph is not None
+    assert session_graph({"content": DOCUMENT}) is graph
+
+    query = prepare_query("SELECT ?o WHERE { <http://ex.org/a> ?p ?o }")
+    assert query is not None
+    result = json.loads(query_graph(graph, query))
+    assert [row["o"]["value"] for row in result["results"]["bindings"]] == ["A"]
+    GRAPHS.clear()
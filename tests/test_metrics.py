@@ -0,0 +1,76 @@
+"""Test the metrics hooks and the OpenMetrics exporter."""
+
+
+def test_disabled() -> None:
+    """Nothing is measured while no hook is registered."""
+    from oteapi_ontokb_plugin.utils import metrics
+
+    assert not metrics.enabled()
+    assert metrics.timed("download") is metrics.timed("cache_read")
+
+
+def test_render() -> None:
+    """Counters, histogram buckets and the terminator are rendered."""
+    from oteapi_ontokb_plugin.utils import metrics
+
+    exporter = metrics.OpenMetricsExporter(buckets=(0.1, 1.0))
+    metrics.add_hook(exporter)
+    try:
+        assert metrics.enabled()
+        metrics.increment(metrics.BYTES_IN, 100, database="db")
+        metrics.increment(metrics.BYTES_IN, 50, database="db")
+        metrics.increment(metrics.ROWS, 3)
+        metrics.observe(metrics.PHASE_SECONDS, 0.05, phase="query")
+        metrics.observe(metrics.PHASE_SECONDS, 0.5, phase="query")
+        metrics.observe(metrics.PHASE_SECONDS, 2.0, phase="query")
+        metrics.observe(metrics.PHASE_SECONDS, 1.0, phase="decode")
+    finally:
+        metrics.remove_hook(exporter)
+
+    assert exporter.render() == (
+        "# TYPE ontokb_phase_seconds histogram\n"
+        "# UNIT ontokb_phase_seconds seconds\n"
+        'ontokb_phase_seconds_bucket{phase="decode",le="0.1"} 0\n'
+        'ontokb_phase_seconds_bucket{phase="decode",le="1.0"} 1\n'
+        'ontokb_phase_seconds_bucket{phase="decode",le="+Inf"} 1\n'
+        'ontokb_phase_seconds_count{phase="decode"} 1\n'
+        'ontokb_phase_seconds_sum{phase="decode"} 1.0\n'
+        'ontokb_phase_seconds_bucket{phase="query",le="0.1"} 1\n'
+        'ontokb_phase_seconds_bucket{phase="query",le="1.0"} 2\n'
+        'ontokb_phase_seconds_bucket{phase="query",le="+Inf"} 3\n'
+        'ontokb_phase_seconds_count{phase="query"} 3\n'
+        'ontokb_phase_seconds_sum{phase="query"} 2.55\n'
+        "# TYPE ontokb_received_bytes counter\n"
+        "# UNIT ontokb_received_bytes bytes\n"
+        'ontokb_received_bytes_total{database="db"} 150\n'
+        "# TYPE ontokb_rows counter\n"
+        "ontokb_rows_total 3\n"
+        "# EOF\n"
+    )
+
+
+def test_timed() -> None:
+    """Timed phases are observed with their labels, which are escaped."""
+    from oteapi_ontokb_plugin.utils import metrics
+
+    exporter = metrics.OpenMetricsExporter()
+    metrics.add_hook(exporter)
+    try:
+        with metrics.timed("download", database='a "b"'):
+            pass
+    finally:
+        metrics.remove_hook(exporter)
+
+    lines = exporter.render().splitlines()
+    labels = 'database="a \\"b\\"",phase="download"'
+    assert lines[:2] == [
+        "# TYPE ontokb_phase_seconds histogram",
+        "# UNIT ontokb_phase_seconds seconds",
+    ]
+    assert lines[2] == f'ontokb_phase_seconds_bucket{{{labels},le="0.001"}} 1'
+    assert f'ontokb_phase_seconds_bucket{{{labels},le="+Inf"}} 1' in lines
+    assert f"ontokb_phase_seconds_count{{{labels}}} 1" in lines
+    assert lines[-1] == "# EOF"
+
+    exporter.reset()
+    assert exporter.render() == "# EOF\n"
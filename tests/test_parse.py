@@ -1,4 +1,10 @@
 """Test parse strategies."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict
 
 
 # def test_json():
@@ -24,3 +30,57 @@
 #     json = parser.get()
 
 #     assert json == data
+
+
+def test_graph_http_unchanged(
+    datacache_config: "Dict[str, str]", tmp_path: "Any"
+) -> None:
+    """HTTP documents with unchanged `Last-Modified` are not downloaded again."""
+    import os
+    import threading
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    from oteapi_ontokb_plugin.strategies.application_rdf import RDFDataParseStrategy
+
+    pytest.importorskip("rdflib")
+    path = tmp_path / "ontology.ttl"
+    path.write_text('<http://ex.org/a> <http://ex.org/p> "A" .\n', encoding="utf8")
+    downloads = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        """Serve `tmp_path`, counting the downloads."""
+
+        def do_GET(self) -> None:
+            downloads.append(self.path)
+            super().do_GET()
+
+        def log_message(self, *args: "Any") -> None:  # pylint: disable=arguments-differ
+            pass
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(Handler, directory=str(tmp_path))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    strategy = RDFDataParseStrategy(
+        parse_config={
+            "downloadUrl": f"http://127.0.0.1:{server.server_port}/ontology.ttl",
+            "mediaType": "application/rdf",
+            "configuration": {"graph": True, "datacache_config": datacache_config},
+        }
+    )
+    try:
+        assert strategy.get().graph.triples == 1
+        assert strategy.get().graph.triples == 1
+        assert len(downloads) == 1
+
+        path.write_text(
+            '<http://ex.org/a> <http://ex.org/p> "A", "B" .\n', encoding="utf8"
+        )
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        assert strategy.get().graph.triples == 2
+        assert len(downloads) == 2
+    finally:
+        server.shutdown()
+        server.server_close()
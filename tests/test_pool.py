@@ -0,0 +1,24 @@
+"""Test the registry of pooled sessions."""
+
+
+def test_get_session_per_config() -> None:
+    """Sessions are shared per `accessUrl` and pool configuration."""
+    from oteapi_ontokb_plugin.utils.pool import (
+        PoolConfig,
+        close_sessions,
+        get_session,
+        pool_statistics,
+    )
+
+    url = "http://ontorec.test"
+    try:
+        default = get_session(url + "/")
+        small = get_session(url, PoolConfig(pool_maxsize=2))
+
+        assert small is not default
+        assert get_session(url) is default
+        assert get_session(url, PoolConfig(pool_maxsize=2)) is small
+        assert small.config.pool_maxsize == 2
+        assert list(pool_statistics(url)) == [url]
+    finally:
+        close_sessions()
@@ -0,0 +1,76 @@
+"""Test the cache of SPARQL query results."""
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Dict
+
+URL = "http://ontorec.test"
+
+
+def test_normalize_query() -> None:
+    """Spacing and comments are ignored, except in literals and IRIs."""
+    from oteapi_ontokb_plugin.utils.querycache import normalize_query
+
+    query = 'SELECT ?s WHERE { ?s ?p "a  b # c" }'
+    assert (
+        normalize_query(
+            "SELECT ?s  # the subjects\n" "WHERE {\n" '\t?s ?p "a  b # c"\n' "}\n"
+        )
+        == query
+    )
+    assert normalize_query(query.replace("a  b", "a b")) != query
+    assert normalize_query("ASK { <http://ex.org/a#b> ?p ?o }") == (
+        "ASK { <http://ex.org/a#b> ?p ?o }"
+    )
+    assert normalize_query("SELECT * WHERE { FILTER(?a < ?b) }") == (
+        "SELECT * WHERE { FILTER(?a < ?b) }"
+    )
+
+
+def test_key_normalized(datacache_config: "Dict[str, str]") -> None:
+    """Queries differing only in spacing or comments share a cache key."""
+    from oteapi_ontokb_plugin.utils.querycache import QueryCacheConfig, QueryResultCache
+
+    cache = QueryResultCache(QueryCacheConfig(datacache_config=datacache_config))
+    key = cache.key(URL, "db", "SELECT ?s WHERE { ?s ?p ?o }", False)
+
+    assert cache.key(URL + "/", "db", "SELECT ?s\nWHERE { ?s ?p ?o } # all", False) == (
+        key
+    )
+    assert cache.key(URL, "db", "SELECT ?s WHERE { ?s ?p ?o }", True) != key
+    assert cache.key(URL, "other", "SELECT ?s WHERE { ?s ?p ?o }", False) != key
+
+
+def test_generation(datacache_config: "Dict[str, str]") -> None:
+    """An upload invalidates the cached results of its database only."""
+    from oteapi_ontokb_plugin.utils.querycache import (
+        QueryCacheConfig,
+        QueryResultCache,
+        bump_database_generation,
+        database_generation,
+    )
+
+    cache = QueryResultCache(QueryCacheConfig(datacache_config=datacache_config))
+    query = "SELECT ?s WHERE { ?s ?p ?o }"
+    for database in ("uploaded", "other"):
+        cache.add(cache.key(URL, database, query, False), database.encode("utf-8"))
+
+    assert bump_database_generation(cache.cache, URL + "/", "uploaded") == 1
+    assert database_generation(cache.cache, URL, "uploaded") == 1
+    assert database_generation(cache.cache, URL, "other") == 0
+    assert cache.get(cache.key(URL, "uploaded", query, False)) is None
+    assert cache.get(cache.key(URL, "other", query, False)) == b"other"
+
+
+def test_eviction(datacache_config: "Dict[str, str]") -> None:
+    """The oldest results are evicted beyond `max_entries`."""
+    from oteapi_ontokb_plugin.utils.querycache import QueryCacheConfig, QueryResultCache
+
+    cache = QueryResultCache(
+        QueryCacheConfig(datacache_config=datacache_config, max_entries=2)
+    )
+    keys = [cache.key(URL, "db", f"ASK {{ ?s ?p {_} }}", False) for _ in range(3)]
+    for index, key in enumerate(keys):
+        cache.add(key, str(index).encode("utf-8"))
+
+    assert [cache.get(_) for _ in keys] == [None, b"1", b"2"]
@@ -0,0 +1,36 @@
+"""Test the incremental conversion of RDF documents."""
+import pytest
+
+TURTLE = (
+    "@prefix ex: <http://ex.org/> .\n"
+    "PREFIX foo: <http://foo.org/>\n"
+    "# A comment. With a dot\n"
+    'ex:a ex:p "x. y", """multi\n. line""" ;\n'
+    "  ex:q 1.5, ex:b.c, [ ex:r ex:d ] .\n"
+    "ex:e ex:p <http://ex.org/f.g> .\n"
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(TURTLE)])
+def test_iter_turtle_statements(chunk_size: int) -> None:
+    """Statements end at dots outside strings, IRIs, comments, numbers and names,
+    wherever the chunks are split."""
+    from oteapi_ontokb_plugin.utils.rdf import iter_turtle_statements
+
+    chunks = (
+        TURTLE[start : start + chunk_size]
+        for start in range(0, len(TURTLE), chunk_size)
+    )
+    statements = list(iter_turtle_statements(chunks))
+
+    assert [kind for kind, _ in statements] == [
+        "directive",
+        "directive",
+        "statement",
+        "statement",
+    ]
+    assert statements[0][1] == "@prefix ex: <http://ex.org/> ."
+    assert statements[1][1].strip() == "PREFIX foo: <http://foo.org/>"
+    assert statements[2][1].endswith("[ ex:r ex:d ] .")
+    assert '"""multi\n. line"""' in statements[2][1]
+    assert statements[3][1] == "ex:e ex:p <http://ex.org/f.g> ."
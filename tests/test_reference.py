@@ -0,0 +1,39 @@
+"""Test the references to payloads stored in the data cache."""
+import hashlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Dict
+
+
+TEXT = "ontologie éèà ✓ " * 1000
+
+
+def test_reference_cached_text(datacache_config: "Dict[str, str]") -> None:
+    """References to text values are computed over their UTF-8 encoding."""
+    from oteapi.datacache import DataCache
+
+    from oteapi_ontokb_plugin.utils.reference import reference_cached
+
+    cache = DataCache(datacache_config)
+    cache.add(TEXT, key="text")
+    encoded = TEXT.encode("utf-8")
+
+    reference = reference_cached(cache, "text", "text/turtle")
+    assert reference.size == len(encoded)
+    assert reference.checksum == hashlib.sha256(encoded).hexdigest()
+
+
+def test_reference_no_expiry(datacache_config: "Dict[str, str]") -> None:
+    """Referenced payloads do not expire from the data cache."""
+    from oteapi.datacache import DataCache
+
+    from oteapi_ontokb_plugin.utils.reference import reference_cached, store_reference
+
+    cache = DataCache(datacache_config)
+    cache.add(TEXT, key="text")
+    stored = store_reference(cache, b"payload", "application/json")
+    cached = reference_cached(cache, "text", "text/turtle")
+
+    for key in (stored.key, cached.key):
+        assert cache.diskcache.get(key, expire_time=True)[1] is None
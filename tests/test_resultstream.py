@@ -0,0 +1,64 @@
+"""Test the incremental decoding of SPARQL-JSON SELECT results."""
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import List
+
+ROWS = [{"s": {"type": "uri", "value": f"http://ex.org/{_}"}} for _ in range(10)]
+
+
+def _chunks(chunk_size: int = 16) -> "List[bytes]":
+    body = json.dumps({"head": {"vars": ["s"]}, "results": {"bindings": ROWS}}).encode(
+        "utf-8"
+    )
+    return [body[_ : _ + chunk_size] for _ in range(0, len(body), chunk_size)]
+
+
+def test_complete() -> None:
+    """All the rows of a result are decoded, across chunk boundaries."""
+    from oteapi_ontokb_plugin.utils.resultstream import SelectResultStream
+
+    stream = SelectResultStream(_chunks())
+
+    assert [len(_) for _ in stream.batches(4)] == [4, 4, 2]
+    assert stream.variables == ["s"]
+    assert stream.rows == 10
+    assert stream.size == sum(len(_) for _ in _chunks())
+    assert not stream.truncated
+
+
+def test_max_rows() -> None:
+    """The transfer stops after `max_rows` rows."""
+    from oteapi_ontokb_plugin.utils.resultstream import SelectResultStream
+
+    stream = SelectResultStream(_chunks(), max_rows=4)
+
+    assert list(stream) == ROWS[:4]
+    assert stream.rows == 4
+    assert stream.truncated
+    assert stream.size < sum(len(_) for _ in _chunks())
+
+
+def test_max_bytes() -> None:
+    """The transfer stops before the chunk exceeding `max_bytes`, keeping the rows
+    decoded until then."""
+    from oteapi_ontokb_plugin.utils.resultstream import SelectResultStream
+
+    stream = SelectResultStream(_chunks(), max_bytes=200)
+    rows = list(stream)
+
+    assert 0 < len(rows) < len(ROWS)
+    assert rows == ROWS[: len(rows)]
+    assert stream.truncated
+    assert stream.size <= 200
+
+
+def test_incomplete() -> None:
+    """A body ending within the bindings, without budget exceeded, is an error."""
+    from oteapi_ontokb_plugin.utils.resultstream import SelectResultStream
+
+    with pytest.raises(ValueError, match="ends within its bindings"):
+        list(SelectResultStream(_chunks()[:-3]))
@@ -0,0 +1,25 @@
+"""Test the splitting of ontologies into shards."""
+
+
+def test_blank_node_components() -> None:
+    """Triples sharing blank nodes are kept together, per connected component."""
+    import io
+
+    from oteapi_ontokb_plugin.utils.sharding import iter_shards
+
+    lines = [
+        "<http://ex.org/a> <http://ex.org/p> _:a1 .",
+        '<http://ex.org/b> <http://ex.org/p> "_:not a blank node" .',
+        "_:b1 <http://ex.org/p> <http://ex.org/c> .",
+        "_:a1 <http://ex.org/p> _:a2 .",
+        "_:b1 <http://ex.org/p> _:b2 .",
+        "_:a2 <http://ex.org/p> <http://ex.org/d> .",
+    ]
+    document = io.BytesIO(("\n".join(lines) + "\n").encode("utf-8"))
+
+    shards = list(iter_shards(document, "nt", 100))
+
+    assert [triples for _, triples in shards] == [1, 3, 2]
+    assert shards[0][0] == (lines[1] + "\n").encode("utf-8")
+    assert shards[1][0].decode("utf-8").splitlines() == [lines[0], lines[3], lines[5]]
+    assert shards[2][0].decode("utf-8").splitlines() == [lines[2], lines[4]]
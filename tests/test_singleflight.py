@@ -0,0 +1,164 @@
+"""Test the coalescing of identical in-flight calls."""
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Callable, List
+
+    from oteapi_ontokb_plugin.utils.singleflight import SingleFlight
+
+CALLERS = 4
+
+
+def _wait_for_waiters(flight: "SingleFlight", key: str, count: int) -> None:
+    """Wait until `count` callers are waiting for the call of `key`."""
+    import time
+
+    # pylint: disable=protected-access
+    deadline = time.monotonic() + 5
+    while flight._calls[key].waiters < count:
+        assert time.monotonic() < deadline, "Callers did not join the call"
+        time.sleep(0.001)
+
+
+def _run_concurrently(flight: "SingleFlight", func: "Callable[[], Any]") -> "List[Any]":
+    """Call `func` through `flight` from `CALLERS` threads, released together by a
+    barrier, and return their results or errors."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    barrier = threading.Barrier(CALLERS)
+
+    def _caller() -> "Any":
+        barrier.wait()
+        try:
+            return flight.run("key", func)
+        except Exception as exc:  # pylint: disable=broad-except
+            return exc
+
+    with ThreadPoolExecutor(CALLERS) as executor:
+        futures = [executor.submit(_caller) for _ in range(CALLERS)]
+        return [_.result() for _ in futures]
+
+
+def test_shared() -> None:
+    """Concurrent calls with the same key share a single call."""
+    import threading
+
+    from oteapi_ontokb_plugin.utils.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    calls = []
+
+    def _func() -> str:
+        calls.append(threading.get_ident())
+        _wait_for_waiters(flight, "key", CALLERS - 1)
+        return "result"
+
+    results = _run_concurrently(flight, _func)
+
+    assert len(calls) == 1
+    assert results == [("result", True)] * CALLERS
+
+
+def test_error_shared() -> None:
+    """The error of a call reaches every waiting caller, and the key is released."""
+    from oteapi_ontokb_plugin.utils.singleflight import SingleFlight
+
+    flight = SingleFlight()
+
+    def _func() -> str:
+        _wait_for_waiters(flight, "key", CALLERS - 1)
+        raise ValueError("failed")
+
+    results = _run_concurrently(flight, _func)
+
+    assert all(isinstance(_, ValueError) for _ in results)
+    # The next call runs again
+    assert flight.run("key", lambda: "again") == ("again", False)
+
+
+def test_released_after_error() -> None:
+    """A failed call is not remembered."""
+    from oteapi_ontokb_plugin.utils.singleflight import SingleFlight
+
+    flight = SingleFlight()
+
+    def _fail() -> str:
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        flight.run("key", _fail)
+    assert flight.run("key", lambda: "again") == ("again", False)
+
+
+def test_async_joins_thread() -> None:
+    """An asyncio task shares the call of a thread, without blocking the loop."""
+    import asyncio
+    import threading
+
+    from oteapi_ontokb_plugin.utils.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def _func() -> str:
+        started.set()
+        release.wait(5)
+        return "result"
+
+    async def _not_called() -> str:
+        raise AssertionError("The call in flight must be shared")
+
+    async def _main() -> "Any":
+        task = asyncio.ensure_future(flight.run_async("key", _not_called))
+        # pylint: disable=protected-access
+        while flight._calls["key"].waiters < 1:
+            await asyncio.sleep(0.001)
+        release.set()
+        return await task
+
+    owner = []
+    thread = threading.Thread(target=lambda: owner.append(flight.run("key", _func)))
+    thread.start()
+    assert started.wait(5)
+    assert asyncio.run(_main()) == ("result", True)
+    thread.join(5)
+    assert owner == [("result", True)]
+
+
+def test_async_shared() -> None:
+    """Concurrent asyncio tasks with the same key share a single call, and its
+    error."""
+    import asyncio
+
+    from oteapi_ontokb_plugin.utils.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    calls = []
+
+    async def _func() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def _fail() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def _main() -> "Any":
+        results = await asyncio.gather(
+            *(flight.run_async("key", _func) for _ in range(CALLERS))
+        )
+        errors = await asyncio.gather(
+            *(flight.run_async("key", _fail) for _ in range(CALLERS)),
+            return_exceptions=True,
+        )
+        return results, errors
+
+    results, errors = asyncio.run(_main())
+
+    assert len(calls) == 1
+    assert results == [("result", True)] * CALLERS
+    assert all(isinstance(_, ValueError) for _ in errors)
@@ -0,0 +1,70 @@
+"""Test the templated SPARQL queries."""
+import pytest
+
+
+@pytest.mark.parametrize(
+    "query,added",
+    [
+        ("SELECT * WHERE { ?m ?p ?o }", []),
+        ("SELECT DISTINCT * WHERE { ?m ?p ?o }", []),
+        ("SELECT ?p ?o WHERE { ?m ?p ?o }", ["m"]),
+        ("SELECT ?m ?o WHERE { ?m ?p ?o }", []),
+        ("SELECT (STR(?m) AS ?label) WHERE { ?m ?p ?o }", ["m"]),
+        ("SELECT (?o AS ?m) WHERE { ?x ?p ?o }", []),
+        ("SELECT ?m (COUNT(*) AS ?n) WHERE { ?m ?p ?o } GROUP BY ?m", []),
+    ],
+)
+def test_template_projection(query: str, added: "list") -> None:
+    """Parameter variables missing from the projection are added to it."""
+    from oteapi_ontokb_plugin.utils.sparql import TemplateQuery
+
+    template = TemplateQuery(query, ["m"])
+    assert template.added == added
+
+    rendered = template.render([["<http://a>"], ["<http://b>"]])
+    assert "VALUES (?m) { (<http://a>) (<http://b>) }" in rendered
+    if added:
+        assert rendered.startswith(query[: query.index("WHERE")] + "?m ")
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT (COUNT(*) AS ?n) WHERE { ?m ?p ?o }",
+        "SELECT (COUNT(?o) AS ?n) WHERE { ?m ?p ?o } GROUP BY ?p",
+        "SELECT ?p (SUM(?o) AS ?n) WHERE { ?m ?p ?o } GROUP BY ?p",
+        "CONSTRUCT",
+    ],
+)
+def test_template_invalid(query: str) -> None:
+    """Aggregates over several bindings and templates without pattern fail."""
+    from oteapi_ontokb_plugin.utils.sparql import TemplateQuery
+
+    with pytest.raises(ValueError):
+        TemplateQuery(query, ["m"])
+
+
+def test_template_batches() -> None:
+    """Bindings are canonicalized and batched, one at a time with `LIMIT`."""
+    from oteapi_ontokb_plugin.utils.sparql import TemplateQuery
+
+    bindings = [{"m": "<http://a>"}, {"m": 42}, {"m": '"x"@EN'}]
+    batches = TemplateQuery("SELECT ?m WHERE { ?m ?p ?o }", ["m"]).batches(bindings, 2)
+    assert [batch for _, batch in batches] == [
+        [["<http://a>"], ['"42"^^<http://www.w3.org/2001/XMLSchema#integer>']],
+        [['"x"@en']],
+    ]
+
+    limited = TemplateQuery("SELECT ?m WHERE { ?m ?p ?o } LIMIT 1", ["m"])
+    assert len(limited.batches(bindings, 2)) == 3
+    with pytest.raises(ValueError, match="exactly the variables"):
+        limited.batches([{"x": 1}], 2)
+
+
+def test_lone_variable_marker() -> None:
+    """A `?` without a variable name is skipped, not an error."""
+    from oteapi_ontokb_plugin.utils.sparql import TemplateQuery
+
+    template = TemplateQuery("SELECT ?s ? WHERE { ?s ?p ?o }", ["o"])
+
+    assert template.added == ["o"]
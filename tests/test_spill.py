@@ -0,0 +1,49 @@
+"""Test the content-addressed spill files."""
+import io
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any
+
+
+def test_map_spilled(tmp_path: "Any") -> None:
+    """Identical documents share a file, mapped read-only."""
+    from oteapi_ontokb_plugin.utils.spill import map_spilled, read_text, spill
+
+    content = '<http://a> <http://p> "é" .\n'.encode("utf-8")
+    reference = spill(io.BytesIO(content), str(tmp_path), suffix=".nt")
+    assert spill(io.BytesIO(content), str(tmp_path), suffix=".nt") == reference
+    assert reference.size == len(content)
+
+    with map_spilled(reference) as view:
+        assert view.readonly
+        assert bytes(view) == content
+    assert read_text(reference) == content.decode("utf-8")
+
+
+def test_map_spilled_slice(tmp_path: "Any") -> None:
+    """Slices kept after the block stay valid and do not fail the close."""
+    from oteapi_ontokb_plugin.utils.spill import map_spilled, spill
+
+    reference = spill(io.BytesIO(b"0123456789" * 100), str(tmp_path))
+
+    with map_spilled(reference) as view:
+        head = view[:10]
+    assert bytes(head) == b"0123456789"
+    head.release()
+
+
+def test_map_spilled_empty_or_missing(tmp_path: "Any") -> None:
+    """Empty documents give an empty view, missing files are errors."""
+    from oteapi_ontokb_plugin.utils.spill import map_spilled, spill
+
+    with map_spilled(spill(io.BytesIO(b""), str(tmp_path))) as view:
+        assert bytes(view) == b""
+
+    reference = spill(io.BytesIO(b"content"), str(tmp_path))
+    (tmp_path / reference.checksum).unlink()
+    with pytest.raises(FileNotFoundError):
+        with map_spilled(reference):
+            pass
@@ -0,0 +1,40 @@
+"""Test the streaming helpers."""
+import hashlib
+import io
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Dict
+
+
+TEXT = "ontologie éèà ✓ " * 1000
+
+
+def test_open_cached_text(datacache_config: "Dict[str, str]") -> None:
+    """Text values are encoded on the fly, and can be rewound."""
+    from oteapi.datacache import DataCache
+
+    from oteapi_ontokb_plugin.utils.streaming import hash_content, open_cached
+
+    cache = DataCache(datacache_config)
+    cache.add(TEXT, key="text")
+    encoded = TEXT.encode("utf-8")
+
+    with open_cached(cache, "text") as handle:
+        assert handle.read(10) == encoded[:10]
+        assert handle.tell() == 10
+        handle.seek(0)
+        assert handle.read() == encoded
+        assert handle.tell() == len(encoded)
+
+        handle.seek(100)
+        assert handle.read(50) == encoded[100:150]
+        handle.seek(-20, io.SEEK_END)
+        assert handle.read() == encoded[-20:]
+
+        handle.seek(0)
+        assert hash_content(handle, 1000) == (
+            hashlib.sha256(encoded).hexdigest(),
+            len(encoded),
+        )
+        assert handle.tell() == 0
@@ -0,0 +1,156 @@
+"""Test the `datasource/ontokb_upload` strategy."""
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing import Any, Dict
+
+    from tests.benchmarks.fake_ontorec import FakeOntoREC
+
+
+def _strategy(
+    fake_ontorec: "FakeOntoREC",
+    path: "Any",
+    datacache_config: "Dict[str, str]",
+    **configuration: "Any",
+) -> "Any":
+    from oteapi_ontokb_plugin.strategies.ontokb_upload import (
+        OntoKBResourceUploadConfig,
+        OntoKBUploadStrategy,
+    )
+
+    return OntoKBUploadStrategy(
+        OntoKBResourceUploadConfig(
+            accessUrl=fake_ontorec.url,
+            accessService="datasource/ontokb_upload",
+            configuration={
+                "database": "test",
+                "filename": path.name,
+                "fileConfig": {
+                    "downloadUrl": path.as_uri(),
+                    "mediaType": "application/n-triples",
+                },
+                "datacache_config": datacache_config,
+                **configuration,
+            },
+        )
+    )
+
+
+def test_deduplicate_last_upload(
+    fake_ontorec: "FakeOntoREC", datacache_config: "Dict[str, str]", tmp_path: "Any"
+) -> None:
+    """Only the content of the last upload to the database is skipped."""
+    path = tmp_path / "ontology.nt"
+    strategy = _strategy(fake_ontorec, path, datacache_config, deduplicate=True)
+    first = "<http://ex.org/a> <http://ex.org/p> <http://ex.org/b> .\n"
+    second = "<http://ex.org/a> <http://ex.org/p> <http://ex.org/c> .\n"
+
+    for content in (first, second, first):
+        path.write_text(content, encoding="utf8")
+        assert not strategy.get({}).skipped
+    assert len(fake_ontorec.uploads) == 3
+
+    result = strategy.get({})
+    assert result.skipped
+    assert result.bytes_transferred == 0
+    assert len(fake_ontorec.uploads) == 3
+
+
+def test_deduplicate_cleared(
+    fake_ontorec: "FakeOntoREC", datacache_config: "Dict[str, str]", tmp_path: "Any"
+) -> None:
+    """An upload without deduplication clears the record of the database."""
+    path = tmp_path / "ontology.nt"
+    path.write_text(
+        "<http://ex.org/a> <http://ex.org/p> <http://ex.org/b> .\n", encoding="utf8"
+    )
+
+    for deduplicate in (True, False, True):
+        strategy = _strategy(
+            fake_ontorec, path, datacache_config, deduplicate=deduplicate
+        )
+        assert not strategy.get({}).skipped
+    assert len(fake_ontorec.uploads) == 3
+
+
+def test_upload_text_content(
+    fake_ontorec: "FakeOntoREC", datacache_config: "Dict[str, str]", tmp_path: "Any"
+) -> None:
+    """Upload content stored in the data cache as text, e.g. by a text download."""
+    from oteapi.datacache import DataCache
+
+    content = '<http://ex.org/a> <http://ex.org/p> "é" .\n'
+    DataCache(datacache_config).add(content, key="text")
+    config = dict(datacache_config, accessKey="text")
+
+    for streaming in (False, True):
+        result = _strategy(
+            fake_ontorec,
+            tmp_path / "ontology.nt",
+            config,
+            deduplicate=True,
+            streaming=streaming,
+        ).get({})
+        assert result.bytes_transferred == len(content.encode("utf-8"))
+        assert not result.skipped
+        # The second run deduplicates the first one
+        assert _strategy(
+            fake_ontorec, tmp_path / "ontology.nt", config, deduplicate=True
+        ).get({})["skipped"]
+        _strategy(fake_ontorec, tmp_path / "ontology.nt", config).get({})
+
+
+def test_delta_invalid_line(
+    fake_ontorec: "FakeOntoREC", datacache_config: "Dict[str, str]", tmp_path: "Any"
+) -> None:
+    """A document with a line that cannot be compared is uploaded as a whole."""
+    path = tmp_path / "ontology.nt"
+    strategy = _strategy(fake_ontorec, path, datacache_config, delta=True)
+    triples = [
+        f"<http://ex.org/s{index}> <http://ex.org/p> <http://ex.org/o> ."
+        for index in range(10)
+    ]
+
+    path.write_text("\n".join(triples) + "\n", encoding="utf8")
+    strategy.get({})
+    path.write_text("\n".join(triples[1:]) + "\n", encoding="utf8")
+    assert strategy.get({}).delta
+    assert fake_ontorec.updates and "DELETE DATA" in fake_ontorec.updates[-1]
+
+    path.write_text("\n".join(triples + ["not a triple"]) + "\n", encoding="utf8")
+    result = strategy.get({})
+    assert not result.delta
+    assert len(fake_ontorec.uploads) == 2
+
+    # The fingerprint of the previous version was dropped
+    path.write_text("\n".join(triples) + "\n", encoding="utf8")
+    assert not strategy.get({}).delta
+    assert len(fake_ontorec.uploads) == 3
+
+
+def test_sharded_clears_stale_shards(
+    fake_ontorec: "FakeOntoREC", datacache_config: "Dict[str, str]", tmp_path: "Any"
+) -> None:
+    """Shards of a previous upload beyond the new number of shards are emptied."""
+    path = tmp_path / "ontology.nt"
+    strategy = _strategy(
+        fake_ontorec,
+        path,
+        datacache_config,
+        sharding={"enabled": True, "shard_size": 100},
+    )
+    triples = [
+        f"<http://ex.org/s{index}> <http://ex.org/p> <http://ex.org/o> ."
+        for index in range(6)
+    ]
+
+    path.write_text("\n".join(triples) + "\n", encoding="utf8")
+    assert strategy.get({}).shards.shards == 3
+    path.write_text(triples[0] + "\n", encoding="utf8")
+    report = strategy.get({}).shards
+    assert (report.shards, report.cleared) == (1, 2)
+    # Two empty shards and the new one
+    first, second, shard = sorted(fake_ontorec.uploads[-3:])
+    assert first == second < shard
+    assert strategy.get({}).shards.cleared == 0
+    assert len(fake_ontorec.uploads) == 7